@@ -0,0 +1,83 @@
+"""
+# benchmarks/compare.py
+# This module compares two benchmark reports (micro or load) and flags the results
+# whose latency grew beyond a threshold, for use as a regression gate.
+
+Usage:
+    python -m benchmarks.compare baseline.json current.json [--metric p50_us] [--threshold 0.1]
+
+Exits with status 1 when a result regressed.
+"""
+
+import argparse
+import json
+import sys
+
+
+def _results(report: dict) -> dict[str, dict]:
+    results = report["results"]
+    if report.get("suite") == "load":
+        # Load reports nest the endpoints, the overall summary is compared too
+        return {
+            "overall": results["overall"],
+            **{entry["name"]: entry for entry in results["endpoints"]},
+        }
+    return {entry["name"]: entry for entry in results}
+
+
+def compare(baseline: dict, current: dict, metric: str, threshold: float) -> list[dict]:
+    """
+    Compare the results both reports have.
+
+    Args:
+        baseline: Report of the reference run.
+        current: Report of the run checked.
+        metric: Latency field compared, e.g. p50_us or p99_us.
+        threshold: Relative increase counted as a regression, 0.1 for 10%.
+
+    Returns:
+        list[dict]: One row per result: name, both values, change and whether it regressed.
+    """
+    before, after = _results(baseline), _results(current)
+    rows = []
+    for name in before.keys() & after.keys():
+        old, new = before[name].get(metric), after[name].get(metric)
+        if not old or new is None:
+            continue
+        change = new / old - 1
+        rows.append(
+            {
+                "name": name,
+                "baseline": old,
+                "current": new,
+                "change": round(change, 4),
+                "regressed": change > threshold,
+            }
+        )
+    return sorted(rows, key=lambda row: row["change"], reverse=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare two benchmark reports")
+    parser.add_argument("baseline", help="Report of the reference run")
+    parser.add_argument("current", help="Report of the run checked")
+    parser.add_argument("--metric", default="p50_us", help="Field compared (p50_us, p99_us, ...)")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="Relative increase counted as a regression")
+    args = parser.parse_args()
+
+    with open(args.baseline) as baseline, open(args.current) as current:
+        rows = compare(json.load(baseline), json.load(current), args.metric, args.threshold)
+    width = max((len(row["name"]) for row in rows), default=10)
+    for row in rows:
+        flag = "REGRESSED" if row["regressed"] else ""
+        print(
+            f"{row['name']:<{width}}  {row['baseline']:>12.2f}  {row['current']:>12.2f}"
+            f"  {row['change']:>+8.1%}  {flag}"
+        )
+    if any(row["regressed"] for row in rows):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
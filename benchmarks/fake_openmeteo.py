@@ -0,0 +1,333 @@
+"""
+# benchmarks/fake_openmeteo.py
+# This module is a local stand-in for the Open-Meteo forecast, archive and geocoding
+# APIs. Forecasts are FlatBuffer responses in the upstream wire format, for any
+# location and any variable selection, with deterministic values and configurable
+# latency.
+
+Usage:
+    python -m benchmarks.fake_openmeteo --port 8766 --latency 0.05
+
+Then start the app with
+    OPENMETEO_FORECAST_URL=http://127.0.0.1:8766/v1/forecast
+    OPENMETEO_GEOCODING_URL=http://127.0.0.1:8766/v1/search
+    OPENMETEO_ARCHIVE_URL=http://127.0.0.1:8766/v1/archive
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from datetime import date, datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import flatbuffers
+import numpy as np
+from openmeteo_sdk.Aggregation import Aggregation
+from openmeteo_sdk.Variable import Variable
+
+# Field slots of the upstream schema (openmeteo_sdk, WeatherApiResponse.fbs)
+RESPONSE_FIELDS = 15
+RESPONSE_LATITUDE, RESPONSE_LONGITUDE, RESPONSE_ELEVATION = 0, 1, 2
+RESPONSE_GENERATION_TIME, RESPONSE_UTC_OFFSET = 3, 6
+RESPONSE_CURRENT, RESPONSE_DAILY, RESPONSE_HOURLY = 9, 10, 11
+SECTION_FIELDS = 4
+VARIABLE_FIELDS = 13
+VARIABLE_ENUM, VARIABLE_VALUE, VARIABLE_VALUES = 0, 2, 3
+VARIABLE_ALTITUDE, VARIABLE_AGGREGATION = 5, 6
+
+# Codes the real API returns, so label lookups hit the table
+WMO_CODES = np.array(
+    [0, 1, 2, 3, 45, 48, 51, 53, 55, 61, 63, 65, 71, 73, 75, 80, 81, 82, 95, 96, 99],
+    dtype=np.float32,
+)
+
+AGGREGATIONS = {
+    "max": Aggregation.maximum,
+    "min": Aggregation.minimum,
+    "mean": Aggregation.mean,
+    "sum": Aggregation.sum,
+    "dominant": Aggregation.dominant,
+}
+_ALTITUDE = re.compile(r"_(\d+)m(?=_|$)")
+
+
+def _describe(name: str) -> tuple[int, int, int]:
+    """
+    Split an API variable name into (variable, altitude, aggregation) enums,
+    e.g. temperature_2m_max -> (temperature, 2, maximum).
+    """
+    aggregation = Aggregation.none
+    base, _, suffix = name.rpartition("_")
+    if base and suffix in AGGREGATIONS:
+        aggregation = AGGREGATIONS[suffix]
+        name = base
+    altitude = 0
+    match = _ALTITUDE.search(name)
+    if match:
+        altitude = int(match.group(1))
+        name = _ALTITUDE.sub("", name)
+    return getattr(Variable, name, Variable.undefined), altitude, aggregation
+
+
+def _values(name: str, count: int, rng: np.random.Generator) -> np.ndarray:
+    if name == "weather_code":
+        return rng.choice(WMO_CODES, count)
+    if name == "is_day":
+        return (np.arange(count) % 24 >= 6).astype(np.float32)
+    if "temperature" in name or "dew_point" in name:
+        return rng.normal(15, 8, count).astype(np.float32)
+    if "humidity" in name or "cloud_cover" in name or "probability" in name:
+        return rng.uniform(0, 100, count).astype(np.float32)
+    if "pressure" in name:
+        return rng.normal(1013, 8, count).astype(np.float32)
+    if "direction" in name:
+        return rng.uniform(0, 360, count).astype(np.float32)
+    if "duration" in name:
+        return rng.uniform(0, 50000, count).astype(np.float32)
+    return rng.gamma(1.5, 3.0, count).astype(np.float32)
+
+
+def _section(
+    builder: flatbuffers.Builder,
+    names: list[str],
+    start: int,
+    end: int,
+    interval: int,
+    rng: np.random.Generator,
+    single: bool = False,
+) -> int:
+    count = max((end - start) // interval, 1)
+    variables = []
+    for name in names:
+        values = _values(name, count, rng)
+        vector = None if single else builder.CreateNumpyVector(values)
+        variable, altitude, aggregation = _describe(name)
+        builder.StartObject(VARIABLE_FIELDS)
+        if single:
+            builder.PrependFloat32Slot(VARIABLE_VALUE, float(values[0]), 0.0)
+        else:
+            builder.PrependUOffsetTRelativeSlot(VARIABLE_VALUES, vector, 0)
+        builder.PrependInt16Slot(VARIABLE_ALTITUDE, altitude, 0)
+        builder.PrependUint8Slot(VARIABLE_ENUM, variable, 0)
+        builder.PrependUint8Slot(VARIABLE_AGGREGATION, aggregation, 0)
+        variables.append(builder.EndObject())
+    builder.StartVector(4, len(variables), 4)
+    for offset in reversed(variables):
+        builder.PrependUOffsetTRelative(offset)
+    vector = builder.EndVector()
+    builder.StartObject(SECTION_FIELDS)
+    builder.PrependInt64Slot(0, start, 0)
+    builder.PrependInt64Slot(1, end, 0)
+    builder.PrependInt32Slot(2, interval, 0)
+    builder.PrependUOffsetTRelativeSlot(3, vector, 0)
+    return builder.EndObject()
+
+
+def _split(value: str | None) -> list[str]:
+    return [name for name in (value or "").split(",") if name]
+
+
+def _day_start(day: date) -> int:
+    return int(datetime(day.year, day.month, day.day, tzinfo=timezone.utc).timestamp())
+
+
+def encode_location(
+    latitude: float, longitude: float, params: dict, now: int, utc_offset: int = 0
+) -> bytes:
+    """
+    Encode one location of a forecast response, size-prefixed as the API sends it.
+
+    Args:
+        latitude: Location latitude.
+        longitude: Location longitude.
+        params: Request parameters (current, hourly, daily, forecast_days,
+            start_date, end_date).
+        now: Current time as a UNIX timestamp.
+        utc_offset: UTC offset of the location in seconds; days start at local
+            midnight, as with timezone=auto.
+
+    Returns:
+        bytes: Size-prefixed WeatherApiResponse.
+    """
+    # Same location and day, same values
+    seed = hashlib.blake2b(f"{latitude:.4f},{longitude:.4f},{now // 86400}".encode())
+    rng = np.random.default_rng(int.from_bytes(seed.digest()[:8], "little"))
+    builder = flatbuffers.Builder(4096)
+    today = now // 86400 * 86400
+    days = int(params.get("forecast_days", 7))
+    sections = {}
+    if params.get("current"):
+        start = now // 900 * 900
+        sections[RESPONSE_CURRENT] = _section(
+            builder, _split(params["current"]), start, start + 900, 900, rng, single=True
+        )
+    if params.get("hourly"):
+        sections[RESPONSE_HOURLY] = _section(
+            builder, _split(params["hourly"]), today, today + days * 86400, 3600, rng
+        )
+    if params.get("daily"):
+        if params.get("start_date") and params.get("end_date"):
+            start = _day_start(date.fromisoformat(params["start_date"]))
+            end = _day_start(date.fromisoformat(params["end_date"])) + 86400
+        else:
+            start, end = today, today + days * 86400
+        sections[RESPONSE_DAILY] = _section(
+            builder, _split(params["daily"]), start - utc_offset, end - utc_offset, 86400, rng
+        )
+
+    builder.StartObject(RESPONSE_FIELDS)
+    builder.PrependFloat32Slot(RESPONSE_LATITUDE, latitude, 0.0)
+    builder.PrependFloat32Slot(RESPONSE_LONGITUDE, longitude, 0.0)
+    builder.PrependFloat32Slot(RESPONSE_ELEVATION, float(rng.uniform(0, 500)), 0.0)
+    builder.PrependFloat32Slot(RESPONSE_GENERATION_TIME, 0.5, 0.0)
+    builder.PrependInt32Slot(RESPONSE_UTC_OFFSET, utc_offset, 0)
+    for slot, offset in sections.items():
+        builder.PrependUOffsetTRelativeSlot(slot, offset, 0)
+    builder.Finish(builder.EndObject())
+    data = bytes(builder.Output())
+    return len(data).to_bytes(4, "little") + data
+
+
+def encode_forecast(params: dict, now: int | None = None) -> bytes:
+    """
+    Encode a forecast response for every location of a request, latitude and
+    longitude may be comma-separated lists like multi-location requests.
+    """
+    now = int(time.time()) if now is None else now
+    latitudes = [float(value) for value in params["latitude"].split(",")]
+    longitudes = [float(value) for value in params["longitude"].split(",")]
+    return b"".join(
+        encode_location(latitude, longitude, params, now)
+        for latitude, longitude in zip(latitudes, longitudes)
+    )
+
+
+def geocode(name: str, count: int = 1) -> dict:
+    """
+    Geocoding API response for a name. Names starting with "nowhere" have no
+    results, any other name resolves to coordinates derived from its hash.
+    """
+    if name.lower().startswith("nowhere"):
+        return {"generationtime_ms": 0.4}
+    digest = int.from_bytes(hashlib.blake2b(name.lower().encode()).digest()[:8], "little")
+    rng = random.Random(digest)
+    results = [
+        {
+            "id": digest % 10_000_000 + i,
+            "name": name.title(),
+            "latitude": round(rng.uniform(-60, 70), 5),
+            "longitude": round(rng.uniform(-180, 180), 5),
+            "elevation": round(rng.uniform(0, 500), 1),
+            "feature_code": "PPLA",
+            "country_code": "XX",
+            "timezone": "UTC",
+            "population": rng.randrange(1_000, 5_000_000),
+            "country": "Testland",
+        }
+        for i in range(max(count, 1))
+    ]
+    return {"results": results, "generationtime_ms": 0.4}
+
+
+class OpenMeteoHandler(BaseHTTPRequestHandler):
+    """
+    Serves /v1/forecast and /v1/archive (GET or form POST) and /v1/search after
+    the configured latency.
+    """
+
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately, Nagle would hold the body for a delayed ACK
+    disable_nagle_algorithm = True
+    latency = 0.0
+    jitter = 0.0
+
+    def _respond(self, params: dict) -> None:
+        delay = self.latency + random.uniform(0, self.jitter)
+        if delay:
+            time.sleep(delay)
+        path = urlparse(self.path).path
+        try:
+            if path.endswith("/search"):
+                body = json.dumps(
+                    geocode(params.get("name", ""), int(params.get("count", 1)))
+                ).encode()
+                content_type = "application/json"
+            elif path.endswith("/forecast") or path.endswith("/archive"):
+                body = encode_forecast(params)
+                content_type = "application/octet-stream"
+            else:
+                self.send_error(404)
+                return
+        except (KeyError, ValueError) as e:
+            body = json.dumps({"error": True, "reason": str(e)}).encode()
+            self.send_response(400)
+            self.send_header("Content-Type", "application/json")
+        else:
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        query = parse_qs(urlparse(self.path).query)
+        self._respond({key: values[0] for key, values in query.items()})
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length", 0))
+        form = parse_qs(self.rfile.read(length).decode())
+        self._respond({key: values[0] for key, values in form.items()})
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+
+def start_server(
+    host: str = "127.0.0.1", port: int = 0, latency: float = 0.0, jitter: float = 0.0
+) -> tuple[ThreadingHTTPServer, str]:
+    """
+    Start the stand-in in a background thread.
+
+    Args:
+        host: Interface to bind.
+        port: Port to bind, 0 for any free port.
+        latency: Seconds added to every response.
+        jitter: Up to this many extra seconds, uniformly random.
+
+    Returns:
+        tuple: The server (call shutdown() to stop it) and its base URL.
+    """
+    handler = type(
+        "ConfiguredHandler", (OpenMeteoHandler,), {"latency": latency, "jitter": jitter}
+    )
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local Open-Meteo stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds per response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random seconds")
+    args = parser.parse_args()
+
+    server, url = start_server(args.host, args.port, args.latency, args.jitter)
+    print(f"Forecast:  {url}/v1/forecast")
+    print(f"Archive:   {url}/v1/archive")
+    print(f"Geocoding: {url}/v1/search")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
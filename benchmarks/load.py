@@ -0,0 +1,244 @@
+"""
+# benchmarks/load.py
+# This module drives the API at a target request rate and reports latency percentiles
+# and achieved throughput per endpoint. Requests are sent on a fixed schedule (open
+# loop), so a slow server shows up as latency instead of a lower request rate.
+
+Usage:
+    python -m benchmarks.load [--scenario mixed] [--rps 50] [--duration 30] [--output load.json]
+
+Without --url a uvicorn worker is started against the local Open-Meteo stand-in
+(benchmarks.fake_openmeteo) and the configured database. --seed writes weather
+records for the exports first and deletes them afterwards, use a scratch database.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from contextlib import contextmanager
+from typing import Iterator, Optional
+from urllib.parse import urlencode
+
+from benchmarks.fake_openmeteo import start_server
+from benchmarks.micro import BENCHMARK_LOCATION, _cleanup, _seed
+from benchmarks.report import ROOT, environment, summarize, write_report
+from benchmarks.startup import _free_port
+
+CITIES = [
+    "Berlin", "Paris", "London", "Hanoi", "Tokyo", "Lima", "Nairobi", "Oslo",
+    "Sydney", "Toronto", "Cairo", "Dublin", "Madrid", "Seoul", "Quito", "Nowhere",
+]
+
+# Endpoint and relative weight of each scenario, query parameters are drawn per request
+SCENARIOS = {
+    "weather": {
+        "/weather/current": 4,
+        "/weather/daily": 3,
+        "/weather/hourly": 2,
+        "/weather/daily?format=columnar": 1,
+    },
+    "export": {
+        "/export/json": 2,
+        "/export/csv": 2,
+        "/export/parquet": 1,
+        "/export/arrow": 1,
+    },
+}
+SCENARIOS["mixed"] = {
+    **{path: weight * 2 for path, weight in SCENARIOS["weather"].items()},
+    **SCENARIOS["export"],
+}
+
+
+def _request_path(endpoint: str, rng: random.Random) -> str:
+    path, _, query = endpoint.partition("?")
+    params = dict(pair.split("=") for pair in query.split("&") if pair)
+    if path.startswith("/weather/"):
+        params["name"] = rng.choice(CITIES)
+    else:
+        params["location"] = BENCHMARK_LOCATION
+    return f"{path}?{urlencode(params)}"
+
+
+@contextmanager
+def local_app(latency: float, jitter: float, timeout: float = 30.0) -> Iterator[str]:
+    """
+    Start the Open-Meteo stand-in and a uvicorn worker using it.
+
+    Yields:
+        str: Base URL of the worker.
+    """
+    server, upstream = start_server(latency=latency, jitter=jitter)
+    port = _free_port()
+    env = {
+        **os.environ,
+        "OPENMETEO_FORECAST_URL": f"{upstream}/v1/forecast",
+        "OPENMETEO_GEOCODING_URL": f"{upstream}/v1/search",
+    }
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError("uvicorn exited before answering")
+            try:
+                with urllib.request.urlopen(url, timeout=1):
+                    break
+            except (urllib.error.URLError, ConnectionError):
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"No response from {url} within {timeout}s")
+                time.sleep(0.05)
+        yield url
+    finally:
+        process.terminate()
+        process.wait()
+        server.shutdown()
+
+
+async def run_load(
+    url: str,
+    scenario: str,
+    rps: float,
+    duration: float,
+    max_in_flight: int = 256,
+    timeout: float = 30.0,
+    seed: int = 0,
+) -> dict:
+    """
+    Send requests at rps for duration seconds and measure each one.
+
+    Requests due while max_in_flight are pending are skipped and counted
+    as dropped, the schedule is never shifted to wait for the server.
+
+    Returns:
+        dict: Per-endpoint and overall latency summaries, achieved throughput,
+            status counts and dropped requests.
+    """
+    from niquests import AsyncSession
+
+    rng = random.Random(seed)
+    endpoints = list(SCENARIOS[scenario])
+    weights = list(SCENARIOS[scenario].values())
+    samples: dict[str, list[float]] = {endpoint: [] for endpoint in endpoints}
+    statuses: dict[str, dict[str, int]] = {endpoint: {} for endpoint in endpoints}
+    pending: set[asyncio.Task] = set()
+    dropped = 0
+    clock = time.perf_counter
+
+    async def send(session, endpoint: str, path: str) -> None:
+        start = clock()
+        try:
+            response = await session.get(url + path, timeout=timeout)
+            status = str(response.status_code)
+            # Streamed exports count until the last byte
+            _ = response.content
+        except Exception as e:
+            status = type(e).__name__
+        samples[endpoint].append(clock() - start)
+        counts = statuses[endpoint]
+        counts[status] = counts.get(status, 0) + 1
+
+    async with AsyncSession(pool_maxsize=max_in_flight) as session:
+        total = int(rps * duration)
+        started = clock()
+        for i in range(total):
+            delay = started + i / rps - clock()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if len(pending) >= max_in_flight:
+                dropped += 1
+                continue
+            endpoint = rng.choices(endpoints, weights)[0]
+            task = asyncio.create_task(send(session, endpoint, _request_path(endpoint, rng)))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+        if pending:
+            await asyncio.wait(pending)
+        elapsed = clock() - started
+
+    all_samples = [sample for values in samples.values() for sample in values]
+    errors = sum(
+        count
+        for counts in statuses.values()
+        for status, count in counts.items()
+        if not status.startswith("2")
+    )
+    return {
+        "target_rps": rps,
+        "achieved_rps": round(len(all_samples) / elapsed, 1),
+        "duration_s": round(elapsed, 2),
+        "dropped": dropped,
+        "errors": errors,
+        "overall": summarize(all_samples),
+        "endpoints": [
+            {"name": endpoint, **summarize(samples[endpoint]), "statuses": statuses[endpoint]}
+            for endpoint in endpoints
+            if samples[endpoint]
+        ],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test the API")
+    parser.add_argument("--scenario", choices=list(SCENARIOS), default="mixed")
+    parser.add_argument("--rps", type=float, default=50.0, help="Target requests per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of load")
+    parser.add_argument("--max-in-flight", type=int, default=256,
+                        help="Pending requests before new ones are dropped")
+    parser.add_argument("--url", help="Running API to test instead of a local worker")
+    parser.add_argument("--upstream-latency", type=float, default=0.05,
+                        help="Stand-in latency in seconds, local worker only")
+    parser.add_argument("--upstream-jitter", type=float, default=0.02,
+                        help="Extra random stand-in latency in seconds, local worker only")
+    parser.add_argument("--seed", type=int, metavar="ROWS",
+                        help="Seed this many weather records for the exports")
+    parser.add_argument("--output", help="Report file, JSON on stdout if omitted")
+    args = parser.parse_args()
+
+    loc_id: Optional[int] = _seed(args.seed) if args.seed else None
+    try:
+        if args.url:
+            url = args.url.rstrip("/")
+            results = asyncio.run(
+                run_load(url, args.scenario, args.rps, args.duration, args.max_in_flight)
+            )
+        else:
+            with local_app(args.upstream_latency, args.upstream_jitter) as url:
+                results = asyncio.run(
+                    run_load(url, args.scenario, args.rps, args.duration, args.max_in_flight)
+                )
+    finally:
+        if loc_id is not None:
+            _cleanup(loc_id)
+
+    write_report(
+        {
+            "suite": "load",
+            "environment": environment(),
+            "config": {
+                "scenario": args.scenario,
+                "url": args.url,
+                "upstream_latency": None if args.url else args.upstream_latency,
+                "seeded_rows": args.seed,
+            },
+            "results": results,
+        },
+        args.output,
+    )
+
+
+if __name__ == "__main__":
+    main()
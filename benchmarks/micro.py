@@ -0,0 +1,358 @@
+"""
+# benchmarks/micro.py
+# This module runs micro-benchmarks of the hot functions: forecast parsing on responses
+# from the local Open-Meteo stand-in, weather code conversion, and with --db the record
+# streaming (_get_all_data), every exporter on a seeded dataset and bulk ingestion.
+
+Usage:
+    python -m benchmarks.micro [--filter parse] [--db --rows 20000] [--output micro.json]
+
+The --db benchmarks write their rows to the configured database under the location
+BENCHMARK_LOCATION and delete them afterwards, use a scratch database.
+"""
+
+import argparse
+import asyncio
+import time
+from datetime import date, timedelta
+from typing import Awaitable, Callable
+
+import numpy as np
+from openmeteo_sdk.WeatherApiResponse import WeatherApiResponse
+
+from benchmarks.fake_openmeteo import WMO_CODES, encode_forecast, start_server
+from benchmarks.report import environment, summarize, write_report
+from controller.weather.columnar import parse_columnar
+from controller.weather.current import parse_current_weather
+from controller.weather.daily import parse_daily_forecast
+from controller.weather.hourly import parse_hourly_forecast
+from controller.weather.variables import REGISTRY, get_plan
+from utils import convert_weather_code, convert_weather_codes
+
+BENCHMARK_LOCATION = "Benchmarkville"
+# Minimum measured time per benchmark, iterations are added until it is reached
+MIN_TIME = 0.5
+MAX_ITERATIONS = 100_000
+
+
+def decode(data: bytes) -> WeatherApiResponse:
+    """
+    Decode the first location of a size-prefixed forecast response.
+    """
+    length = int.from_bytes(data[:4], "little")
+    return WeatherApiResponse.GetRootAs(data[4:4 + length], 0)
+
+
+def _response(kind: str, names=None, forecast_days: int = 7):
+    plan = get_plan(kind, names)
+    params = {
+        "latitude": "52.52",
+        "longitude": "13.41",
+        kind: plan.param,
+        "forecast_days": str(forecast_days),
+    }
+    return decode(encode_forecast(params, now=1_700_000_000)), plan
+
+
+def run_sync(fn: Callable[[], object], min_time: float = MIN_TIME) -> list[float]:
+    """
+    Call fn until min_time has been spent, after a warm-up call.
+
+    Returns:
+        list[float]: Duration of each call in seconds.
+    """
+    fn()
+    samples = []
+    clock = time.perf_counter
+    deadline = clock() + min_time
+    while clock() < deadline and len(samples) < MAX_ITERATIONS:
+        start = clock()
+        fn()
+        samples.append(clock() - start)
+    return samples
+
+
+async def run_async(
+    fn: Callable[[], Awaitable[object]], min_time: float = MIN_TIME, min_iterations: int = 3
+) -> list[float]:
+    """
+    Await fn until min_time has been spent and at least min_iterations calls.
+    """
+    await fn()
+    samples = []
+    clock = time.perf_counter
+    deadline = clock() + min_time
+    while (clock() < deadline or len(samples) < min_iterations) and len(
+        samples
+    ) < MAX_ITERATIONS:
+        start = clock()
+        await fn()
+        samples.append(clock() - start)
+    return samples
+
+
+def parsing_benchmarks() -> dict[str, Callable[[], object]]:
+    """
+    Parsing of upstream responses, default and full variable selections.
+    """
+    daily, daily_plan = _response("daily", forecast_days=16)
+    daily_all, daily_all_plan = _response("daily", list(REGISTRY["daily"]), 16)
+    hourly, hourly_plan = _response("hourly")
+    hourly_all, hourly_all_plan = _response("hourly", list(REGISTRY["hourly"]), 16)
+    current, current_plan = _response("current")
+    return {
+        "parse_daily_forecast": lambda: parse_daily_forecast(daily, daily_plan),
+        "parse_daily_forecast[all variables]": lambda: parse_daily_forecast(
+            daily_all, daily_all_plan
+        ),
+        "parse_daily_columnar[all variables]": lambda: parse_columnar(
+            daily_all, daily_all.Daily(), daily_all_plan
+        ),
+        "parse_hourly_forecast": lambda: parse_hourly_forecast(hourly, hourly_plan),
+        "parse_hourly_forecast[all variables, 16 days]": lambda: parse_hourly_forecast(
+            hourly_all, hourly_all_plan
+        ),
+        "parse_hourly_columnar[all variables, 16 days]": lambda: parse_columnar(
+            hourly_all, hourly_all.Hourly(), hourly_all_plan
+        ),
+        "parse_current_weather": lambda: parse_current_weather(current, current_plan),
+    }
+
+
+def weather_code_benchmarks() -> dict[str, Callable[[], object]]:
+    """
+    Weather code labels, one code at a time and vectorized.
+    """
+    codes = np.random.default_rng(0).choice(WMO_CODES, 10_000)
+    scalar_codes = codes[:1000].astype(int).tolist()
+    return {
+        "convert_weather_code[1000 codes]": lambda: [
+            convert_weather_code(code) for code in scalar_codes
+        ],
+        "convert_weather_codes[10000 codes]": lambda: convert_weather_codes(codes),
+    }
+
+
+async def _upstream_benchmarks(results: list, latency: float, min_time: float) -> None:
+    """
+    Full forecast fetches against the stand-in, caching bypassed.
+    """
+    import controller.weather.daily as daily
+    from controller.upstream import close_session
+
+    server, url = start_server(latency=latency)
+    daily.URL = f"{url}/v1/forecast"
+    plan = get_plan("daily")
+    start_date = date.today().isoformat()
+    end_date = (date.today() + timedelta(days=7)).isoformat()
+    try:
+        samples = await run_async(
+            lambda: daily._fetch_daily_forecast(52.52, 13.41, plan, start_date, end_date),
+            min_time,
+        )
+        results.append({"name": "fetch_daily_forecast[stand-in]", **summarize(samples)})
+    finally:
+        await close_session()
+        server.shutdown()
+
+
+def _seed(rows: int) -> int:
+    """
+    Write rows weather records for BENCHMARK_LOCATION, returns its ID.
+    """
+    from model.db import SessionLocal, create_tables
+    from model.location import Location
+    from model.weather import Weather
+
+    create_tables()
+    with SessionLocal() as db:
+        location = Location.get_by_name(db, BENCHMARK_LOCATION)
+        if location is None:
+            location = Location(
+                name=BENCHMARK_LOCATION, lat=52.52, long=13.41, country="Testland"
+            ).save(db)
+        first = date(1970, 1, 1)
+        rng = np.random.default_rng(0)
+        records = [
+            {
+                "loc_id": location.id,
+                "date": first + timedelta(days=i),
+                "temp": float(rng.normal(15, 8)),
+                "condition": convert_weather_code(int(rng.choice(WMO_CODES))),
+                "wind_speed": float(rng.gamma(1.5, 3.0)),
+                "humidity": int(rng.integers(0, 100)),
+                "triggered_user": "benchmark",
+                "api_source": "benchmark",
+            }
+            for i in range(rows)
+        ]
+        for i in range(0, rows, 5000):
+            Weather.upsert_many(db, records[i:i + 5000])
+        return location.id
+
+
+def _cleanup(loc_id: int) -> None:
+    from sqlalchemy import delete
+
+    from model.db import SessionLocal
+    from model.location import Location
+    from model.weather import Weather
+
+    with SessionLocal() as db:
+        db.execute(delete(Weather).where(Weather.loc_id == loc_id))
+        db.execute(delete(Location).where(Location.id == loc_id))
+        db.commit()
+
+
+async def _drain(response) -> int:
+    size = 0
+    async for part in response.body_iterator:
+        size += len(part)
+    return size
+
+
+def _ingest_body(loc_id: int, rows: int) -> list[bytes]:
+    """
+    NDJSON lines of rows records for loc_id, dated before the seeded ones.
+    """
+    import json
+
+    first = date(1900, 1, 1)
+    rng = np.random.default_rng(1)
+    return [
+        json.dumps(
+            {
+                "loc_id": loc_id,
+                "date": (first + timedelta(days=i)).isoformat(),
+                "temp": float(rng.normal(15, 8)),
+                "condition": "Clear sky",
+                "wind_speed": float(rng.gamma(1.5, 3.0)),
+                "humidity": int(rng.integers(0, 100)),
+                "triggered_user": "benchmark",
+                "api_source": "benchmark",
+            }
+        ).encode() + b"\n"
+        for i in range(rows)
+    ]
+
+
+async def _ingest_benchmark(results: list, loc_id: int, rows: int, min_time: float) -> None:
+    """
+    Bulk ingestion as POST /weather/bulk runs it on an NDJSON body: parsing,
+    validation, COPY and upsert, rollup refresh, one transaction per chunk.
+    The first call inserts, the measured ones update the same records.
+    """
+    from controller.ingest_controller import ingest_chunk, iter_json_chunks, validated_chunks
+    from model.db import AsyncSessionLocal
+
+    lines = _ingest_body(loc_id, rows)
+
+    async def body():
+        for line in lines:
+            yield line
+
+    async def ingest():
+        async with AsyncSessionLocal() as db:
+            async for records, validation in validated_chunks(iter_json_chunks(body(), True)):
+                await ingest_chunk(db, records, await validation)
+
+    summary = summarize(await run_async(ingest, min_time))
+    results.append(
+        {
+            "name": f"bulk_ingest[{rows} rows]",
+            **summary,
+            "rows_per_s": round(rows / (summary["mean_us"] / 1e6)),
+        }
+    )
+
+
+async def _db_benchmarks(
+    results: list, loc_id: int, rows: int, min_time: float, name_filter: str = ""
+) -> None:
+    """
+    Record streaming and every exporter, reported per export with rows/s and MB/s,
+    then bulk ingestion of as many rows.
+    """
+    from model.db import AsyncSessionLocal, dispose_engines
+    from router import export_router as export
+
+    location = BENCHMARK_LOCATION
+
+    async def get_all_data():
+        async with AsyncSessionLocal() as db:
+            async for _ in export._get_all_data(db, location):
+                pass
+        return 0
+
+    async def export_csv():
+        async with AsyncSessionLocal() as db:
+            return await _drain(await export.export_csv(db, location, None, None))
+
+    exporters = {
+        "_get_all_data": get_all_data,
+        "export_json": lambda: export.export_json(location, None, None),
+        "export_xml": lambda: export.export_xml(location, None, None),
+        "export_csv": export_csv,
+        "export_parquet": lambda: export.export_parquet(location, None, None, None, "zstd"),
+        "export_arrow": lambda: export.export_arrow(location, None, None, None, "none"),
+    }
+    try:
+        for name, exporter in exporters.items():
+            if name_filter not in name:
+                continue
+            sizes = []
+
+            async def run():
+                result = await exporter()
+                sizes.append(result if isinstance(result, int) else await _drain(result))
+
+            samples = await run_async(run, min_time)
+            summary = summarize(samples)
+            mean = summary["mean_us"] / 1e6
+            results.append(
+                {
+                    "name": f"{name}[{rows} rows]",
+                    **summary,
+                    "rows_per_s": round(rows / mean),
+                    "mb_per_s": round(sizes[-1] / mean / 1e6, 2) if sizes[-1] else None,
+                    "bytes": sizes[-1],
+                }
+            )
+        if name_filter in "bulk_ingest":
+            await _ingest_benchmark(results, loc_id, rows, min_time)
+    finally:
+        await dispose_engines()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Micro-benchmarks")
+    parser.add_argument("--filter", default="", help="Only run benchmarks containing this")
+    parser.add_argument("--min-time", type=float, default=MIN_TIME, help="Seconds per benchmark")
+    parser.add_argument("--upstream-latency", type=float, default=0.0,
+                        help="Stand-in latency for fetch_daily_forecast, seconds")
+    parser.add_argument("--db", action="store_true", help="Run the database benchmarks")
+    parser.add_argument("--rows", type=int, default=20_000, help="Rows seeded for --db")
+    parser.add_argument("--output", help="Report file, JSON on stdout if omitted")
+    args = parser.parse_args()
+
+    results = []
+    benchmarks = {**parsing_benchmarks(), **weather_code_benchmarks()}
+    for name, fn in benchmarks.items():
+        if args.filter in name:
+            results.append({"name": name, **summarize(run_sync(fn, args.min_time))})
+    if args.filter in "fetch_daily_forecast[stand-in]":
+        asyncio.run(_upstream_benchmarks(results, args.upstream_latency, args.min_time))
+    if args.db:
+        loc_id = _seed(args.rows)
+        try:
+            asyncio.run(_db_benchmarks(results, loc_id, args.rows, args.min_time, args.filter))
+        finally:
+            _cleanup(loc_id)
+
+    write_report(
+        {"suite": "micro", "environment": environment(), "results": results}, args.output
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+# benchmarks/report.py
+# This module holds the result format shared by the benchmarks: latency summaries,
+# run metadata and the JSON report compared between runs by benchmarks.compare.
+"""
+
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def summarize(samples: list[float]) -> dict:
+    """
+    Summarize latency samples given in seconds.
+
+    Returns:
+        dict: count, mean, p50, p90, p99 and max in microseconds, and
+            operations per second at the mean.
+    """
+    values = np.asarray(samples, dtype=np.float64) * 1e6
+    if not len(values):
+        return {"count": 0}
+    p50, p90, p99 = np.percentile(values, [50, 90, 99])
+    mean = float(values.mean())
+    return {
+        "count": int(len(values)),
+        "mean_us": round(mean, 2),
+        "p50_us": round(float(p50), 2),
+        "p90_us": round(float(p90), 2),
+        "p99_us": round(float(p99), 2),
+        "max_us": round(float(values.max()), 2),
+        "ops_per_s": round(1e6 / mean, 1) if mean else None,
+    }
+
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment() -> dict:
+    """
+    Describe where the benchmark ran, so reports from different machines
+    are not compared by mistake.
+    """
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def write_report(report: dict, output: str | None) -> None:
+    """
+    Write a report as JSON to a file, or to stdout when output is None or "-".
+    """
+    text = json.dumps(report, indent=2)
+    if output in (None, "-"):
+        print(text)
+        return
+    with open(output, "w") as report_file:
+        report_file.write(text + "\n")
+    print(f"Report written to {output}", file=sys.stderr)
@@ -0,0 +1,152 @@
+"""
+# benchmarks/startup.py
+# This module measures the cold start of the backend: how long `import main` takes
+# in a fresh interpreter, and how long a fresh uvicorn worker takes to answer its
+# first request. Each run starts a new process so nothing is shared between runs.
+
+Usage:
+    python -m benchmarks.startup [--runs 5] [--json]
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that should only be loaded on demand, reported if `import main` loads them
+HEAVY_MODULES = ["pandas", "pyarrow", "niquests", "openmeteo_requests", "asyncpg"]
+
+IMPORT_SCRIPT = f"""
+import json, sys, time
+start = time.perf_counter()
+import main
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    "seconds": elapsed,
+    "loaded": [name for name in {HEAVY_MODULES!r} if name in sys.modules],
+}}))
+"""
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_import() -> dict:
+    """
+    Import main in a fresh interpreter.
+
+    Returns:
+        dict: seconds spent importing, and which HEAVY_MODULES were loaded
+    """
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SCRIPT],
+        cwd=ROOT,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def measure_first_response(path: str = "/", timeout: float = 30.0) -> float:
+    """
+    Start a uvicorn worker and poll it until the first successful response.
+
+    Args:
+        path: Endpoint requested, the root endpoint does not touch the database
+        timeout: Seconds to wait before giving up
+
+    Returns:
+        float: Seconds from process start to the first 2xx response
+    """
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}{path}"
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=ROOT,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            if process.poll() is not None:
+                raise RuntimeError(
+                    f"uvicorn exited early: {process.stderr.read().decode()}"
+                )
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if 200 <= response.status < 300:
+                        return time.perf_counter() - start
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.005)
+        raise TimeoutError(f"No response from {url} within {timeout}s")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def _summary(samples: list[float]) -> dict:
+    return {
+        "min_ms": round(min(samples) * 1000, 1),
+        "median_ms": round(statistics.median(samples) * 1000, 1),
+        "max_ms": round(max(samples) * 1000, 1),
+    }
+
+
+def run(runs: int, path: str) -> dict:
+    """
+    Run both measurements runs times.
+
+    Returns:
+        dict: import and first_response timings, heavy modules loaded by import
+    """
+    imports = [measure_import() for _ in range(runs)]
+    first_responses = [measure_first_response(path) for _ in range(runs)]
+    return {
+        "runs": runs,
+        "python": sys.version.split()[0],
+        "import": _summary([sample["seconds"] for sample in imports]),
+        "first_response": _summary(first_responses),
+        "heavy_modules_loaded": sorted(
+            {name for sample in imports for name in sample["loaded"]}
+        ),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure backend cold start time")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh processes per measurement")
+    parser.add_argument("--path", default="/", help="Endpoint for the first request")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    args = parser.parse_args()
+
+    results = run(args.runs, args.path)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"Python {results['python']}, {results['runs']} runs")
+    for name in ("import", "first_response"):
+        timings = results[name]
+        print(
+            f"{name:>15}: median {timings['median_ms']} ms "
+            f"(min {timings['min_ms']}, max {timings['max_ms']})"
+        )
+    loaded = results["heavy_modules_loaded"]
+    print(f"{'heavy modules':>15}: {', '.join(loaded) if loaded else 'none'}")
+
+
+if __name__ == "__main__":
+    main()
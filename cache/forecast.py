@@ -0,0 +1,532 @@
+"""
+# cache/forecast.py
+# This module implements the forecast cache and its pluggable storage backends.
+# Parsed forecast dictionaries are cached, not raw upstream HTTP bodies.
+"""
+import asyncio
+import contextlib
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import time
+from typing import Any, Optional
+from urllib.parse import urlparse
+
+import orjson
+
+from cache.lru import LRUCache, MISSING
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class CacheBackend:
+    """
+    Base class of forecast cache storage backends.
+
+    Backends map string keys to forecast dictionaries with a per-entry TTL.
+    The batch operations default to looping over the single-key ones.
+    """
+
+    name = "base"
+
+    async def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for key, or None."""
+        raise NotImplementedError
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        """Store value under key for ttl seconds."""
+        raise NotImplementedError
+
+    async def delete(self, key: str) -> None:
+        """Remove key from the cache."""
+        raise NotImplementedError
+
+    async def remaining(self, key: str) -> Optional[float]:
+        """Return the seconds key has left to live, None if not cached."""
+        raise NotImplementedError
+
+    async def get_many(self, keys: list[str]) -> list[Optional[Any]]:
+        """Return the cached values for keys, None for misses."""
+        return [await self.get(key) for key in keys]
+
+    async def remaining_many(self, keys: list[str]) -> list[Optional[float]]:
+        """Return the seconds keys have left to live, None for misses."""
+        return [await self.remaining(key) for key in keys]
+
+    async def set_many(self, items: dict[str, Any], ttl: float) -> None:
+        """Store every key/value pair for ttl seconds."""
+        for key, value in items.items():
+            await self.set(key, value, ttl)
+
+    async def clear(self) -> None:
+        """Remove every entry."""
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        """Release the backend resources."""
+
+
+def _dumps(value: Any) -> bytes:
+    # Columnar forecasts hold NumPy arrays, they are stored as JSON lists
+    return orjson.dumps(value, option=orjson.OPT_SERIALIZE_NUMPY)
+
+
+def _loads(data: bytes) -> Any:
+    return orjson.loads(data)
+
+
+class MemoryBackend(CacheBackend):
+    """
+    Process-local backend, values are stored as objects without serialization.
+    """
+
+    name = "memory"
+
+    def __init__(self, max_size: int = 4096) -> None:
+        self._cache = LRUCache(max_size=max_size)
+
+    async def get(self, key: str) -> Optional[Any]:
+        value = self._cache.get(key)
+        return None if value is MISSING else value
+
+    async def remaining(self, key: str) -> Optional[float]:
+        return self._cache.remaining(key)
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        self._cache.set(key, value, ttl=ttl)
+
+    async def delete(self, key: str) -> None:
+        self._cache.invalidate(key)
+
+    async def clear(self) -> None:
+        self._cache.clear()
+
+
+class MmapBackend(CacheBackend):
+    """
+    Shared-memory backend for several workers on one host.
+
+    The file (in /dev/shm when available) is a direct-mapped table of fixed
+    size slots. A slot holds the key hash, the absolute expiry time and the
+    JSON payload; colliding keys overwrite each other and payloads larger
+    than a slot are not cached. Access is serialized with flock, which only
+    covers a memory copy.
+
+    The file is sized and formatted by the first worker. A worker configured
+    with another layout refuses to start instead of resizing a file that
+    other workers have mapped.
+    """
+
+    name = "mmap"
+    _MAGIC = b"WAISTFC1"
+    _HEADER = struct.Struct("<8sII")
+    _SLOT_HEADER = struct.Struct("<QdI")
+    # Seconds between attempts to take a contended lock, doubling up to the maximum
+    _LOCK_RETRY = 0.0005
+    _LOCK_RETRY_MAX = 0.01
+
+    def __init__(self, path: str = "", slots: int = 1024, slot_size: int = 65536) -> None:
+        if not path:
+            base = "/dev/shm" if os.path.isdir("/dev/shm") else "/tmp"
+            path = os.path.join(base, "waist-forecast-cache")
+        self.path = path
+        self.slots = slots
+        self.slot_size = slot_size
+        self.capacity = slot_size - self._SLOT_HEADER.size
+        size = self._HEADER.size + slots * slot_size
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        # Blocking is fine here, the backend is built before serving
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            self._map = self._open_map(size)
+        except BaseException:
+            # Closing the file releases the lock
+            os.close(self._fd)
+            raise
+        fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _open_map(self, size: int) -> mmap.mmap:
+        """
+        Map the file, formatting it if it is new. Called with the lock held.
+
+        Raises:
+            ValueError: If the file has another size or layout.
+        """
+        current = os.fstat(self._fd).st_size
+        if current == 0:
+            os.ftruncate(self._fd, size)
+        elif current != size:
+            raise ValueError(
+                f"Forecast cache file {self.path} is {current} bytes, {size} expected "
+                f"for {self.slots} slots of {self.slot_size} bytes; another worker uses "
+                "another layout, configure the same one or another mmap_path"
+            )
+        file_map = mmap.mmap(self._fd, size)
+        header = self._HEADER.unpack_from(file_map, 0)
+        if header == (bytes(len(self._MAGIC)), 0, 0):
+            self._HEADER.pack_into(file_map, 0, self._MAGIC, self.slots, self.slot_size)
+        elif header != (self._MAGIC, self.slots, self.slot_size):
+            file_map.close()
+            raise ValueError(f"Forecast cache file {self.path} has an unknown layout")
+        return file_map
+
+    @contextlib.asynccontextmanager
+    async def _locked(self, operation: int):
+        """
+        Hold the file lock around a memory copy. The lock is taken without
+        blocking and retried after yielding, so contention with another
+        worker does not stall this worker's event loop.
+        """
+        delay = self._LOCK_RETRY
+        while True:
+            try:
+                fcntl.flock(self._fd, operation | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self._LOCK_RETRY_MAX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        # 0 marks an empty slot
+        return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little") or 1
+
+    def _offset(self, key_hash: int) -> int:
+        return self._HEADER.size + (key_hash % self.slots) * self.slot_size
+
+    async def get(self, key: str) -> Optional[Any]:
+        key_hash = self._hash(key)
+        offset = self._offset(key_hash)
+        async with self._locked(fcntl.LOCK_SH):
+            slot_hash, expires_at, length = self._SLOT_HEADER.unpack_from(self._map, offset)
+            if slot_hash != key_hash or expires_at <= time.time():
+                return None
+            start = offset + self._SLOT_HEADER.size
+            payload = self._map[start:start + length]
+        return _loads(payload)
+
+    async def remaining(self, key: str) -> Optional[float]:
+        key_hash = self._hash(key)
+        offset = self._offset(key_hash)
+        async with self._locked(fcntl.LOCK_SH):
+            slot_hash, expires_at, _ = self._SLOT_HEADER.unpack_from(self._map, offset)
+        left = expires_at - time.time()
+        return left if slot_hash == key_hash and left > 0 else None
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        payload = _dumps(value)
+        if len(payload) > self.capacity:
+            return
+        key_hash = self._hash(key)
+        offset = self._offset(key_hash)
+        start = offset + self._SLOT_HEADER.size
+        async with self._locked(fcntl.LOCK_EX):
+            self._map[start:start + len(payload)] = payload
+            self._SLOT_HEADER.pack_into(
+                self._map, offset, key_hash, time.time() + ttl, len(payload)
+            )
+
+    async def delete(self, key: str) -> None:
+        key_hash = self._hash(key)
+        offset = self._offset(key_hash)
+        async with self._locked(fcntl.LOCK_EX):
+            if self._SLOT_HEADER.unpack_from(self._map, offset)[0] == key_hash:
+                self._SLOT_HEADER.pack_into(self._map, offset, 0, 0.0, 0)
+
+    async def clear(self) -> None:
+        async with self._locked(fcntl.LOCK_EX):
+            for slot in range(self.slots):
+                offset = self._HEADER.size + slot * self.slot_size
+                self._SLOT_HEADER.pack_into(self._map, offset, 0, 0.0, 0)
+
+    async def close(self) -> None:
+        self._map.close()
+        os.close(self._fd)
+
+
+class RedisError(Exception):
+    """
+    Error reply returned by a Redis-protocol server.
+    """
+
+
+class RedisBackend(CacheBackend):
+    """
+    Backend for any server speaking the Redis protocol (RESP2).
+
+    Uses a small pool of asyncio connections, GET/SET EX/DEL commands and
+    pipelining for the batch operations. Keys are namespaced with a prefix.
+    """
+
+    name = "redis"
+
+    def __init__(
+        self,
+        url: str = "redis://localhost:6379/0",
+        pool_size: int = 10,
+        timeout: float = 1.0,
+        prefix: str = "waist:forecast:",
+    ) -> None:
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.timeout = timeout
+        self.prefix = prefix
+        self._pool: asyncio.LifoQueue = asyncio.LifoQueue()
+        self._slots = asyncio.Semaphore(pool_size)
+
+    @staticmethod
+    def _encode(*args) -> bytes:
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode()
+            parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        return b"".join(parts)
+
+    @classmethod
+    async def _read_reply(cls, reader: asyncio.StreamReader) -> Any:
+        line = await reader.readline()
+        if not line:
+            raise ConnectionError("Connection closed by the cache server")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest
+        if kind == b"-":
+            raise RedisError(rest.decode())
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            if length < 0:
+                return None
+            data = await reader.readexactly(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            length = int(rest)
+            if length < 0:
+                return None
+            return [await cls._read_reply(reader) for _ in range(length)]
+        raise RedisError(f"Unexpected reply: {line!r}")
+
+    async def _connect(self) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        setup = []
+        if self.password:
+            setup.append(("AUTH", self.password))
+        if self.db:
+            setup.append(("SELECT", self.db))
+        try:
+            for command in setup:
+                writer.write(self._encode(*command))
+                await writer.drain()
+                await self._read_reply(reader)
+        except BaseException:
+            writer.close()
+            raise
+        return reader, writer
+
+    async def _execute(self, commands: list[tuple]) -> list[Any]:
+        """
+        Send commands as one pipeline on a pooled connection and read the replies.
+        """
+        async with self._slots:
+            try:
+                reader, writer = self._pool.get_nowait()
+            except asyncio.QueueEmpty:
+                reader, writer = await asyncio.wait_for(self._connect(), self.timeout)
+            try:
+                writer.write(b"".join(self._encode(*command) for command in commands))
+                await writer.drain()
+                replies = []
+                for _ in commands:
+                    replies.append(await asyncio.wait_for(self._read_reply(reader), self.timeout))
+            except BaseException:
+                # Also on cancellation: replies may be left unread, the connection is not reusable
+                writer.close()
+                raise
+            self._pool.put_nowait((reader, writer))
+            return replies
+
+    async def get(self, key: str) -> Optional[Any]:
+        (data,) = await self._execute([("GET", self.prefix + key)])
+        return None if data is None else _loads(data)
+
+    async def get_many(self, keys: list[str]) -> list[Optional[Any]]:
+        if not keys:
+            return []
+        (values,) = await self._execute([("MGET", *(self.prefix + key for key in keys))])
+        return [None if data is None else _loads(data) for data in values]
+
+    @staticmethod
+    def _remaining(pttl: int) -> Optional[float]:
+        # PTTL replies -2 for a missing key and -1 for a key without expiry
+        if pttl == -2:
+            return None
+        return float("inf") if pttl == -1 else pttl / 1000
+
+    async def remaining(self, key: str) -> Optional[float]:
+        (pttl,) = await self._execute([("PTTL", self.prefix + key)])
+        return self._remaining(pttl)
+
+    async def remaining_many(self, keys: list[str]) -> list[Optional[float]]:
+        if not keys:
+            return []
+        replies = await self._execute([("PTTL", self.prefix + key) for key in keys])
+        return [self._remaining(pttl) for pttl in replies]
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        await self._execute([("SET", self.prefix + key, _dumps(value), "PX", int(ttl * 1000))])
+
+    async def set_many(self, items: dict[str, Any], ttl: float) -> None:
+        if items:
+            await self._execute([
+                ("SET", self.prefix + key, _dumps(value), "PX", int(ttl * 1000))
+                for key, value in items.items()
+            ])
+
+    async def delete(self, key: str) -> None:
+        await self._execute([("DEL", self.prefix + key)])
+
+    async def clear(self) -> None:
+        cursor = b"0"
+        while True:
+            ((cursor, keys),) = await self._execute(
+                [("SCAN", cursor, "MATCH", self.prefix + "*", "COUNT", 1000)]
+            )
+            if keys:
+                await self._execute([("DEL", *keys)])
+            if cursor == b"0":
+                break
+
+    async def close(self) -> None:
+        while not self._pool.empty():
+            _, writer = self._pool.get_nowait()
+            writer.close()
+
+
+BACKENDS = {
+    MemoryBackend.name: MemoryBackend,
+    MmapBackend.name: MmapBackend,
+    RedisBackend.name: RedisBackend,
+}
+
+
+class ForecastCache:
+    """
+    Forecast cache with per-kind TTLs on top of a storage backend.
+
+    Backend failures are logged and treated as misses so an unavailable
+    cache never fails a request.
+    """
+
+    def __init__(self, backend: CacheBackend, ttls: dict[str, float], default_ttl: float = 3600) -> None:
+        self.backend = backend
+        self.ttls = ttls
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    @staticmethod
+    def make_key(key: tuple) -> str:
+        """
+        Serialize a normalized forecast key tuple into a backend key.
+        """
+        return ":".join(
+            ",".join(part) if isinstance(part, tuple) else ("" if part is None else str(part))
+            for part in key
+        )
+
+    def ttl(self, kind: str) -> float:
+        """
+        Return the TTL configured for a forecast kind.
+        """
+        return self.ttls.get(kind, self.default_ttl)
+
+    async def get(self, key: tuple) -> Optional[Any]:
+        """
+        Return the cached forecast for a normalized key, or None.
+        """
+        try:
+            value = await self.backend.get(self.make_key(key))
+        except Exception as e:
+            self.errors += 1
+            logger.warning("Forecast cache read failed: %s", e)
+            value = None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def get_many(self, keys: list[tuple]) -> list[Optional[Any]]:
+        """
+        Return the cached forecasts for normalized keys, None for misses.
+        """
+        try:
+            values = await self.backend.get_many([self.make_key(key) for key in keys])
+        except Exception as e:
+            self.errors += 1
+            logger.warning("Forecast cache read failed: %s", e)
+            values = [None] * len(keys)
+        hits = sum(value is not None for value in values)
+        self.hits += hits
+        self.misses += len(values) - hits
+        return values
+
+    async def remaining_many(self, keys: list[tuple]) -> list[Optional[float]]:
+        """
+        Return the seconds the forecasts of normalized keys have left to
+        live, None for misses. Not counted as lookups.
+        """
+        try:
+            return await self.backend.remaining_many([self.make_key(key) for key in keys])
+        except Exception as e:
+            self.errors += 1
+            logger.warning("Forecast cache read failed: %s", e)
+            return [None] * len(keys)
+
+    async def set(self, kind: str, key: tuple, value: Any) -> None:
+        """
+        Cache a forecast with the TTL of its kind.
+        """
+        try:
+            await self.backend.set(self.make_key(key), value, self.ttl(kind))
+        except Exception as e:
+            self.errors += 1
+            logger.warning("Forecast cache write failed: %s", e)
+
+    async def set_many(self, kind: str, items: dict[tuple, Any]) -> None:
+        """
+        Cache several forecasts of one kind.
+        """
+        try:
+            await self.backend.set_many(
+                {self.make_key(key): value for key, value in items.items()}, self.ttl(kind)
+            )
+        except Exception as e:
+            self.errors += 1
+            logger.warning("Forecast cache write failed: %s", e)
+
+    def stats(self) -> dict:
+        """
+        Return the cache counters.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.backend.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
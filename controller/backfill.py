@@ -0,0 +1,460 @@
+"""
+# controller/backfill.py
+# This module loads historical weather records from the Open-Meteo archive API.
+# A job splits locations x date range into chunks, fetches them with a bounded
+# pool of workers and upserts the parsed days; every chunk is checkpointed, so a
+# job stopped for any reason resumes with the chunks not loaded yet.
+
+Usage:
+    python -m controller.backfill create --names Berlin,Paris --start 2020-01-01 --end 2024-12-31
+    python -m controller.backfill resume 3
+    python -m controller.backfill status 3
+"""
+import argparse
+import asyncio
+import json
+import os
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Iterator, Optional
+
+import numpy as np
+from openmeteo_sdk.WeatherApiResponse import WeatherApiResponse
+
+from controller.location_controller import resolve_locations
+from controller.upstream import ARCHIVE_URL, close_session, weather_api, weather_api_many
+from controller.weather.columnar import time_axis
+from controller.weather.variables import ExtractionPlan, get_plan
+from logger import get_logger
+from metrics import BACKFILL_CHUNKS, stage
+from model.backfill import (
+    CANCELLED,
+    DONE,
+    FAILED,
+    RUNNING,
+    BackfillChunk,
+    BackfillJob,
+)
+from model.db import AsyncSessionLocal
+from model.location import Location
+from model.weather import Weather
+from utils import convert_weather_codes, load_settings
+
+logger = get_logger(__name__)
+
+_settings = load_settings().get("backfill", {})
+WORKERS = int(os.getenv("BACKFILL_WORKERS", _settings.get("workers", 4)))
+CHUNK_DAYS = int(_settings.get("chunk_days", 365))
+LOCATIONS_PER_REQUEST = int(_settings.get("locations_per_request", 10))
+API_SOURCE = _settings.get("api_source", "Open-Meteo Archive")
+
+# First day served by the archive API
+ARCHIVE_START = date(1940, 1, 1)
+
+# Daily archive variables, one per weather table column
+ARCHIVE_PLAN: ExtractionPlan = get_plan(
+    "daily",
+    ("weather_code", "temperature_2m_mean", "relative_humidity_2m_mean", "wind_speed_10m_max"),
+)
+
+# Jobs running in this process, by ID
+_running: dict[int, asyncio.Task] = {}
+
+
+@dataclass(frozen=True)
+class ChunkBatch:
+    """
+    Chunks of a job sharing a date range, fetched with one multi-location request.
+
+    Attributes:
+        start_date: First day of the chunks.
+        end_date: Last day of the chunks.
+        locations: (loc_id, lat, long) of every chunk.
+    """
+
+    start_date: date
+    end_date: date
+    locations: tuple[tuple[int, float, float], ...]
+
+
+def plan_chunks(
+    loc_ids: list[int], start_date: date, end_date: date, chunk_days: int = CHUNK_DAYS
+) -> list[tuple[int, date, date]]:
+    """
+    Split locations x [start_date, end_date] into chunks of chunk_days days.
+
+    Returns:
+        list: (loc_id, first day, last day) of every chunk, by date then location.
+
+    Raises:
+        ValueError: If the range is reversed, leaves the archive or chunk_days
+            is not positive.
+    """
+    if chunk_days < 1:
+        raise ValueError("chunk_days must be at least 1")
+    if end_date < start_date:
+        raise ValueError("end_date must not be before start_date")
+    if start_date < ARCHIVE_START or end_date > date.today():
+        raise ValueError(
+            f"The archive covers {ARCHIVE_START.isoformat()} to today, "
+            f"got {start_date.isoformat()} to {end_date.isoformat()}"
+        )
+    chunks = []
+    start = start_date
+    while start <= end_date:
+        end = min(start + timedelta(days=chunk_days - 1), end_date)
+        chunks.extend((loc_id, start, end) for loc_id in dict.fromkeys(loc_ids))
+        start = end + timedelta(days=1)
+    return chunks
+
+
+def batch_chunks(
+    chunks: list[BackfillChunk], locations: dict[int, Location], size: int = LOCATIONS_PER_REQUEST
+) -> list[ChunkBatch]:
+    """
+    Group chunks of the same date range into batches of up to size locations.
+    Chunks of deleted locations are left out.
+    """
+    spans: dict[tuple[date, date], list[tuple[int, float, float]]] = {}
+    for chunk in chunks:
+        location = locations.get(chunk.loc_id)
+        if location is not None:
+            spans.setdefault((chunk.start_date, chunk.end_date), []).append(
+                (location.id, location.lat, location.long)
+            )
+    return [
+        ChunkBatch(start, end, tuple(members[i:i + size]))
+        for (start, end), members in spans.items()
+        for i in range(0, len(members), size)
+    ]
+
+
+def archive_rows(
+    response: WeatherApiResponse,
+    loc_id: int,
+    triggered_user: Optional[str] = None,
+    plan: ExtractionPlan = ARCHIVE_PLAN,
+) -> list[dict]:
+    """
+    Convert one archive response into weather table rows, one per local day.
+
+    The section is read as arrays and converted in bulk; days without a mean
+    temperature (not in the archive yet) are skipped.
+
+    Returns:
+        list[dict]: Rows for Weather.upsert_source_async
+    """
+    daily = response.Daily()
+    values = plan.arrays(daily)
+    # Local calendar days of the location, the API returns them in UTC
+    days = (
+        (time_axis(daily).astype(np.int64) + response.UtcOffsetSeconds()) // 86400
+    ).astype("datetime64[D]")
+    temp = values["temperature_2m_mean"]
+    keep = np.isfinite(temp)
+    humidity = np.rint(np.clip(values["relative_humidity_2m_mean"][keep], 0, 100))
+    wind = np.clip(values["wind_speed_10m_max"][keep], 0, None)
+    conditions = convert_weather_codes(values["weather_code"][keep])
+    return [
+        {
+            "loc_id": loc_id,
+            "date": day,
+            "temp": temperature,
+            "condition": condition,
+            "wind_speed": None if np.isnan(wind_speed) else wind_speed,
+            "humidity": None if np.isnan(relative_humidity) else int(relative_humidity),
+            "triggered_user": triggered_user,
+            "api_source": API_SOURCE,
+        }
+        for day, temperature, condition, wind_speed, relative_humidity in zip(
+            days[keep].tolist(),
+            temp[keep].astype(np.float64).round(2).tolist(),
+            conditions.tolist(),
+            wind.astype(np.float64).round(2).tolist(),
+            humidity.tolist(),
+        )
+    ]
+
+
+async def fetch_batch(batch: ChunkBatch) -> list[WeatherApiResponse]:
+    """
+    Request the daily archive of the locations of a batch.
+    """
+    params = {
+        "daily": ARCHIVE_PLAN.param,
+        "timezone": "auto",
+        "start_date": batch.start_date.isoformat(),
+        "end_date": batch.end_date.isoformat(),
+    }
+    if len(batch.locations) == 1:
+        (_, lat, long), = batch.locations
+        return await weather_api(
+            ARCHIVE_URL, {"latitude": lat, "longitude": long, **params}, "daily", api="archive"
+        )
+    coordinates = [(lat, long) for _, lat, long in batch.locations]
+    return await weather_api_many(ARCHIVE_URL, params, coordinates, "daily", api="archive")
+
+
+async def _load_batch(job_id: int, batch: ChunkBatch, triggered_user: Optional[str]) -> int:
+    """
+    Fetch, parse and upsert one batch, then checkpoint its chunks. A failed
+    batch is checkpointed as failed and picked up again on resume.
+
+    Returns:
+        int: Records written
+    """
+    loc_ids = [loc_id for loc_id, _, _ in batch.locations]
+    try:
+        responses = await fetch_batch(batch)
+        with stage("parse_archive"):
+            parsed = await asyncio.to_thread(
+                lambda: [
+                    archive_rows(response, loc_id, triggered_user)
+                    for response, loc_id in zip(responses, loc_ids)
+                ]
+            )
+        async with AsyncSessionLocal() as db:
+            # Upserts are idempotent, a chunk written but not marked is loaded again;
+            # only archive records are overwritten, records of users are kept
+            written = await Weather.upsert_source_async(
+                db, [row for rows in parsed for row in rows], API_SOURCE
+            )
+            await BackfillChunk.mark_async(
+                db, job_id, batch.start_date, {
+                    loc_id: written.get(loc_id, 0) for loc_id in loc_ids
+                }
+            )
+    except Exception as e:
+        logger.warning(
+            "Backfill %d chunk %s of %s failed: %s", job_id, batch.start_date, loc_ids, e
+        )
+        BACKFILL_CHUNKS.labels(FAILED).inc(len(loc_ids))
+        async with AsyncSessionLocal() as db:
+            await BackfillChunk.mark_async(
+                db, job_id, batch.start_date, dict.fromkeys(loc_ids, 0), FAILED, str(e)
+            )
+        return 0
+    BACKFILL_CHUNKS.labels(DONE).inc(len(loc_ids))
+    return sum(written.values())
+
+
+async def create_job(
+    loc_ids: list[int],
+    start_date: date,
+    end_date: date,
+    chunk_days: int = CHUNK_DAYS,
+    triggered_user: Optional[str] = None,
+) -> dict:
+    """
+    Save a backfill job and its chunks, without running it.
+
+    Raises:
+        ValueError: If there are no locations or the range is invalid,
+            see plan_chunks.
+    """
+    if not loc_ids:
+        raise ValueError("No locations to backfill")
+    chunks = plan_chunks(loc_ids, start_date, end_date, chunk_days)
+    async with AsyncSessionLocal() as db:
+        job = await BackfillJob.create_async(
+            db, chunks, start_date, end_date, chunk_days, triggered_user
+        )
+        return job.to_dict()
+
+
+async def run_job(job_id: int, workers: int = WORKERS) -> dict:
+    """
+    Load the pending and failed chunks of a job with up to workers
+    requests in flight.
+
+    The job ends done when every chunk is loaded, failed otherwise. Running
+    it again resumes with the chunks left.
+
+    Returns:
+        dict: The job, see job_status
+
+    Raises:
+        LookupError: If the job does not exist.
+    """
+    async with AsyncSessionLocal() as db:
+        job = await BackfillJob.get_by_id_async(db, job_id)
+        if job is None:
+            raise LookupError(f"Backfill job {job_id} not found")
+        chunks = await BackfillChunk.get_unfinished_async(db, job_id)
+        locations = {
+            location.id: location
+            for location in await Location.get_by_ids_async(db, {chunk.loc_id for chunk in chunks})
+        }
+        triggered_user = job.triggered_user
+        await job.set_status_async(db, RUNNING)
+
+    batches = batch_chunks(chunks, locations)
+    logger.info(
+        "Backfill %d: %d chunks left in %d requests", job_id, len(chunks), len(batches)
+    )
+    # Workers pull from one shared iterator, so at most `workers` batches are in flight
+    pending: Iterator[ChunkBatch] = iter(batches)
+
+    async def worker() -> int:
+        written = 0
+        for batch in pending:
+            written += await _load_batch(job_id, batch, triggered_user)
+        return written
+
+    try:
+        written = sum(
+            await asyncio.gather(*(worker() for _ in range(max(1, min(workers, len(batches))))))
+        )
+    except asyncio.CancelledError:
+        await _set_status(job_id, CANCELLED)
+        raise
+
+    async with AsyncSessionLocal() as db:
+        job = await BackfillJob.get_by_id_async(db, job_id)
+        progress = await job.progress_async(db)
+        failed = sum(count for status, count in progress["chunks"].items() if status != DONE)
+        await job.set_status_async(
+            db, FAILED if failed else DONE, f"{failed} chunks failed" if failed else None
+        )
+        logger.info("Backfill %d %s: %d records written", job_id, job.status, written)
+        return {**job.to_dict(), **progress}
+
+
+async def _set_status(job_id: int, status: str) -> None:
+    async with AsyncSessionLocal() as db:
+        job = await BackfillJob.get_by_id_async(db, job_id)
+        if job is not None:
+            await job.set_status_async(db, status)
+
+
+async def job_status(job_id: int) -> Optional[dict]:
+    """
+    Return a job with its chunk counts by status and the records loaded,
+    None if it does not exist.
+    """
+    async with AsyncSessionLocal() as db:
+        job = await BackfillJob.get_by_id_async(db, job_id)
+        if job is None:
+            return None
+        return {**job.to_dict(), **await job.progress_async(db), "active": job_id in _running}
+
+
+async def recent_jobs(limit: int = 20) -> list[dict]:
+    """
+    Return the most recent jobs, newest first.
+    """
+    async with AsyncSessionLocal() as db:
+        jobs = await BackfillJob.get_recent_async(db, limit)
+        return [
+            {**job.to_dict(), **await job.progress_async(db), "active": job.id in _running}
+            for job in jobs
+        ]
+
+
+def start_job(job_id: int, workers: int = WORKERS) -> bool:
+    """
+    Run a job in the background of this process.
+
+    Returns:
+        bool: False if the job is already running here.
+    """
+    if job_id in _running:
+        return False
+    task = asyncio.create_task(run_job(job_id, workers))
+    _running[job_id] = task
+
+    def finished(done: asyncio.Task) -> None:
+        _running.pop(job_id, None)
+        if not done.cancelled() and done.exception() is not None:
+            logger.error("Backfill %d stopped: %s", job_id, done.exception())
+
+    task.add_done_callback(finished)
+    return True
+
+
+async def cancel_job(job_id: int) -> bool:
+    """
+    Stop a job running in this process. Chunks in flight stay pending.
+
+    Returns:
+        bool: False if the job is not running here.
+    """
+    task = _running.get(job_id)
+    if task is None:
+        return False
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    return True
+
+
+async def stop_backfills() -> None:
+    """
+    Cancel the jobs running in this process, they can be resumed later.
+    """
+    for job_id in list(_running):
+        await cancel_job(job_id)
+
+
+async def _resolve(names: list[str], loc_ids: list[int]) -> list[int]:
+    locations, not_found = await resolve_locations(names, loc_ids)
+    if not_found:
+        raise ValueError(f"Unknown locations: {', '.join(not_found)}")
+    return list(dict.fromkeys(location["id"] for location in locations.values()))
+
+
+async def _main(args: argparse.Namespace) -> dict:
+    try:
+        if args.command == "create":
+            loc_ids = await _resolve(
+                [name.strip() for name in args.names.split(",") if name.strip()],
+                [int(loc_id) for loc_id in args.ids.split(",") if loc_id.strip()],
+            )
+            job = await create_job(
+                loc_ids,
+                date.fromisoformat(args.start),
+                date.fromisoformat(args.end),
+                args.chunk_days,
+                args.user,
+            )
+            return await run_job(job["id"], args.workers)
+        if args.command == "resume":
+            return await run_job(args.job_id, args.workers)
+        return await job_status(args.job_id) or {"error": f"Backfill job {args.job_id} not found"}
+    finally:
+        from model.db import dispose_engines
+
+        await close_session()
+        await dispose_engines()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Historical weather backfill")
+    commands = parser.add_subparsers(dest="command", required=True)
+    create = commands.add_parser("create", help="Create a job and run it")
+    create.add_argument("--names", default="", help="Comma-separated location names")
+    create.add_argument("--ids", default="", help="Comma-separated location IDs")
+    create.add_argument("--start", required=True, help="First day (YYYY-MM-DD)")
+    create.add_argument("--end", required=True, help="Last day (YYYY-MM-DD)")
+    create.add_argument("--chunk-days", type=int, default=CHUNK_DAYS)
+    create.add_argument("--user", default=None, help="triggered_user of the records")
+    for name, help_text in (("resume", "Run the chunks left of a job"), ("status", "Show a job")):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("job_id", type=int)
+    for command in (create, commands.choices["resume"]):
+        command.add_argument("--workers", type=int, default=WORKERS)
+    args = parser.parse_args()
+
+    from model.db import create_tables
+
+    create_tables()
+    try:
+        result = asyncio.run(_main(args))
+    except (LookupError, ValueError) as e:
+        parser.exit(2, f"error: {e}\n")
+    print(json.dumps(result, indent=2))
+    if result.get("status") == FAILED:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
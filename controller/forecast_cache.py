@@ -0,0 +1,134 @@
+"""
+# controller/forecast_cache.py
+# This module wires the configured forecast cache in front of the upstream forecast calls.
+"""
+import os
+from typing import Any, Awaitable, Callable, Optional
+
+from cache.forecast import BACKENDS, ForecastCache, MemoryBackend, MmapBackend, RedisBackend
+from controller.singleflight import forecast_flight
+from utils import load_settings
+
+_settings = load_settings().get("forecast_cache", {})
+
+# Seconds a parsed forecast stays fresh, matched to upstream model update intervals
+FORECAST_TTLS = {
+    "current": float(_settings.get("ttl_current", 900)),
+    "hourly": float(_settings.get("ttl_hourly", 3600)),
+    "daily": float(_settings.get("ttl_daily", 10800)),
+}
+# Overviews hold a current section, they expire with it
+FORECAST_TTLS["overview"] = float(_settings.get("ttl_overview", FORECAST_TTLS["current"]))
+
+_forecast_cache: ForecastCache | None = None
+
+
+def _build_backend():
+    """
+    Build the storage backend selected in settings.toml or FORECAST_CACHE_BACKEND.
+    """
+    name = os.getenv("FORECAST_CACHE_BACKEND", _settings.get("backend", "memory"))
+    if name not in BACKENDS:
+        raise ValueError(
+            f"Unknown forecast cache backend {name!r}, expected one of {', '.join(BACKENDS)}"
+        )
+    if name == MmapBackend.name:
+        return MmapBackend(
+            path=os.getenv("FORECAST_CACHE_PATH", _settings.get("mmap_path", "")),
+            slots=int(_settings.get("mmap_slots", 1024)),
+            slot_size=int(_settings.get("mmap_slot_size", 65536)),
+        )
+    if name == RedisBackend.name:
+        return RedisBackend(
+            url=os.getenv("REDIS_URL", _settings.get("redis_url", "redis://localhost:6379/0")),
+            pool_size=int(_settings.get("redis_pool_size", 10)),
+            timeout=float(_settings.get("redis_timeout", 1.0)),
+        )
+    return MemoryBackend(max_size=int(_settings.get("max_size", 4096)))
+
+
+def get_forecast_cache() -> ForecastCache:
+    """
+    Return the shared forecast cache, creating it on first use.
+    """
+    global _forecast_cache
+    if _forecast_cache is None:
+        _forecast_cache = ForecastCache(_build_backend(), FORECAST_TTLS)
+    return _forecast_cache
+
+
+async def close_forecast_cache() -> None:
+    """
+    Close the forecast cache backend.
+    """
+    global _forecast_cache
+    if _forecast_cache is not None:
+        await _forecast_cache.backend.close()
+    _forecast_cache = None
+
+
+async def fetch_forecast(
+    kind: str, key: tuple, fetch: Callable[[], Awaitable[Any]]
+) -> Any:
+    """
+    Serve a forecast from the cache, or fetch it once for all concurrent callers.
+
+    Args:
+        kind: Forecast kind (current, hourly, daily), selects the TTL.
+        key: Normalized forecast key, see singleflight.forecast_key.
+        fetch: Zero-argument coroutine factory calling the upstream API.
+
+    Returns:
+        The parsed forecast, shared between callers.
+    """
+    cache = get_forecast_cache()
+    cached = await cache.get(key)
+    if cached is not None:
+        return cached
+
+    async def fill():
+        result = await fetch()
+        await cache.set(kind, key, result)
+        return result
+
+    return await forecast_flight.do(key, fill)
+
+
+async def fetch_forecast_many(
+    kind: str,
+    keys: list[tuple],
+    fetch_many: Callable[[list[int]], Awaitable[list[Any]]],
+    refresh_within: Optional[float] = None,
+) -> list[Any]:
+    """
+    Serve many forecasts from the cache and fetch only the missing ones.
+
+    Args:
+        kind: Forecast kind (current, hourly, daily), selects the TTL.
+        keys: Normalized forecast keys.
+        fetch_many: Coroutine function taking the indices of the missing keys
+            and returning their forecasts in the same order.
+        refresh_within: Refresh ahead instead: fetch the keys missing or
+            expiring within this many seconds, without reading the others.
+
+    Returns:
+        list: Forecasts in the order of keys, with refresh_within only the
+            fetched ones and None for the others.
+    """
+    cache = get_forecast_cache()
+    if refresh_within is None:
+        results = await cache.get_many(keys)
+        missing = [i for i, result in enumerate(results) if result is None]
+    else:
+        results = [None] * len(keys)
+        missing = [
+            i
+            for i, left in enumerate(await cache.remaining_many(keys))
+            if left is None or left <= refresh_within
+        ]
+    if missing:
+        fetched = await fetch_many(missing)
+        for i, result in zip(missing, fetched):
+            results[i] = result
+        await cache.set_many(kind, {keys[i]: results[i] for i in missing})
+    return results
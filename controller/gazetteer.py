@@ -0,0 +1,175 @@
+"""
+# controller/gazetteer.py
+# This module keeps the process gazetteer: the saved locations and an optional
+# GeoNames file, indexed in memory so names and coordinates resolve locally.
+"""
+import asyncio
+import os
+from typing import Optional
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from controller.singleflight import SingleFlight
+from gazetteer.geonames import read_country_names, read_places
+from gazetteer.index import MERGE_DISTANCE_KM, Gazetteer
+from gazetteer.suggest import TOP_K
+from logger import get_logger
+from model.db import AsyncSessionLocal
+from model.location import Location
+from model.weather import Weather
+from utils import load_settings
+
+logger = get_logger(__name__)
+
+_settings = load_settings().get("gazetteer", {})
+GAZETTEER_PATH = os.getenv("GAZETTEER_PATH", _settings.get("path", ""))
+GAZETTEER_COUNTRIES_PATH = os.getenv(
+    "GAZETTEER_COUNTRIES_PATH", _settings.get("countries_path", "")
+)
+# Lowest score of a fuzzy name match used when the geocoding API finds nothing
+MATCH_SCORE = float(_settings.get("match_score", 0.6))
+
+_gazetteer = Gazetteer(float(_settings.get("merge_distance_km", MERGE_DISTANCE_KM)))
+# Saves of the same unsaved place, by entry index
+_save_flight = SingleFlight()
+
+
+def get_gazetteer() -> Gazetteer:
+    """
+    Return the process gazetteer.
+    """
+    return _gazetteer
+
+
+def _build(saved: list[dict], record_counts: dict[int, int]) -> Gazetteer:
+    gazetteer = Gazetteer(_gazetteer.merge_distance_km)
+    if GAZETTEER_PATH:
+        countries = (
+            read_country_names(GAZETTEER_COUNTRIES_PATH) if GAZETTEER_COUNTRIES_PATH else None
+        )
+        gazetteer.add_many(
+            read_places(
+                GAZETTEER_PATH,
+                countries,
+                min_population=int(_settings.get("min_population", 0)),
+                feature_classes=_settings.get("feature_classes", "P"),
+                alternate_names=bool(_settings.get("alternate_names", False)),
+            )
+        )
+    # Saved locations last, they replace the file places they match
+    gazetteer.add_many(saved)
+    # Places with weather records saved were looked up before, they rank first
+    for loc_id, count in record_counts.items():
+        index = gazetteer.index_of(loc_id)
+        if index is not None:
+            gazetteer.hit(index, count)
+    return gazetteer
+
+
+async def load_gazetteer() -> Gazetteer:
+    """
+    Build the gazetteer from the GeoNames file and the locations table off
+    the event loop, then swap it in. Without a database only the file is loaded.
+    Suggestions start ranked by the number of weather records per location.
+    """
+    global _gazetteer
+    try:
+        async with AsyncSessionLocal() as db:
+            saved = [location.to_dict() for location in await Location.get_all_async(db)]
+            record_counts = await Weather.count_by_location_async(db)
+    except (SQLAlchemyError, OSError) as e:
+        logger.warning("Gazetteer loaded without the saved locations: %s", e)
+        saved, record_counts = [], {}
+    _gazetteer = await asyncio.to_thread(_build, saved, record_counts)
+    logger.info("Gazetteer loaded: %s", _gazetteer.stats())
+    return _gazetteer
+
+
+def remember_location(location: dict) -> None:
+    """
+    Add a saved location to the gazetteer.
+    """
+    _gazetteer.add(location)
+
+
+def count_lookup(location: dict) -> None:
+    """
+    Count a lookup of a saved location, so it ranks higher in the suggestions.
+    """
+    index = _gazetteer.index_of(location.get("id"))
+    if index is not None:
+        _gazetteer.hit(index)
+
+
+def suggest_locations(prefix: str, limit: int = TOP_K) -> list[dict]:
+    """
+    Known places whose name starts with prefix, most looked up first.
+
+    Returns:
+        list[dict]: Up to limit location dicts, id None for places never saved.
+    """
+    return [_gazetteer.entry(index) for index in _gazetteer.suggest(prefix, limit)]
+
+
+def find_saved(location: dict) -> Optional[dict]:
+    """
+    Saved location with the same name within the merge distance of location,
+    e.g. a geocoding result already stored under another spelling.
+    """
+    index = _gazetteer.same_place(location)
+    if index is None:
+        return None
+    entry = _gazetteer.entry(index)
+    return entry if entry.get("id") is not None else None
+
+
+async def _save(index: int) -> dict:
+    entry = _gazetteer.entry(index)
+    if entry.get("id") is not None:
+        return entry
+    location = Location(
+        name=entry["name"], lat=entry["lat"], long=entry["long"], country=entry["country"]
+    )
+    async with AsyncSessionLocal() as db:
+        await location.save_async(db)
+        result = location.to_dict()
+    logger.info("Location %s saved to the database from the gazetteer.", result["name"])
+    remember_location(result)
+    return result
+
+
+async def match_location(name: str, min_score: float = MATCH_SCORE) -> Optional[dict]:
+    """
+    Resolve a name with the gazetteer. A place only known from the GeoNames
+    file is saved as a Location first, so the result always has an ID.
+
+    Args:
+        name: Location name as typed.
+        min_score: Lowest accepted score, 1 for exact (folded) and alias
+            matches only.
+
+    Returns:
+        Optional[dict]: Location dict, None if no place matches.
+    """
+    index = _gazetteer.match(name, min_score)
+    if index is None:
+        return None
+    entry = _gazetteer.entry(index)
+    if entry.get("id") is not None:
+        return entry
+    return await _save_flight.do(index, lambda: _save(index))
+
+
+def nearest_locations(
+    lat: float, long: float, k: int = 1, max_km: Optional[float] = None
+) -> list[dict]:
+    """
+    Known places nearest to a location.
+
+    Returns:
+        list[dict]: Location dicts with their distance_km, nearest first.
+    """
+    return [
+        {**_gazetteer.entry(index), "distance_km": round(distance, 3)}
+        for index, distance in _gazetteer.nearest(lat, long, k, max_km)
+    ]
@@ -0,0 +1,246 @@
+"""
+# controller/ingest_controller.py
+# This module validates and bulk-loads weather records with upsert semantics.
+"""
+import asyncio
+import json
+import math
+from datetime import date
+from typing import AsyncIterator, Iterable
+
+from pydantic import ValidationError
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from model.location import Location
+from model.weather import Weather
+from schema.weather import WeatherData
+from utils import load_settings
+
+_settings = load_settings().get("ingest", {})
+# Records validated and written per database round trip
+INGEST_CHUNK_SIZE = int(_settings.get("chunk_size", 5000))
+# Largest JSON array body, it is held in memory while parsed
+MAX_JSON_ARRAY_BYTES = int(_settings.get("max_json_array_bytes", 16 * 1024 * 1024))
+# Rejected records reported per chunk
+MAX_REPORTED_ERRORS = 10
+
+
+def _to_row(record: dict) -> dict:
+    """
+    Validate one raw record and convert it to a weather table row.
+
+    Raises:
+        ValueError: If the record does not satisfy the schema or table constraints.
+    """
+    weather = WeatherData.model_validate(record)
+    if weather.loc_id is None:
+        raise ValueError("loc_id is required")
+    if not math.isfinite(weather.temp) or not -100 <= weather.temp <= 100:
+        raise ValueError("temp must be between -100 and 100")
+    if not 0 <= weather.humidity <= 100:
+        raise ValueError("humidity must be between 0 and 100")
+    if weather.wind_speed < 0:
+        raise ValueError("wind_speed must not be negative")
+    return {
+        "loc_id": weather.loc_id,
+        "date": date.fromisoformat(weather.date[:10]),
+        "temp": weather.temp,
+        "condition": weather.condition,
+        "wind_speed": weather.wind_speed,
+        "humidity": round(weather.humidity),
+        "triggered_user": weather.triggered_user,
+        "api_source": weather.api_source,
+    }
+
+
+def _validate_chunk(records: Iterable) -> tuple[dict, int, list]:
+    """
+    Validate raw records, keeping the last record of every (loc_id, date) pair.
+
+    Returns:
+        tuple: (loc_id, date) mapped to (index, row), the rejected count,
+        and the first rejection reasons
+    """
+    latest: dict[tuple, tuple[int, dict]] = {}
+    rejected = 0
+    errors = []
+    for index, record in enumerate(records):
+        if isinstance(record, Exception):
+            reason = str(record)
+        else:
+            try:
+                row = _to_row(record)
+            except ValidationError as e:
+                reason = "; ".join(error["msg"] for error in e.errors())
+            except (TypeError, ValueError) as e:
+                reason = str(e)
+            else:
+                latest[(row["loc_id"], row["date"])] = (index, row)
+                continue
+        rejected += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append({"index": index, "error": reason})
+    return latest, rejected, errors
+
+
+async def validate_chunk(records: Iterable) -> tuple[dict, int, list]:
+    """
+    Validate a chunk of raw records in a worker thread, so large chunks do
+    not stall the event loop, see _validate_chunk.
+    """
+    return await asyncio.to_thread(_validate_chunk, list(records))
+
+
+async def validated_chunks(
+    chunks: AsyncIterator[list],
+) -> AsyncIterator[tuple[list, "asyncio.Future[tuple[dict, int, list]]"]]:
+    """
+    Pair every chunk with its validation, started as soon as the chunk is
+    parsed: a chunk is yielded once the next one is validating, so
+    validation overlaps with writing the previous chunk.
+    """
+    pending = None
+    try:
+        async for records in chunks:
+            validation = asyncio.ensure_future(validate_chunk(records))
+            if pending is not None:
+                yield pending
+            pending = (records, validation)
+        if pending is not None:
+            yield pending
+    finally:
+        if pending is not None:
+            pending[1].cancel()
+
+
+async def ingest_chunk(db: AsyncSession, records: Iterable, validated: tuple = None) -> dict:
+    """
+    Validate a chunk of raw records and upsert the valid ones.
+
+    Records for unknown locations, and records whose (loc_id, date) is
+    already stored for another triggered_user, are rejected. Repeated
+    (loc_id, date) pairs within the chunk keep the last occurrence.
+
+    Args:
+        db: Async database session
+        records: Raw records (dicts), or exceptions from the body parser
+        validated: Result of validate_chunk(records) if it already ran
+
+    Returns:
+        dict: Accepted and rejected counts, and the first rejection reasons
+    """
+    latest, rejected, errors = validated or await validate_chunk(records)
+
+    loc_ids = {loc_id for loc_id, _ in latest}
+    known = {location.id for location in await Location.get_by_ids_async(db, loc_ids)}
+    valid = {}
+    for key, (index, row) in latest.items():
+        if key[0] in known:
+            valid[key] = (index, row)
+            continue
+        rejected += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append({"index": index, "error": f"Location {key[0]} does not exist"})
+
+    written = await Weather.upsert_many_async(db, [row for _, row in valid.values()])
+    for key in valid.keys() - written:
+        rejected += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append({
+                "index": valid[key][0],
+                "error": f"A record of another user exists for location {key[0]} on {key[1]}",
+            })
+    return {"accepted": len(written), "rejected": rejected, "errors": errors}
+
+
+async def create_record(db: AsyncSession, record: dict) -> Weather:
+    """
+    Validate one raw record and insert it as a new weather record.
+
+    Unlike ingest_chunk this never overwrites: a record for a (loc_id, date)
+    pair that is already stored is rejected.
+
+    Args:
+        db: Async database session
+        record: Raw record (dict)
+
+    Returns:
+        Weather: The created record
+
+    Raises:
+        ValueError: If the record is invalid or its location does not exist.
+        IntegrityError: If a record for the same location and date exists.
+    """
+    try:
+        row = _to_row(record)
+    except ValidationError as e:
+        raise ValueError("; ".join(error["msg"] for error in e.errors())) from e
+    if not await Location.get_by_ids_async(db, {row["loc_id"]}):
+        raise ValueError(f"Location {row['loc_id']} does not exist")
+    try:
+        return await Weather(**row).save_async(db)
+    except IntegrityError:
+        await db.rollback()
+        raise
+
+
+class BodyTooLargeError(ValueError):
+    """Raised when a JSON array body exceeds MAX_JSON_ARRAY_BYTES."""
+
+    def __init__(self):
+        super().__init__(
+            f"JSON array bodies are limited to {MAX_JSON_ARRAY_BYTES} bytes, "
+            "send larger loads as NDJSON (Content-Type: application/x-ndjson)"
+        )
+
+
+async def iter_json_chunks(body: AsyncIterator[bytes], ndjson: bool) -> AsyncIterator[list]:
+    """
+    Parse a request body into chunks of INGEST_CHUNK_SIZE raw records.
+
+    NDJSON bodies are parsed line by line while they stream in, undecodable
+    lines are passed on as exceptions so they are counted as rejections.
+    JSON bodies must be a single array and are parsed once fully received,
+    so they are limited to MAX_JSON_ARRAY_BYTES.
+
+    Raises:
+        BodyTooLargeError: If a JSON array body exceeds MAX_JSON_ARRAY_BYTES.
+        ValueError: If a JSON body is not a valid JSON array.
+    """
+    if not ndjson:
+        data = bytearray()
+        async for part in body:
+            data += part
+            if len(data) > MAX_JSON_ARRAY_BYTES:
+                raise BodyTooLargeError()
+        records = json.loads(data)
+        del data
+        if not isinstance(records, list):
+            raise ValueError("Request body must be a JSON array")
+        for start in range(0, len(records), INGEST_CHUNK_SIZE):
+            yield records[start:start + INGEST_CHUNK_SIZE]
+        return
+
+    chunk: list = []
+    buffer = b""
+    async for part in body:
+        buffer += part
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                chunk.append(_parse_line(line))
+            if len(chunk) >= INGEST_CHUNK_SIZE:
+                yield chunk
+                chunk = []
+    if buffer.strip():
+        chunk.append(_parse_line(buffer))
+    if chunk:
+        yield chunk
+
+
+def _parse_line(line: bytes):
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        return ValueError(f"Invalid JSON line: {e}")
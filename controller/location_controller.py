@@ -2,54 +2,279 @@
 # geodata.py
 # This module return geodata using open-meteo geocoding API
 """
-import requests
-from utils import fprint
+import asyncio
+import os
+from cache.lru import LRUCache, MISSING
+from logger import get_logger
+from metrics import stage, upstream_call
+from utils import load_settings
 from model.location import Location
-from model.db import get_db
+from model.db import AsyncSessionLocal
+from controller.gazetteer import (
+    count_lookup,
+    find_saved,
+    match_location,
+    nearest_locations,
+    remember_location,
+    suggest_locations,
+)
+from controller.singleflight import SingleFlight
+from controller.upstream import GEOCODING_URL, get_session
 
-URL = "https://geocoding-api.open-meteo.com/v1/search"
+URL = GEOCODING_URL
 
-def get_geodata(
+logger = get_logger(__name__)
+
+_cache_settings = load_settings().get("geocode_cache", {})
+GEOCODE_CACHE_TTL = float(
+    os.getenv("GEOCODE_CACHE_TTL", _cache_settings.get("ttl", 86400))
+)
+GEOCODE_NEGATIVE_TTL = float(
+    os.getenv("GEOCODE_NEGATIVE_TTL", _cache_settings.get("negative_ttl", 300))
+)
+
+# Database and geocoding API lookups in flight, by normalized name and API parameters
+_geocode_flight = SingleFlight()
+
+# Normalized location name -> location dict ({} for names without results)
+geocode_cache = LRUCache(
+    max_size=int(os.getenv("GEOCODE_CACHE_SIZE", _cache_settings.get("max_size", 1024))),
+    ttl=GEOCODE_CACHE_TTL,
+)
+
+
+def normalize_name(name: str) -> str:
+    """
+    Normalize a location name for cache lookups: collapse whitespace, casefold.
+    """
+    return " ".join(name.split()).casefold()
+
+
+def invalidate_geodata(name: str | None = None, loc_id: int | None = None) -> int:
+    """
+    Drop cached geodata by name and/or location ID.
+
+    Returns:
+        int: Number of removed cache entries.
+    """
+    removed = 0
+    if name is not None:
+        removed += int(geocode_cache.invalidate(normalize_name(name)))
+    if loc_id is not None:
+        removed += geocode_cache.invalidate_where(
+            lambda _, value: value.get("id") == loc_id
+        )
+    return removed
+
+
+def clear_geodata_cache() -> None:
+    """
+    Drop every cached geodata entry.
+    """
+    geocode_cache.clear()
+
+
+def geodata_cache_stats() -> dict:
+    """
+    Return hit/miss/eviction counters of the geodata cache.
+    """
+    return geocode_cache.stats()
+
+
+async def get_geodata(
     name: str, count: int = 1, language: str = "en", res_format: str = "json"
 ) -> dict:
     """
-    Fetch geodata for a given location name, saves the result to database if not found
+    Fetch geodata for a given location name, saves the result to database if not found.
+    Results, including misses, are cached in process; the returned dict is shared.
+
+    Names are resolved by an exact match in the gazetteer, then in the database,
+    then by the geocoding API. A fuzzy match in the gazetteer (typos, partial
+    names) is only used when the API finds no place, and is cached as briefly
+    as a miss so the API is asked again.
+    Every resolved lookup counts towards the ranking of the suggestions.
     """
-    location = Location(name=name)
-    db = next(get_db())
-    existing_location = location.get_by_name(db, name)
-    if existing_location:
-        fprint(f"Location {name} already exists in the database.", level="info")
-        return existing_location.to_dict()
+    result = await _resolve_geodata(name, count, language, res_format)
+    if result:
+        count_lookup(result)
+    return result
+
+
+async def _resolve_geodata(name: str, count: int, language: str, res_format: str) -> dict:
+    key = normalize_name(name)
+    cached = geocode_cache.get(key)
+    if cached is not MISSING:
+        return cached
+
+    with stage("geocode_gazetteer"):
+        result = await match_location(name, min_score=1.0)
+    if result:
+        geocode_cache.set(key, result)
+        return result
+
+    # Concurrent misses for the same name share one lookup, so a new place is
+    # geocoded and saved once instead of once per request
+    return await _geocode_flight.do(
+        (key, count, language, res_format),
+        lambda: _lookup_geodata(name, key, count, language, res_format),
+    )
+
 
+async def _lookup_geodata(
+    name: str, key: str, count: int, language: str, res_format: str
+) -> dict:
+    """
+    Resolve a name missing from the cache and the gazetteer from the
+    database, then the geocoding API, and cache the result under key.
+    """
+    async with AsyncSessionLocal() as db:
+        with stage("geocode_db"):
+            existing_location = await Location.get_by_name_async(db, name)
+        if existing_location:
+            logger.info("Location %s already exists in the database.", name)
+            result = existing_location.to_dict()
+            remember_location(result)
+            geocode_cache.set(key, result)
+            return result
+
+    location = Location(name=name)
     params = {"name": name, "count": count, "language": language, "format": res_format}
-    response = requests.get(URL, params=params, timeout=10)
+    with upstream_call("geocoding", "search") as call:
+        response = await get_session().get(URL, params=params)
+        call.status = str(response.status_code)
     if response.status_code != 200:
-        fprint(f"Error: {response.status_code} - {response.text}", level="error")
+        logger.error(
+            "Geocoding %s failed: %s - %s", name, response.status_code, response.text
+        )
         raise ValueError(f"Failed to fetch geodata for {name}")
-    fprint(f"Data: {response.json()['results']}", level="info")
     data = response.json().get("results", [])
+    logger.debug("Geocoding %s returned %d results", name, len(data))
     if not data:
-        fprint(f"No geodata found for {name}", level="warn")
-        return {}
+        with stage("geocode_gazetteer"):
+            result = await match_location(name)
+        if result:
+            logger.info("Location %s matched %s in the gazetteer.", name, result["name"])
+        else:
+            logger.warning("No geodata found for %s", name)
+        geocode_cache.set(key, result or {}, ttl=GEOCODE_NEGATIVE_TTL)
+        return result or {}
     location_data = data[0]
     location.lat = location_data.get("latitude")
     location.long = location_data.get("longitude")
     location.name = location_data.get("name")
     location.country = location_data.get("country")
 
-    location.save(db)
-    fprint(f"Location {name} saved to the database.", level="info")
-    return location.to_dict()
+    # The API spells the place its own way, it may be saved under that name already
+    result = find_saved({"name": location.name, "lat": location.lat, "long": location.long})
+    if result:
+        geocode_cache.set(key, result)
+        return result
+
+    async with AsyncSessionLocal() as db:
+        await location.save_async(db)
+        result = location.to_dict()
+    logger.info("Location %s saved to the database.", name)
+    remember_location(result)
+    geocode_cache.set(key, result)
+    geocode_cache.set(normalize_name(result["name"]), result)
+    return result
+
+async def resolve_locations(
+    names: list[str] | None = None, loc_ids: list[int] | None = None
+) -> tuple[dict[str, dict], list[str]]:
+    """
+    Resolve many location names and IDs at once.
+
+    Cached names are served from the geodata cache or the gazetteer, the rest
+    are loaded in a single query per kind. Names still unknown fall back to the geocoding API.
+
+    Args:
+        names: Location names.
+        loc_ids: Location IDs.
+
+    Returns:
+        tuple: Mapping of requested key (name as given, or ID as string) to
+        location dict, and the list of keys that could not be resolved.
+    """
+    names = list(dict.fromkeys(names or []))
+    loc_ids = list(dict.fromkeys(loc_ids or []))
+    resolved: dict[str, dict] = {}
+    pending_names = []
+    for name in names:
+        cached = geocode_cache.get(normalize_name(name))
+        if cached is MISSING:
+            cached = await match_location(name, min_score=1.0) or MISSING
+        if cached is MISSING:
+            pending_names.append(name)
+        elif cached:
+            resolved[name] = cached
+
+    async with AsyncSessionLocal() as db:
+        by_name = {
+            normalize_name(location.name): location.to_dict()
+            for location in await Location.get_by_names_async(db, pending_names)
+        }
+        by_id = {
+            location.id: location.to_dict()
+            for location in await Location.get_by_ids_async(db, loc_ids)
+        }
+
+    unknown_names = []
+    for name in pending_names:
+        result = by_name.get(normalize_name(name))
+        if result:
+            geocode_cache.set(normalize_name(name), result)
+            resolved[name] = result
+        else:
+            unknown_names.append(name)
 
-def get_geodata_by_id(loc_id: int) -> dict:
+    geocoded = await asyncio.gather(
+        *(get_geodata(name) for name in unknown_names), return_exceptions=True
+    )
+    for name, result in zip(unknown_names, geocoded):
+        if isinstance(result, dict) and result:
+            resolved[name] = result
+
+    for loc_id in loc_ids:
+        if loc_id in by_id:
+            resolved[str(loc_id)] = by_id[loc_id]
+
+    not_found = [name for name in names if name not in resolved]
+    not_found += [str(loc_id) for loc_id in loc_ids if str(loc_id) not in resolved]
+    return resolved, not_found
+
+
+async def get_geodata_by_id(loc_id: int) -> dict:
     """
     Fetch geodata by location ID.
     """
-    db = next(get_db())
-    location = Location.get_by_id(db, loc_id)
-    if not location:
-        fprint(f"Location with ID {loc_id} not found.", level="error")
-        return {}
-    db.close()
-    return location.to_dict()
+    async with AsyncSessionLocal() as db:
+        location = await Location.get_by_id_async(db, loc_id)
+        if not location:
+            logger.error("Location with ID %s not found.", loc_id)
+            return {}
+        return location.to_dict()
+
+
+def reverse_geodata(lat: float, long: float, max_km: float | None = None) -> dict:
+    """
+    Find the known location nearest to coordinates, from the gazetteer.
+
+    Args:
+        lat: Latitude in degrees.
+        long: Longitude in degrees.
+        max_km: Ignore locations further than this many kilometers.
+
+    Returns:
+        dict: Location dict with its distance_km, id None for places only
+        known from the gazetteer file, or an empty dict if none is in range.
+    """
+    nearest = nearest_locations(lat, long, 1, max_km)
+    return nearest[0] if nearest else {}
+
+
+def suggest_geodata(prefix: str, limit: int) -> list[dict]:
+    """
+    Suggest known locations for a partially typed name, from memory only.
+    """
+    return suggest_locations(prefix, limit)
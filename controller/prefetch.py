@@ -0,0 +1,232 @@
+"""
+# controller/prefetch.py
+# This module refreshes the cached forecasts of the most requested locations in the
+# background, shortly before they expire, so requests for them never miss the cache.
+"""
+import asyncio
+import os
+import random
+import time
+from typing import Optional
+
+from controller.upstream import BATCH_SIZE
+from controller.weather.current import get_current_weather_batch
+from controller.weather.daily import get_daily_forecast_batch
+from controller.weather.hourly import get_hourly_forecast_batch
+from controller.weather.overview import get_weather_overview_batch
+from logger import get_logger
+from metrics import PREFETCH_REFRESHES
+from utils import load_settings
+
+logger = get_logger(__name__)
+
+_settings = load_settings().get("prefetch", {})
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", str(_settings.get("enabled", True)))
+PREFETCH_ENABLED = PREFETCH_ENABLED.lower() in ("1", "true", "yes")
+
+# Batch fetchers of the default forecast of each kind, as requested by /weather/*
+REFRESHERS = {
+    "current": get_current_weather_batch,
+    "daily": get_daily_forecast_batch,
+    "hourly": get_hourly_forecast_batch,
+    "overview": get_weather_overview_batch,
+}
+
+
+class HotLocations:
+    """
+    Request counts per location, decayed exponentially so the top locations
+    follow what is requested now rather than since startup.
+
+    Locations are keyed by coordinates rounded like the forecast keys.
+    """
+
+    def __init__(self, half_life: float = 3600, max_tracked: int = 10000) -> None:
+        self.half_life = half_life
+        self.max_tracked = max_tracked
+        # (lat, long) -> (count, time of the last update)
+        self._counts: dict[tuple[float, float], tuple[float, float]] = {}
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    def _decayed(self, count: float, updated_at: float, now: float) -> float:
+        return count * 0.5 ** ((now - updated_at) / self.half_life)
+
+    def track(self, lat: float, long: float, count: float = 1) -> None:
+        """
+        Count requests for a location.
+        """
+        now = time.monotonic()
+        key = (round(float(lat), 4), round(float(long), 4))
+        known = self._counts.get(key)
+        if known is not None:
+            count += self._decayed(*known, now)
+        self._counts[key] = (count, now)
+
+    def top(self, n: int, min_count: float = 0.0) -> list[tuple[float, float]]:
+        """
+        Most requested locations, dropping the ones that went cold.
+
+        Args:
+            n: Number of locations.
+            min_count: Ignore (and forget) locations with a lower decayed count.
+
+        Returns:
+            list[tuple[float, float]]: (lat, long) pairs, most requested first.
+        """
+        now = time.monotonic()
+        counts = {
+            key: self._decayed(count, updated_at, now)
+            for key, (count, updated_at) in self._counts.items()
+        }
+        ranked = sorted(
+            (key for key, count in counts.items() if count >= min_count),
+            key=counts.__getitem__,
+            reverse=True,
+        )
+        # Forget cold locations, and the least requested beyond max_tracked
+        for key in set(counts) - set(ranked[:self.max_tracked]):
+            del self._counts[key]
+        return ranked[:n]
+
+
+class Prefetcher:
+    """
+    Background task refreshing the forecasts of the top locations.
+
+    Every interval (with jitter, so workers do not refresh in lockstep) the
+    cache TTLs of the default current, daily, hourly and overview forecasts of the
+    top_n locations are read, and the ones missing or expiring within lead
+    seconds are fetched with multi-location requests, at most concurrency
+    of them at a time. With a shared cache backend a forecast refreshed by
+    one worker is not refreshed again by the others.
+    """
+
+    def __init__(
+        self,
+        hot: HotLocations,
+        top_n: int = 100,
+        interval: float = 60,
+        lead: float = 150,
+        jitter: float = 0.2,
+        concurrency: int = 2,
+        min_count: float = 1.0,
+        batch_size: int = BATCH_SIZE,
+    ) -> None:
+        self.hot = hot
+        self.top_n = top_n
+        self.interval = interval
+        # A forecast expiring before the next round plus its fetch is refreshed now
+        self.lead = max(lead, interval * (1 + jitter))
+        self.jitter = jitter
+        self.min_count = min_count
+        self.batch_size = batch_size
+        self._slots = asyncio.Semaphore(concurrency)
+        self._task: Optional[asyncio.Task] = None
+
+    async def _refresh(self, kind: str, coordinates: list[tuple[float, float]]) -> int:
+        async with self._slots:
+            results = await REFRESHERS[kind](coordinates, refresh_within=self.lead)
+        refreshed = sum(result is not None for result in results)
+        PREFETCH_REFRESHES.labels(kind).inc(refreshed)
+        return refreshed
+
+    async def run_once(self) -> dict[str, int]:
+        """
+        Refresh the due forecasts of the top locations once.
+
+        Returns:
+            dict[str, int]: Number of forecasts refreshed by kind.
+        """
+        hot = self.hot.top(self.top_n, self.min_count)
+        chunks = [
+            (kind, hot[i:i + self.batch_size])
+            for kind in REFRESHERS
+            for i in range(0, len(hot), self.batch_size)
+        ]
+        results = await asyncio.gather(
+            *(self._refresh(kind, chunk) for kind, chunk in chunks), return_exceptions=True
+        )
+        refreshed = dict.fromkeys(REFRESHERS, 0)
+        for (kind, _), result in zip(chunks, results):
+            if isinstance(result, Exception):
+                logger.warning("Prefetch of %s forecasts failed: %s", kind, result)
+            else:
+                refreshed[kind] += result
+        if any(refreshed.values()):
+            logger.debug("Prefetched forecasts: %s", refreshed)
+        return refreshed
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(
+                self.interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+            )
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error("Prefetch round failed: %s", e)
+
+    def start(self) -> None:
+        """
+        Start the background task on the running event loop.
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="forecast-prefetch")
+
+    async def stop(self) -> None:
+        """
+        Cancel the background task and wait for it to finish.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+_hot = HotLocations(
+    half_life=float(_settings.get("half_life", 3600)),
+    max_tracked=int(_settings.get("max_tracked", 10000)),
+)
+_prefetcher = Prefetcher(
+    _hot,
+    top_n=int(_settings.get("top_n", 100)),
+    interval=float(_settings.get("interval", 60)),
+    lead=float(_settings.get("lead", 150)),
+    jitter=float(_settings.get("jitter", 0.2)),
+    concurrency=int(_settings.get("concurrency", 2)),
+    min_count=float(_settings.get("min_count", 1.0)),
+)
+
+
+def track_location(location: dict) -> None:
+    """
+    Count a forecast request for a location, see HotLocations.
+    """
+    _hot.track(location["lat"], location["long"])
+
+
+def get_prefetcher() -> Prefetcher:
+    """
+    Return the process prefetcher.
+    """
+    return _prefetcher
+
+
+def start_prefetcher() -> None:
+    """
+    Start refreshing the forecasts of the hot locations, unless disabled.
+    """
+    if PREFETCH_ENABLED:
+        _prefetcher.start()
+
+
+async def stop_prefetcher() -> None:
+    """
+    Stop the background refreshes.
+    """
+    await _prefetcher.stop()
@@ -0,0 +1,100 @@
+"""
+# controller/singleflight.py
+# This module coalesces concurrent identical upstream calls into a single in-flight request.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class SingleFlight:
+    """
+    Share one in-flight call between concurrent callers asking for the same key.
+
+    The first caller for a key originates the call, later callers arriving while
+    it is still running wait on the same task and receive the same result (or
+    exception). Results are shared objects and must be treated as read-only.
+    """
+
+    def __init__(self) -> None:
+        self._in_flight: dict[Hashable, asyncio.Task] = {}
+        self.originated = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run fn for key unless an identical call is already in flight.
+
+        Args:
+            key: Normalized identity of the call.
+            fn: Zero-argument coroutine factory performing the call.
+
+        Returns:
+            The result of the (possibly shared) call.
+        """
+        task = self._in_flight.get(key)
+        if task is None:
+            self.originated += 1
+            task = asyncio.ensure_future(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self.coalesced += 1
+        # Shield so a disconnecting caller does not cancel the call for the others
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Task) -> None:
+        """
+        Forget a completed call so the next miss originates a fresh one.
+        """
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved even if every waiter went away
+            task.exception()
+
+    def stats(self) -> dict:
+        """
+        Return the coalescing counters.
+        """
+        return {
+            "originated": self.originated,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._in_flight),
+        }
+
+    def reset_stats(self) -> None:
+        """
+        Reset the coalescing counters.
+        """
+        self.originated = 0
+        self.coalesced = 0
+
+
+def forecast_key(
+    kind: str,
+    latitude: float,
+    longitude: float,
+    variables: str,
+    start_date: str | None = None,
+    end_date: str | None = None,
+    forecast_days: int | None = None,
+) -> tuple:
+    """
+    Build the normalized identity of a forecast request.
+
+    Coordinates are rounded to 4 decimals (~11 m, well below the model grid)
+    and the variable list is order-insensitive.
+    """
+    names = tuple(sorted({name.strip() for name in variables.split(",") if name.strip()}))
+    return (
+        kind,
+        round(float(latitude), 4),
+        round(float(longitude), 4),
+        names,
+        start_date,
+        end_date,
+        forecast_days,
+    )
+
+
+forecast_flight = SingleFlight()
@@ -0,0 +1,170 @@
+"""
+# controller/upstream.py
+# This module provides the shared asynchronous HTTP client for the Open-Meteo APIs.
+# A single pooled keep-alive session is used by the forecast controllers and the geocoder.
+# The HTTP stack is imported when the session is built (at application startup),
+# not when this module is imported.
+"""
+import asyncio
+import os
+from typing import TYPE_CHECKING
+from openmeteo_sdk.WeatherApiResponse import WeatherApiResponse
+from metrics import upstream_call
+from utils import load_settings
+
+if TYPE_CHECKING:
+    import niquests
+    import openmeteo_requests
+
+_settings = load_settings().get("upstream", {})
+
+TIMEOUT = float(os.getenv("UPSTREAM_TIMEOUT", _settings.get("timeout", 10)))
+CONNECT_TIMEOUT = float(
+    os.getenv("UPSTREAM_CONNECT_TIMEOUT", _settings.get("connect_timeout", 5))
+)
+RETRIES = int(os.getenv("UPSTREAM_RETRIES", _settings.get("retries", 5)))
+BACKOFF_FACTOR = float(
+    os.getenv("UPSTREAM_BACKOFF_FACTOR", _settings.get("backoff_factor", 0.2))
+)
+POOL_CONNECTIONS = int(_settings.get("pool_connections", 10))
+POOL_MAXSIZE = int(os.getenv("UPSTREAM_POOL_MAXSIZE", _settings.get("pool_maxsize", 20)))
+# Maximum number of coordinates sent in one multi-location request
+BATCH_SIZE = int(os.getenv("UPSTREAM_BATCH_SIZE", _settings.get("batch_size", 100)))
+# API endpoints, overridden to point the app at a local stand-in (see benchmarks/)
+FORECAST_URL = os.getenv(
+    "OPENMETEO_FORECAST_URL",
+    _settings.get("forecast_url", "https://api.open-meteo.com/v1/forecast"),
+)
+GEOCODING_URL = os.getenv(
+    "OPENMETEO_GEOCODING_URL",
+    _settings.get("geocoding_url", "https://geocoding-api.open-meteo.com/v1/search"),
+)
+ARCHIVE_URL = os.getenv(
+    "OPENMETEO_ARCHIVE_URL",
+    _settings.get("archive_url", "https://archive-api.open-meteo.com/v1/archive"),
+)
+
+_session: "niquests.AsyncSession | None" = None
+_client: "openmeteo_requests.AsyncClient | None" = None
+
+
+def _build_session() -> "niquests.AsyncSession":
+    """
+    Build the pooled asynchronous session with timeouts and retry/backoff.
+    """
+    import niquests
+
+    retries = niquests.RetryConfiguration(
+        total=RETRIES,
+        backoff_factor=BACKOFF_FACTOR,
+        status_forcelist=(500, 502, 503, 504),
+        allowed_methods=frozenset({"GET", "POST"}),
+        raise_on_status=False,
+    )
+    return niquests.AsyncSession(
+        retries=retries,
+        timeout=niquests.TimeoutConfiguration(connect=CONNECT_TIMEOUT, read=TIMEOUT),
+        pool_connections=POOL_CONNECTIONS,
+        pool_maxsize=POOL_MAXSIZE,
+    )
+
+
+def get_session() -> "niquests.AsyncSession":
+    """
+    Return the shared asynchronous HTTP session, creating it on first use.
+    """
+    global _session
+    if _session is None:
+        _session = _build_session()
+    return _session
+
+
+def get_client() -> "openmeteo_requests.AsyncClient":
+    """
+    Return the shared Open-Meteo client bound to the pooled session.
+    Built by the application lifespan on startup, or on first use outside it.
+    """
+    global _client
+    if _client is None:
+        import openmeteo_requests
+
+        _client = openmeteo_requests.AsyncClient(session=get_session())
+    return _client
+
+
+async def close_session() -> None:
+    """
+    Close the shared session and release its pooled connections.
+    """
+    global _session, _client
+    if _session is not None:
+        await _session.close()
+    _session = None
+    _client = None
+
+
+async def weather_api(
+    url: str, params: dict, kind: str, method: str = "GET", api: str = "forecast"
+) -> list[WeatherApiResponse]:
+    """
+    Call a forecast API over the shared client, timed and counted by kind.
+
+    Args:
+        url: Open-Meteo API endpoint.
+        params: Request parameters.
+        kind: Forecast kind (current, hourly, daily) the metrics are labeled with.
+        method: HTTP method.
+        api: Upstream API the metrics are labeled with (forecast, archive).
+
+    Returns:
+        list[WeatherApiResponse]: One response per requested location.
+    """
+    with upstream_call(api, kind):
+        return await get_client().weather_api(url, params=params, method=method)
+
+
+async def weather_api_many(
+    url: str,
+    params: dict,
+    coordinates: list[tuple[float, float]],
+    kind: str,
+    api: str = "forecast",
+) -> list[WeatherApiResponse]:
+    """
+    Fetch one response per coordinate using multi-location upstream requests.
+
+    Coordinates are sent as comma-separated latitude/longitude lists in chunks
+    of BATCH_SIZE, chunks are requested concurrently and POSTed so long lists
+    do not hit URL length limits.
+
+    Args:
+        url: Open-Meteo API endpoint.
+        params: Request parameters shared by every location.
+        coordinates: (latitude, longitude) pairs.
+        kind: Forecast kind, see weather_api.
+        api: Upstream API, see weather_api.
+
+    Returns:
+        list[WeatherApiResponse]: Responses in the same order as coordinates.
+    """
+    chunks = [
+        coordinates[i:i + BATCH_SIZE] for i in range(0, len(coordinates), BATCH_SIZE)
+    ]
+    requests = [
+        weather_api(
+            url,
+            {
+                **params,
+                "latitude": ",".join(str(lat) for lat, _ in chunk),
+                "longitude": ",".join(str(long) for _, long in chunk),
+            },
+            kind,
+            method="POST",
+            api=api,
+        )
+        for chunk in chunks
+    ]
+    responses = []
+    for chunk_responses in await asyncio.gather(*requests):
+        responses.extend(chunk_responses)
+    return responses
@@ -0,0 +1,56 @@
+"""
+# controller/weather/columnar.py
+# This module converts upstream forecast sections into columnar NumPy payloads.
+"""
+import numpy as np
+from openmeteo_sdk.VariablesWithTime import VariablesWithTime
+from openmeteo_sdk.WeatherApiResponse import WeatherApiResponse
+from controller.weather.variables import ExtractionPlan
+from utils import weather_code_labels
+
+
+def time_axis(section: VariablesWithTime) -> np.ndarray:
+    """
+    Timestamps of a forecast section, from Time() to TimeEnd() (exclusive)
+    every Interval() seconds, as UTC datetime64[s].
+    """
+    return np.arange(
+        section.Time(), section.TimeEnd(), section.Interval(), dtype=np.int64
+    ).astype("datetime64[s]")
+
+
+def parse_columnar(
+    response: WeatherApiResponse, section: VariablesWithTime, plan: ExtractionPlan
+) -> dict:
+    """
+    Extract a forecast section as NumPy arrays, without per-element conversion.
+
+    Values are views on the upstream buffer. The time axis is sent as epoch
+    start, end (exclusive) and interval in seconds instead of one string per
+    step, weather codes stay numeric with a label for each distinct code.
+
+    Args:
+        response: One upstream location response.
+        section: Its Hourly() or Daily() section.
+        plan: Extraction plan the request was made with.
+
+    Returns:
+        dict: Location metadata, time axis and variables as typed arrays.
+    """
+    values = plan.arrays(section)
+    result = {
+        "latitude": response.Latitude(),
+        "longitude": response.Longitude(),
+        "elevation": response.Elevation(),
+        "utc_offset_seconds": response.UtcOffsetSeconds(),
+        "time": {
+            "start": section.Time(),
+            "end": section.TimeEnd(),
+            "interval": section.Interval(),
+        },
+        "variables": values,
+    }
+    if plan.weather_code is not None:
+        codes = values[plan.variables[plan.weather_code].name]
+        result["weather_code_labels"] = weather_code_labels(codes)
+    return result
@@ -2,50 +2,92 @@
 # controller/weather/current.py
 # This module fetches current weather data using the Open-Meteo API.
 """
-import openmeteo_requests
-import requests_cache
-from retry_requests import retry
+from typing import Iterable, Optional
+from openmeteo_sdk.WeatherApiResponse import WeatherApiResponse
+from controller.forecast_cache import fetch_forecast, fetch_forecast_many
+from controller.singleflight import forecast_key
+from controller.upstream import FORECAST_URL, weather_api, weather_api_many
+from controller.weather.variables import ExtractionPlan, get_plan
+from metrics import stage
 from utils import convert_weather_code
 
-cache_session = requests_cache.CachedSession(".cache", expire_after=3600)
-retry_session = retry(cache_session, retries=5, backoff_factor=0.2)
-openmeteo = openmeteo_requests.Client(session=retry_session)
+URL = FORECAST_URL
 
-URL = "https://api.open-meteo.com/v1/forecast"
+CURRENT_VARIABLES: str = get_plan("current").param
 
-def get_current_weather(
+
+async def get_current_weather(
     latitude: float,
     longitude: float,
-    current: str = ",".join(
-        [
-            "apparent_temperature",
-            "relative_humidity_2m",
-            "temperature_2m",
-            "is_day",
-            "cloud_cover",
-            "weather_code",
-            "pressure_msl",
-            "wind_speed_10m",
-        ]
-    ),
+    variables: Optional[Iterable[str] | str] = None,
 ) -> dict:
     """
     Fetch current weather for given latitude and longitude.
+    Cached per location, concurrent identical misses share a single upstream call.
+
+    Args:
+        latitude: Location latitude.
+        longitude: Location longitude.
+        variables: Variable names from the current registry, None for the defaults.
+
+    Raises:
+        ValueError: If a variable is unknown.
+    """
+    plan = get_plan("current", variables)
+    key = forecast_key("current", latitude, longitude, plan.param)
+    return await fetch_forecast(
+        "current", key, lambda: _fetch_current_weather(latitude, longitude, plan)
+    )
+
+
+async def _fetch_current_weather(
+    latitude: float, longitude: float, plan: ExtractionPlan
+) -> dict:
+    """
+    Request current weather from the upstream API and parse the response.
     """
     params = {
         "latitude": latitude,
         "longitude": longitude,
-        "current": current,
+        "current": plan.param,
         "timezone": "auto",
     }
-    responses = openmeteo.weather_api(URL, params=params)
-    response = responses[0]
-    var_list = current.split(",")
-    result = {}
-    for i, name in enumerate(var_list):
-        value = response.Current().Variables(i).Value()
-        result[name.strip()] = value
-        if name.strip() == "weather_code":
-            result["weather_condition"] = convert_weather_code(value)
-    print(result)
+    responses = await weather_api(URL, params, "current")
+    with stage("parse_current"):
+        return parse_current_weather(responses[0], plan)
+
+
+async def get_current_weather_batch(
+    coordinates: list[tuple[float, float]],
+    variables: Optional[Iterable[str] | str] = None,
+    refresh_within: Optional[float] = None,
+) -> list[dict]:
+    """
+    Fetch current weather for many locations using multi-location requests.
+    Cached locations are served from the cache, results follow the order of coordinates.
+    With refresh_within, refreshes the forecasts expiring within that many
+    seconds, see fetch_forecast_many.
+    """
+    plan = get_plan("current", variables)
+    params = {"current": plan.param, "timezone": "auto"}
+
+    async def fetch_missing(missing: list[int]) -> list[dict]:
+        responses = await weather_api_many(
+            URL, params, [coordinates[i] for i in missing], "current"
+        )
+        with stage("parse_current"):
+            return [parse_current_weather(response, plan) for response in responses]
+
+    keys = [forecast_key("current", lat, long, plan.param) for lat, long in coordinates]
+    return await fetch_forecast_many("current", keys, fetch_missing, refresh_within)
+
+
+def parse_current_weather(response: WeatherApiResponse, plan: ExtractionPlan) -> dict:
+    """
+    Extract the planned current variables from one upstream response.
+    """
+    result = plan.scalars(response.Current())
+    if plan.weather_code is not None:
+        code = result[plan.variables[plan.weather_code].name]
+        result["weather_condition"] = convert_weather_code(code)
     return result
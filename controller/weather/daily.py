@@ -3,89 +3,401 @@
 # This module fetches daily weather forecast data using the Open-Meteo API
 """
 
-from datetime import datetime
-import openmeteo_requests
-import pandas as pd
-import requests_cache
-from retry_requests import retry
-from utils import convert_weather_code
+from datetime import date, datetime, timedelta, timezone
+from typing import Iterable, Optional
+import numpy as np
+from openmeteo_sdk.WeatherApiResponse import WeatherApiResponse
+from cache.lru import LRUCache, MISSING
+from controller.forecast_cache import get_forecast_cache
+from controller.singleflight import forecast_flight, forecast_key
+from controller.upstream import FORECAST_URL, weather_api, weather_api_many
+from controller.weather.columnar import time_axis
+from controller.weather.variables import MAX_FORECAST_DAYS, ExtractionPlan, get_plan
+from metrics import stage
+from utils import convert_weather_codes, weather_code_labels
 
-cache_session = requests_cache.CachedSession(".cache", expire_after=3600)
-retry_session = retry(cache_session, retries=5, backoff_factor=0.2)
-openmeteo = openmeteo_requests.Client(session=retry_session)
+URL = FORECAST_URL
 
-URL = "https://api.open-meteo.com/v1/forecast"
+DAILY_VARIABLES: str = get_plan("daily").param
 
+# Days after the start date in the default window (today and the next 7 days)
+DEFAULT_WINDOW_DAYS = 7
+# Oldest day the forecast API serves, in days before today
+MAX_PAST_DAYS = 92
 
-def get_daily_forecast(
+DAY_SECONDS = 86400
+# Widest UTC offsets in use (UTC-12 to UTC+14), in seconds
+MIN_UTC_OFFSET, MAX_UTC_OFFSET = -12 * 3600, 14 * 3600
+
+# UTC offsets reported upstream by rounded coordinates, they change with DST
+_utc_offsets = LRUCache(max_size=4096, ttl=DAY_SECONDS)
+
+
+def _offset_key(latitude: float, longitude: float) -> tuple:
+    return round(latitude, 2), round(longitude, 2)
+
+
+def utc_offset(latitude: float, longitude: float) -> int:
+    """
+    UTC offset in seconds of a location, as last reported upstream
+    (timezone=auto), else estimated from the longitude (solar time).
+    """
+    offset = _utc_offsets.get(_offset_key(latitude, longitude))
+    if offset is not MISSING:
+        return offset
+    return min(max(round(longitude / 15) * 3600, MIN_UTC_OFFSET), MAX_UTC_OFFSET)
+
+
+def local_date(offset: int) -> date:
+    """
+    Current date at a UTC offset in seconds.
+    """
+    return (datetime.now(timezone.utc) + timedelta(seconds=offset)).date()
+
+
+def daily_window(
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    offset: Optional[int] = None,
+) -> list[str]:
+    """
+    Normalize a requested window to the days it covers.
+
+    Days are local to the location, as the upstream serves them with
+    timezone=auto. Evaluated per call: the start defaults to today at the
+    location and the end to DEFAULT_WINDOW_DAYS after the start. Without an
+    offset (no location yet), today is the UTC date and any day served
+    upstream for some time zone is accepted.
+
+    Args:
+        start_date: First day (YYYY-MM-DD), None for today.
+        end_date: Last day (YYYY-MM-DD), included.
+        offset: UTC offset of the location in seconds, see utc_offset().
+
+    Returns:
+        list[str]: ISO dates from start to end.
+
+    Raises:
+        ValueError: If a date is malformed, the window is reversed or it
+            leaves the range served upstream.
+    """
+    if offset is None:
+        today, earliest, latest = (
+            local_date(0), local_date(MIN_UTC_OFFSET), local_date(MAX_UTC_OFFSET)
+        )
+    else:
+        today = earliest = latest = local_date(offset)
+    try:
+        start = date.fromisoformat(start_date) if start_date else today
+        end = (
+            date.fromisoformat(end_date)
+            if end_date
+            else start + timedelta(days=DEFAULT_WINDOW_DAYS)
+        )
+    except ValueError as e:
+        raise ValueError(f"Invalid date, expected YYYY-MM-DD: {e}") from e
+    if end < start:
+        raise ValueError("end_date must not be before start_date")
+    first, last = earliest - timedelta(days=MAX_PAST_DAYS), latest + timedelta(
+        days=MAX_FORECAST_DAYS - 1
+    )
+    if start < first or end > last:
+        raise ValueError(
+            f"Daily forecasts are available from {first.isoformat()} to {last.isoformat()}"
+        )
+    return [(start + timedelta(days=i)).isoformat() for i in range((end - start).days + 1)]
+
+
+def _day_key(latitude: float, longitude: float, plan: ExtractionPlan, day: str) -> tuple:
+    return forecast_key("daily", latitude, longitude, plan.param, day, day) + ("day",)
+
+
+async def get_daily_forecast(
     latitude: float,
     longitude: float,
-    start_date: str = datetime.now().strftime("%Y-%m-%d"),
-    end_date: str = (datetime.now() + pd.Timedelta(days=7)).strftime("%Y-%m-%d"),
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    columnar: bool = False,
+    variables: Optional[Iterable[str] | str] = None,
 ) -> dict:
     """
     Fetch daily weather forecast for given latitude and longitude.
+    Cached per location and day: a window is assembled from the cached days
+    and only the span of the missing ones is requested upstream, concurrent
+    identical misses share a single upstream call.
+    With columnar, variables are returned as NumPy arrays, see parse_columnar.
+
+    Args:
+        latitude: Location latitude.
+        longitude: Location longitude.
+        start_date: First day (YYYY-MM-DD), today at the location when omitted.
+        end_date: Last day (YYYY-MM-DD), a week after the start when omitted.
+        columnar: Return NumPy arrays and an epoch time axis.
+        variables: Variable names from the daily registry, None for the defaults.
+
+    Raises:
+        ValueError: If a variable is not in the daily registry, or the window
+            is invalid (see daily_window) or has no forecast upstream.
+    """
+    plan = get_plan("daily", variables)
+    days = daily_window(start_date, end_date, utc_offset(latitude, longitude))
+    (result,) = await _daily_forecasts([(latitude, longitude)], plan, [days], columnar)
+    if isinstance(result, ValueError):
+        raise result
+    return result
+
+
+async def get_daily_forecast_batch(
+    coordinates: list[tuple[float, float]],
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    columnar: bool = False,
+    variables: Optional[Iterable[str] | str] = None,
+    refresh_within: Optional[float] = None,
+) -> list[Optional[dict] | ValueError]:
+    """
+    Fetch daily weather forecasts for many locations using multi-location requests.
+    Cached days are served from the cache, results follow the order of coordinates.
+    Windows are local to each location, see daily_window. A location whose
+    window is out of range or has no forecast gets the ValueError of
+    get_daily_forecast instead of a result, the others are still returned.
+    With refresh_within, refreshes the days expiring within that many seconds
+    and returns only those, None for the locations with nothing to refresh.
+
+    Raises:
+        ValueError: If a variable is not in the daily registry or a date is
+            malformed.
+    """
+    plan = get_plan("daily", variables)
+    # Malformed dates fail the whole batch, ranges are checked per location
+    daily_window(start_date, end_date)
+    windows = []
+    for latitude, longitude in coordinates:
+        try:
+            windows.append(
+                daily_window(start_date, end_date, utc_offset(latitude, longitude))
+            )
+        except ValueError as e:
+            windows.append(e)
+    return await _daily_forecasts(coordinates, plan, windows, columnar, refresh_within)
+
+
+async def _daily_forecasts(
+    coordinates: list[tuple[float, float]],
+    plan: ExtractionPlan,
+    windows: list[list[str] | ValueError],
+    columnar: bool,
+    refresh_within: Optional[float] = None,
+) -> list[Optional[dict] | ValueError]:
     """
-    daily: str = ",".join(
-        [
-            "weather_code",
-            "apparent_temperature_max",
-            "sunshine_duration",
-            "temperature_2m_max",
-            "cloud_cover_mean",
-            "relative_humidity_2m_mean",
-            "pressure_msl_mean",
-            "visibility_mean",
-            "wind_speed_10m_mean",
-            "temperature_2m_min",
+    Assemble the window (days, or the ValueError of an invalid window) of
+    every location from cached day slices, fetching the missing span of
+    each location. Locations missing the same span are fetched with one
+    multi-location request. A location without a forecast gets its
+    ValueError, or None when refreshing.
+    """
+    cache = get_forecast_cache()
+    keys = [
+        {day: _day_key(lat, long, plan, day) for day in days}
+        if not isinstance(days, ValueError) else {}
+        for (lat, long), days in zip(coordinates, windows)
+    ]
+    flat_keys = [key for location_keys in keys for key in location_keys.values()]
+    if refresh_within is None:
+        cached = await cache.get_many(flat_keys)
+    else:
+        # Days not due are left out of the results, only their TTL is read
+        cached = [
+            None if left is None or left <= refresh_within else False
+            for left in await cache.remaining_many(flat_keys)
         ]
-    )
 
+    slices: list[dict[str, dict]] = []
+    spans: dict[tuple[str, str], list[int]] = {}
+    position = 0
+    for i, location_keys in enumerate(keys):
+        days = list(location_keys)
+        location_cached = dict(zip(days, cached[position:position + len(days)]))
+        position += len(days)
+        slices.append({day: value for day, value in location_cached.items() if value})
+        missing = [day for day, value in location_cached.items() if value is None]
+        if missing:
+            # One request for the whole span, days cached in between are refreshed
+            spans.setdefault((missing[0], missing[-1]), []).append(i)
+
+    for (first, last), indices in spans.items():
+        fetched = await _fetch_days(
+            [coordinates[i] for i in indices], [keys[i] for i in indices], plan, first, last
+        )
+        for i, location_slices in zip(indices, fetched):
+            slices[i].update(location_slices)
+
+    fetched_indices = {i for indices in spans.values() for i in indices}
+    results: list[Optional[dict] | ValueError] = []
+    for i, (location_slices, days) in enumerate(zip(slices, windows)):
+        if isinstance(days, ValueError):
+            results.append(None if refresh_within is not None else days)
+            continue
+        if refresh_within is not None and i not in fetched_indices:
+            results.append(None)
+            continue
+        try:
+            results.append(_assemble(location_slices, days, plan, columnar))
+        except ValueError as e:
+            # One location without a forecast does not fail the others
+            results.append(None if refresh_within is not None else e)
+    return results
+
+
+async def _fetch_days(
+    coordinates: list[tuple[float, float]],
+    keys: list[dict[str, tuple]],
+    plan: ExtractionPlan,
+    start_date: str,
+    end_date: str,
+) -> list[dict[str, dict]]:
+    """
+    Request a span of days upstream, cache it day by day and return the day
+    slices of every location.
+    """
     params = {
-        "latitude": latitude,
-        "longitude": longitude,
-        "daily": daily,
+        "daily": plan.param,
         "timezone": "auto",
         "start_date": start_date,
         "end_date": end_date,
     }
-    responses = openmeteo.weather_api(URL, params=params)
-    response = responses[0]
-
-    time_range = pd.date_range(
-        start=pd.to_datetime(response.Daily().Time(), unit="s", utc=True),
-        end=pd.to_datetime(response.Daily().TimeEnd(), unit="s", utc=True),
-        freq=pd.Timedelta(seconds=response.Daily().Interval()),
-        inclusive="left",
-    )
 
-    daily_time_str = [time.isoformat() for time in time_range]
+    async def fill() -> list[dict[str, dict]]:
+        if len(coordinates) == 1:
+            (latitude, longitude), = coordinates
+            responses = await weather_api(
+                URL, {"latitude": latitude, "longitude": longitude, **params}, "daily"
+            )
+        else:
+            responses = await weather_api_many(URL, params, coordinates, "daily")
+        with stage("parse_daily"):
+            fetched = [split_daily_forecast(response, plan) for response in responses]
+        for (latitude, longitude), response in zip(coordinates, responses):
+            _utc_offsets.set(_offset_key(latitude, longitude), response.UtcOffsetSeconds())
+        # Only the days of the requested window are cached
+        await get_forecast_cache().set_many(
+            "daily",
+            {
+                key: location_slices[day]
+                for location_keys, location_slices in zip(keys, fetched)
+                for day, key in location_keys.items()
+                if day in location_slices
+            },
+        )
+        return fetched
+
+    if len(coordinates) > 1:
+        return await fill()
+    flight_key = forecast_key(
+        "daily", *coordinates[0], plan.param, start_date, end_date
+    ) + ("days",)
+    return await forecast_flight.do(flight_key, fill)
+
+
+def split_daily_forecast(response: WeatherApiResponse, plan: ExtractionPlan) -> dict[str, dict]:
+    """
+    Split one upstream daily response into per-day slices.
+
+    Returns:
+        dict: Slices keyed by the local date (YYYY-MM-DD) of the location,
+            each with the epoch of the day start, the planned values in plan
+            order and the location metadata.
+    """
+    daily = response.Daily()
+    offset = response.UtcOffsetSeconds()
+    meta = {
+        "utc_offset_seconds": offset,
+        "latitude": response.Latitude(),
+        "longitude": response.Longitude(),
+        "elevation": response.Elevation(),
+    }
+    columns = [values.tolist() for values in plan.arrays(daily).values()]
+    slices = {}
+    for i, start in enumerate(time_axis(daily).astype(np.int64).tolist()):
+        day = datetime.fromtimestamp(start + offset, tz=timezone.utc).date().isoformat()
+        slices[day] = {"time": start, "values": [column[i] for column in columns], **meta}
+    return slices
+
+
+def _assemble(
+    slices: dict[str, dict], days: list[str], plan: ExtractionPlan, columnar: bool
+) -> dict:
+    """
+    Build the response of a window from its day slices, in the layout of
+    parse_daily_forecast or parse_columnar.
+
+    Raises:
+        ValueError: If no day of the window has a forecast.
+    """
+    ordered = [slices[day] for day in days if day in slices]
+    if not ordered:
+        raise ValueError(f"No daily forecast from {days[0]} to {days[-1]}")
+    first = ordered[0]
+    times = np.array([day["time"] for day in ordered], dtype=np.int64)
+    # Cache backends storing JSON return missing values (NaN) as None
+    columns = {
+        variable.name: np.array([day["values"][i] for day in ordered], dtype=variable.dtype)
+        for i, variable in enumerate(plan.variables)
+    }
+    if columnar:
+        result = {
+            "latitude": first["latitude"],
+            "longitude": first["longitude"],
+            "elevation": first["elevation"],
+            "utc_offset_seconds": first["utc_offset_seconds"],
+            "time": {
+                "start": int(times[0]),
+                "end": int(times[-1]) + DAY_SECONDS,
+                "interval": DAY_SECONDS,
+            },
+            "variables": columns,
+        }
+        if plan.weather_code is not None:
+            codes = columns[plan.variables[plan.weather_code].name]
+            result["weather_code_labels"] = weather_code_labels(codes)
+        return result
+
+    result = {
+        "daily_time": np.char.add(
+            np.datetime_as_string(times.astype("datetime64[s]"), unit="s"), "+00:00"
+        ).tolist(),
+        "utc_offset_seconds": first["utc_offset_seconds"],
+        "latitude": first["latitude"],
+        "longitude": first["longitude"],
+        "elevation": first["elevation"],
+    }
+    for variable, values in zip(plan.variables, columns.values()):
+        if variable.weather_code:
+            result["daily_conditions"] = convert_weather_codes(values).tolist()
+        else:
+            result[variable.name] = values.tolist()
+    return result
 
-    weather_conditions = []
 
-    for code in response.Daily().Variables(0).ValuesAsNumpy().tolist():
-        weather_conditions.append(convert_weather_code(code))
+def parse_daily_forecast(response: WeatherApiResponse, plan: ExtractionPlan) -> dict:
+    """
+    Extract the planned daily variables from one upstream response.
+    Weather codes are returned as labels under daily_conditions.
+    """
+    daily = response.Daily()
+    # Same ISO format the API has always returned, with an explicit UTC offset
+    times = np.char.add(np.datetime_as_string(time_axis(daily), unit="s"), "+00:00")
 
-    return {
-        "daily_time": daily_time_str,
+    result = {
+        "daily_time": times.tolist(),
         "utc_offset_seconds": response.UtcOffsetSeconds(),
         "latitude": response.Latitude(),
         "longitude": response.Longitude(),
         "elevation": response.Elevation(),
-        "daily_conditions": weather_conditions,
-        "apparent_temperature_max": response.Daily()
-        .Variables(1)
-        .ValuesAsNumpy()
-        .tolist(),
-        "sunshine_duration": response.Daily().Variables(2).ValuesAsNumpy().tolist(),
-        "temperature_2m_max": response.Daily().Variables(3).ValuesAsNumpy().tolist(),
-        "cloud_cover_mean": response.Daily().Variables(4).ValuesAsNumpy().tolist(),
-        "relative_humidity_2m_mean": response.Daily()
-        .Variables(5)
-        .ValuesAsNumpy()
-        .tolist(),
-        "pressure_msl_mean": response.Daily().Variables(6).ValuesAsNumpy().tolist(),
-        "visibility_mean": response.Daily().Variables(7).ValuesAsNumpy().tolist(),
-        "wind_speed_10m_mean": response.Daily().Variables(8).ValuesAsNumpy().tolist(),
-        "temperature_2m_min": response.Daily().Variables(9).ValuesAsNumpy().tolist(),
     }
+    for variable, values in zip(plan.variables, plan.arrays(daily).values()):
+        if variable.weather_code:
+            result["daily_conditions"] = convert_weather_codes(values).tolist()
+        else:
+            result[variable.name] = values.tolist()
+    return result
@@ -2,49 +2,138 @@
 # controller/weather/hourly.py
 # This module fetches hourly weather forecast data using the Open-Meteo API.
 """
-import openmeteo_requests
+from typing import Iterable, Optional
+import numpy as np
+from openmeteo_sdk.WeatherApiResponse import WeatherApiResponse
+from controller.forecast_cache import fetch_forecast, fetch_forecast_many
+from controller.singleflight import forecast_key
+from controller.upstream import FORECAST_URL, weather_api, weather_api_many
+from controller.weather.columnar import parse_columnar, time_axis
+from controller.weather.variables import (
+    DEFAULT_FORECAST_DAYS,
+    ExtractionPlan,
+    check_forecast_days,
+    get_plan,
+)
+from metrics import stage
+from utils import convert_weather_codes
 
-import pandas as pd
-import requests_cache
-from retry_requests import retry
+URL = FORECAST_URL
 
-cache_session = requests_cache.CachedSession(".cache", expire_after=3600)
-retry_session = retry(cache_session, retries=5, backoff_factor=0.2)
-openmeteo = openmeteo_requests.Client(session=retry_session)
+HOURLY_VARIABLES: str = get_plan("hourly").param
 
-URL = "https://api.open-meteo.com/v1/forecast"
 
-
-def get_hourly_forecast(latitude: float, longitude: float) -> dict:
+async def get_hourly_forecast(
+    latitude: float,
+    longitude: float,
+    columnar: bool = False,
+    variables: Optional[Iterable[str] | str] = None,
+    forecast_days: int = DEFAULT_FORECAST_DAYS,
+) -> dict:
     """
     Fetch hourly weather forecast for given latitude and longitude.
+    Cached per location, concurrent identical misses share a single upstream call.
+    With columnar, variables are returned as NumPy arrays, see parse_columnar.
+
+    Args:
+        latitude: Location latitude.
+        longitude: Location longitude.
+        columnar: Return NumPy arrays and an epoch time axis.
+        variables: Variable names from the hourly registry, None for the defaults.
+        forecast_days: Forecast horizon, 1 to 16 days.
+
+    Raises:
+        ValueError: If a variable is unknown or the horizon is out of range.
     """
-    hourly: str = ",".join(
-        [
-            "temperature_2m",
-        ]
+    plan = get_plan("hourly", variables)
+    check_forecast_days(forecast_days)
+    key = _hourly_key(latitude, longitude, plan, forecast_days, columnar)
+    return await fetch_forecast(
+        "hourly",
+        key,
+        lambda: _fetch_hourly_forecast(latitude, longitude, plan, forecast_days, columnar),
+    )
+
+
+def _hourly_key(
+    latitude: float,
+    longitude: float,
+    plan: ExtractionPlan,
+    forecast_days: int,
+    columnar: bool,
+) -> tuple:
+    key = forecast_key(
+        "hourly", latitude, longitude, plan.param, forecast_days=forecast_days
     )
+    return key + ("columnar",) if columnar else key
 
+
+def _parse(response: WeatherApiResponse, plan: ExtractionPlan, columnar: bool) -> dict:
+    if columnar:
+        return parse_columnar(response, response.Hourly(), plan)
+    return parse_hourly_forecast(response, plan)
+
+
+async def _fetch_hourly_forecast(
+    latitude: float,
+    longitude: float,
+    plan: ExtractionPlan,
+    forecast_days: int = DEFAULT_FORECAST_DAYS,
+    columnar: bool = False,
+) -> dict:
+    """
+    Request the hourly forecast from the upstream API and parse the response.
+    """
     params = {
         "latitude": latitude,
         "longitude": longitude,
-        "hourly": hourly,
+        "hourly": plan.param,
+        "forecast_days": forecast_days,
         "timezone": "auto",
     }
-    responses = openmeteo.weather_api(URL, params=params)
-    response = responses[0]
-
-    time_range = pd.date_range(
-        start=pd.to_datetime(response.Hourly().Time(), unit="s", utc=True),
-        end=pd.to_datetime(response.Hourly().TimeEnd(), unit="s", utc=True),
-        freq=pd.Timedelta(seconds=response.Hourly().Interval()),
-        inclusive="left",
-    )
-    hourly_time_str = time_range.strftime("%Y-%m-%dT%H:%M:%S").tolist()
+    responses = await weather_api(URL, params, "hourly")
+    with stage("parse_hourly"):
+        return _parse(responses[0], plan, columnar)
 
-    data = {
-        "temperature_2m": response.Hourly().Variables(0).ValuesAsNumpy().tolist(),
-        "time": hourly_time_str,
-    }
 
+async def get_hourly_forecast_batch(
+    coordinates: list[tuple[float, float]],
+    columnar: bool = False,
+    variables: Optional[Iterable[str] | str] = None,
+    forecast_days: int = DEFAULT_FORECAST_DAYS,
+    refresh_within: Optional[float] = None,
+) -> list[dict]:
+    """
+    Fetch hourly weather forecasts for many locations using multi-location requests.
+    Cached locations are served from the cache, results follow the order of coordinates.
+    With refresh_within, refreshes the forecasts expiring within that many
+    seconds, see fetch_forecast_many.
+    """
+    plan = get_plan("hourly", variables)
+    check_forecast_days(forecast_days)
+    params = {"hourly": plan.param, "forecast_days": forecast_days, "timezone": "auto"}
+
+    async def fetch_missing(missing: list[int]) -> list[dict]:
+        responses = await weather_api_many(
+            URL, params, [coordinates[i] for i in missing], "hourly"
+        )
+        with stage("parse_hourly"):
+            return [_parse(response, plan, columnar) for response in responses]
+
+    keys = [
+        _hourly_key(lat, long, plan, forecast_days, columnar) for lat, long in coordinates
+    ]
+    return await fetch_forecast_many("hourly", keys, fetch_missing, refresh_within)
+
+
+def parse_hourly_forecast(response: WeatherApiResponse, plan: ExtractionPlan) -> dict:
+    """
+    Extract the planned hourly variables from one upstream response.
+    """
+    hourly = response.Hourly()
+    data = {name: values.tolist() for name, values in plan.arrays(hourly).items()}
+    if plan.weather_code is not None:
+        codes = hourly.Variables(plan.weather_code).ValuesAsNumpy()
+        data["conditions"] = convert_weather_codes(codes).tolist()
+    data["time"] = np.datetime_as_string(time_axis(hourly), unit="s").tolist()
     return data
@@ -0,0 +1,168 @@
+"""
+# controller/weather/overview.py
+# This module fetches the current weather and the daily and hourly forecasts of a
+# location in one Open-Meteo request, for pages showing all three.
+"""
+from openmeteo_sdk.WeatherApiResponse import WeatherApiResponse
+from controller.forecast_cache import fetch_forecast, fetch_forecast_many
+from controller.singleflight import forecast_key
+from controller.upstream import FORECAST_URL, weather_api, weather_api_many
+from controller.weather.columnar import parse_columnar
+from controller.weather.current import parse_current_weather
+from controller.weather.daily import DAY_SECONDS, DEFAULT_WINDOW_DAYS, parse_daily_forecast
+from controller.weather.hourly import parse_hourly_forecast
+from controller.weather.variables import (
+    DEFAULT_FORECAST_DAYS,
+    ExtractionPlan,
+    check_forecast_days,
+    get_plan,
+)
+from metrics import stage
+from utils import weather_code_labels
+
+URL = FORECAST_URL
+
+# Days of the default /weather/daily window (see daily_window), the fewest the
+# daily section covers so both show the same days
+DAILY_SECTION_DAYS = DEFAULT_WINDOW_DAYS + 1
+
+
+def _params(forecast_days: int) -> dict:
+    # One horizon applies to both sections upstream, so the longer one is
+    # requested and the hourly section is cut to forecast_days when parsed
+    return {
+        "current": get_plan("current").param,
+        "daily": get_plan("daily").param,
+        "hourly": get_plan("hourly").param,
+        "forecast_days": max(forecast_days, DAILY_SECTION_DAYS),
+        "timezone": "auto",
+    }
+
+
+def _overview_key(
+    latitude: float, longitude: float, forecast_days: int, columnar: bool
+) -> tuple:
+    # The default variables of every section, so none are part of the key
+    key = forecast_key("overview", latitude, longitude, "", forecast_days=forecast_days)
+    return key + ("columnar",) if columnar else key
+
+
+async def get_weather_overview(
+    latitude: float,
+    longitude: float,
+    columnar: bool = False,
+    forecast_days: int = DEFAULT_FORECAST_DAYS,
+) -> dict:
+    """
+    Fetch current weather, daily and hourly forecasts with a single upstream call.
+    Cached per location, concurrent identical misses share a single upstream call.
+
+    Args:
+        latitude: Location latitude.
+        longitude: Location longitude.
+        columnar: Daily and hourly sections as NumPy arrays, see parse_columnar.
+        forecast_days: Hourly horizon, 1 to 16 days. The daily section covers
+            the same days, and at least the default window of get_daily_forecast
+            (today and the next DEFAULT_WINDOW_DAYS days).
+
+    Returns:
+        dict: current, daily and hourly sections, each as returned by the
+            endpoint of its kind.
+
+    Raises:
+        ValueError: If the horizon is out of range.
+    """
+    check_forecast_days(forecast_days)
+    key = _overview_key(latitude, longitude, forecast_days, columnar)
+    return await fetch_forecast(
+        "overview",
+        key,
+        lambda: _fetch_weather_overview(latitude, longitude, forecast_days, columnar),
+    )
+
+
+async def _fetch_weather_overview(
+    latitude: float, longitude: float, forecast_days: int, columnar: bool
+) -> dict:
+    """
+    Request all three sections from the upstream API and parse the response.
+    """
+    params = {"latitude": latitude, "longitude": longitude, **_params(forecast_days)}
+    responses = await weather_api(URL, params, "overview")
+    return parse_weather_overview(responses[0], columnar, forecast_days)
+
+
+async def get_weather_overview_batch(
+    coordinates: list[tuple[float, float]],
+    columnar: bool = False,
+    forecast_days: int = DEFAULT_FORECAST_DAYS,
+    refresh_within: float | None = None,
+) -> list[dict]:
+    """
+    Fetch weather overviews for many locations using multi-location requests.
+    Cached locations are served from the cache, results follow the order of coordinates.
+    With refresh_within, refreshes the overviews expiring within that many
+    seconds, see fetch_forecast_many.
+    """
+    check_forecast_days(forecast_days)
+    params = _params(forecast_days)
+
+    async def fetch_missing(missing: list[int]) -> list[dict]:
+        responses = await weather_api_many(
+            URL, params, [coordinates[i] for i in missing], "overview"
+        )
+        return [
+            parse_weather_overview(response, columnar, forecast_days) for response in responses
+        ]
+
+    keys = [
+        _overview_key(lat, long, forecast_days, columnar) for lat, long in coordinates
+    ]
+    return await fetch_forecast_many("overview", keys, fetch_missing, refresh_within)
+
+
+def parse_weather_overview(
+    response: WeatherApiResponse,
+    columnar: bool = False,
+    forecast_days: int = DEFAULT_FORECAST_DAYS,
+) -> dict:
+    """
+    Extract every section of one upstream response with the parsers of each
+    kind, keeping the first forecast_days days of the hourly section.
+    """
+    current_plan, daily_plan, hourly_plan = (
+        get_plan("current"), get_plan("daily"), get_plan("hourly")
+    )
+    with stage("parse_overview"):
+        if columnar:
+            daily = parse_columnar(response, response.Daily(), daily_plan)
+            hourly = parse_columnar(response, response.Hourly(), hourly_plan)
+        else:
+            daily = parse_daily_forecast(response, daily_plan)
+            hourly = parse_hourly_forecast(response, hourly_plan)
+        return {
+            "current": parse_current_weather(response, current_plan),
+            "daily": daily,
+            "hourly": _first_days(hourly, forecast_days, columnar, hourly_plan),
+        }
+
+
+def _first_days(hourly: dict, days: int, columnar: bool, plan: ExtractionPlan) -> dict:
+    """
+    Cut a parsed hourly section to its first days.
+    """
+    if not columnar:
+        steps = days * 24
+        return {name: values[:steps] for name, values in hourly.items()}
+    time = hourly["time"]
+    steps = days * DAY_SECONDS // time["interval"]
+    variables = {name: values[:steps] for name, values in hourly["variables"].items()}
+    result = {
+        **hourly,
+        "time": {**time, "end": min(time["end"], time["start"] + steps * time["interval"])},
+        "variables": variables,
+    }
+    if plan.weather_code is not None:
+        codes = variables[plan.variables[plan.weather_code].name]
+        result["weather_code_labels"] = weather_code_labels(codes)
+    return result
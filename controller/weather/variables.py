@@ -0,0 +1,231 @@
+"""
+# controller/weather/variables.py
+# This module declares the forecast variables the API can request upstream,
+# and turns a selection of them into a cached extraction plan.
+"""
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Iterable, Optional
+
+import numpy as np
+from openmeteo_sdk.VariablesWithTime import VariablesWithTime
+
+# Longest forecast horizon offered by the upstream API, in days
+MAX_FORECAST_DAYS = 16
+DEFAULT_FORECAST_DAYS = 7
+
+
+@dataclass(frozen=True)
+class Variable:
+    """
+    One upstream forecast variable.
+
+    Attributes:
+        name: Upstream variable name, also the output column name.
+        dtype: NumPy dtype of the output column.
+        weather_code: Whether the values are WMO weather codes that get labels.
+    """
+
+    name: str
+    dtype: type = np.float32
+    weather_code: bool = False
+
+
+def _registry(*variables: Variable) -> dict[str, Variable]:
+    return {variable.name: variable for variable in variables}
+
+
+WEATHER_CODE = Variable("weather_code", weather_code=True)
+IS_DAY = Variable("is_day", dtype=np.uint8)
+
+# Variables available per forecast kind, in canonical request order
+REGISTRY: dict[str, dict[str, Variable]] = {
+    "current": _registry(
+        Variable("apparent_temperature"),
+        Variable("relative_humidity_2m"),
+        Variable("temperature_2m"),
+        IS_DAY,
+        Variable("cloud_cover"),
+        WEATHER_CODE,
+        Variable("pressure_msl"),
+        Variable("wind_speed_10m"),
+        Variable("surface_pressure"),
+        Variable("precipitation"),
+        Variable("rain"),
+        Variable("showers"),
+        Variable("snowfall"),
+        Variable("wind_direction_10m"),
+        Variable("wind_gusts_10m"),
+    ),
+    "hourly": _registry(
+        Variable("temperature_2m"),
+        Variable("relative_humidity_2m"),
+        Variable("dew_point_2m"),
+        Variable("apparent_temperature"),
+        Variable("precipitation_probability"),
+        Variable("precipitation"),
+        Variable("rain"),
+        Variable("showers"),
+        Variable("snowfall"),
+        Variable("snow_depth"),
+        WEATHER_CODE,
+        Variable("pressure_msl"),
+        Variable("surface_pressure"),
+        Variable("cloud_cover"),
+        Variable("visibility"),
+        Variable("wind_speed_10m"),
+        Variable("wind_direction_10m"),
+        Variable("wind_gusts_10m"),
+        Variable("uv_index"),
+        IS_DAY,
+    ),
+    "daily": _registry(
+        WEATHER_CODE,
+        Variable("apparent_temperature_max"),
+        Variable("sunshine_duration"),
+        Variable("temperature_2m_max"),
+        Variable("cloud_cover_mean"),
+        Variable("relative_humidity_2m_mean"),
+        Variable("pressure_msl_mean"),
+        Variable("visibility_mean"),
+        Variable("wind_speed_10m_mean"),
+        Variable("temperature_2m_min"),
+        Variable("temperature_2m_mean"),
+        Variable("apparent_temperature_min"),
+        Variable("daylight_duration"),
+        Variable("uv_index_max"),
+        Variable("precipitation_sum"),
+        Variable("rain_sum"),
+        Variable("showers_sum"),
+        Variable("snowfall_sum"),
+        Variable("precipitation_hours"),
+        Variable("precipitation_probability_max"),
+        Variable("wind_speed_10m_max"),
+        Variable("wind_gusts_10m_max"),
+        Variable("wind_direction_10m_dominant"),
+    ),
+}
+
+# Variables returned when the caller does not choose
+DEFAULT_VARIABLES: dict[str, tuple[str, ...]] = {
+    "current": (
+        "apparent_temperature",
+        "relative_humidity_2m",
+        "temperature_2m",
+        "is_day",
+        "cloud_cover",
+        "weather_code",
+        "pressure_msl",
+        "wind_speed_10m",
+    ),
+    "hourly": ("temperature_2m",),
+    "daily": (
+        "weather_code",
+        "apparent_temperature_max",
+        "sunshine_duration",
+        "temperature_2m_max",
+        "cloud_cover_mean",
+        "relative_humidity_2m_mean",
+        "pressure_msl_mean",
+        "visibility_mean",
+        "wind_speed_10m_mean",
+        "temperature_2m_min",
+    ),
+}
+
+
+@dataclass(frozen=True)
+class ExtractionPlan:
+    """
+    Precomputed mapping from upstream variable index to output column.
+
+    Attributes:
+        kind: Forecast kind (current, hourly, daily).
+        variables: Selected variables in request order, the upstream response
+            returns them at the same indices.
+        param: Comma-separated names for the upstream request.
+        weather_code: Index of the weather code variable, None if not selected.
+    """
+
+    kind: str
+    variables: tuple[Variable, ...]
+    param: str
+    weather_code: Optional[int]
+
+    def arrays(self, section: VariablesWithTime) -> dict[str, np.ndarray]:
+        """
+        Extract every selected variable as an array, float32 columns are
+        views on the upstream buffer.
+        """
+        return {
+            variable.name: section.Variables(i).ValuesAsNumpy().astype(
+                variable.dtype, copy=False
+            )
+            for i, variable in enumerate(self.variables)
+        }
+
+    def scalars(self, section: VariablesWithTime) -> dict[str, float | int]:
+        """
+        Extract every selected variable of a section holding single values.
+        """
+        return {
+            variable.name: variable.dtype(section.Variables(i).Value()).item()
+            for i, variable in enumerate(self.variables)
+        }
+
+
+@lru_cache(maxsize=256)
+def _build_plan(kind: str, names: frozenset[str]) -> ExtractionPlan:
+    registry = REGISTRY[kind]
+    unknown = names - registry.keys()
+    if unknown:
+        raise ValueError(
+            f"Unknown {kind} variables: {', '.join(sorted(unknown))}. "
+            f"Available: {', '.join(registry)}"
+        )
+    # Registry order makes every selection of the same names one plan
+    variables = tuple(variable for name, variable in registry.items() if name in names)
+    weather_code = next(
+        (i for i, variable in enumerate(variables) if variable.weather_code), None
+    )
+    return ExtractionPlan(
+        kind=kind,
+        variables=variables,
+        param=",".join(variable.name for variable in variables),
+        weather_code=weather_code,
+    )
+
+
+def get_plan(kind: str, names: Optional[Iterable[str] | str] = None) -> ExtractionPlan:
+    """
+    Return the extraction plan for a selection of variables, built once per
+    distinct selection.
+
+    Args:
+        kind: Forecast kind (current, hourly, daily).
+        names: Variable names, as an iterable or comma-separated string.
+            None selects the defaults of the kind.
+
+    Raises:
+        ValueError: If a name is not in the registry of the kind.
+    """
+    if names is None:
+        names = DEFAULT_VARIABLES[kind]
+    elif isinstance(names, str):
+        names = names.split(",")
+    selected = frozenset(name.strip() for name in names if name.strip())
+    if not selected:
+        raise ValueError(f"At least one {kind} variable is required")
+    return _build_plan(kind, selected)
+
+
+def check_forecast_days(days: int) -> int:
+    """
+    Validate a forecast horizon in days.
+
+    Raises:
+        ValueError: If days is outside 1..MAX_FORECAST_DAYS.
+    """
+    if not 1 <= days <= MAX_FORECAST_DAYS:
+        raise ValueError(f"forecast_days must be between 1 and {MAX_FORECAST_DAYS}")
+    return days
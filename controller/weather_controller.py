@@ -3,29 +3,25 @@
 # This module fetches weather data using the Open-Meteo API
 """
 
+import asyncio
 import sys
 import os
-import openmeteo_requests
-import pandas as pd
-import requests_cache
-from retry_requests import retry
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 try:
-    from .weather.current import get_current_weather
-    from .weather.daily import get_daily_forecast
-    from .weather.hourly import get_hourly_forecast
+    from .weather.current import get_current_weather, get_current_weather_batch
+    from .weather.daily import get_daily_forecast, get_daily_forecast_batch
+    from .weather.hourly import get_hourly_forecast, get_hourly_forecast_batch
+    from .weather.overview import get_weather_overview, get_weather_overview_batch
+    from .upstream import FORECAST_URL, close_session
 except ImportError:
-    from controller.weather.current import get_current_weather
-    from controller.weather.daily import get_daily_forecast
-    from controller.weather.hourly import get_hourly_forecast
+    from controller.weather.current import get_current_weather, get_current_weather_batch
+    from controller.weather.daily import get_daily_forecast, get_daily_forecast_batch
+    from controller.weather.hourly import get_hourly_forecast, get_hourly_forecast_batch
+    from controller.weather.overview import get_weather_overview, get_weather_overview_batch
+    from controller.upstream import FORECAST_URL, close_session
 
-cache_session = requests_cache.CachedSession(".cache", expire_after=3600)
-retry_session = retry(cache_session, retries=5, backoff_factor=0.2)
-openmeteo = openmeteo_requests.Client(session=retry_session)
-
-
-URL = "https://api.open-meteo.com/v1/forecast"
+URL = FORECAST_URL
 
 
 def export_csv(data: dict, filename: str) -> None:
@@ -36,16 +32,29 @@ def export_csv(data: dict, filename: str) -> None:
         data (dict): Weather data to export.
         filename (str): Name of the output CSV file.
     """
+    import pandas as pd
+
     df = pd.DataFrame(data)
     df.to_csv(filename, index=False)
     print(f"Data exported to {filename}")
 
+async def _main(lat: float, long: float) -> tuple[dict, dict, dict]:
+    """
+    Fetch all forecast kinds concurrently over the shared upstream client.
+    """
+    try:
+        return await asyncio.gather(
+            get_daily_forecast(lat, long),
+            get_current_weather(lat, long),
+            get_hourly_forecast(lat, long),
+        )
+    finally:
+        await close_session()
+
 if __name__ == "__main__":
     LAT = 52.52
     LONG = 13.419998
-    daily_data = get_daily_forecast(LAT, LONG)
-    current_data = get_current_weather(LAT, LONG)
-    hourly_data = get_hourly_forecast(LAT, LONG)
+    daily_data, current_data, hourly_data = asyncio.run(_main(LAT, LONG))
     print("Daily Data:")
     print(daily_data)
     print("Current Data:")
@@ -14,6 +14,8 @@ function App() {
   const [longitude, setLongitude] = useState(null);
   const [error, setError] = useState(null);
   const [showHistory, setShowHistory] = useState(false);
+  const [overview, setOverview] = useState(null);
+  const [suggestions, setSuggestions] = useState([]);
 
   // Generate random username if none provided
   const generateRandomUsername = () => {
@@ -30,27 +32,31 @@ function App() {
     return userName.trim() || generateRandomUsername();
   }, [userName]);
 
+  // One request for the location, current weather and forecasts of the page
   useEffect(() => {
-    const fetchGeodata = async () => {
+    const fetchOverview = async () => {
       if (!locationName) {
         setLatitude(null);
         setLongitude(null);
+        setOverview(null);
         return;
       }
       try {
-        const response = await fetch(`${process.env.REACT_APP_API_URL}/weather/current?name=${locationName}`);
+        const response = await fetch(`${process.env.REACT_APP_API_URL}/weather/overview?name=${encodeURIComponent(locationName)}`);
         if (!response.ok) {
           throw new Error(`HTTP error! status: ${response.status}`);
         }
         const data = await response.json();
-        console.log('Geodata response:', data);
+        console.log('Overview response:', data);
         if (data.error) {
           setError(data.detail);
           setLatitude(null);
           setLongitude(null);
+          setOverview(null);
         } else {
-          setLatitude(data.latitude);
-          setLongitude(data.longitude);
+          setLatitude(data.location.lat);
+          setLongitude(data.location.long);
+          setOverview(data);
           setError(null);
         }
       } catch (e) {
@@ -58,12 +64,40 @@ function App() {
         setError(`Failed to fetch location data: ${e.message}`);
         setLatitude(null);
         setLongitude(null);
+        setOverview(null);
       }
     };
 
-    fetchGeodata();
+    fetchOverview();
   }, [locationName]);
 
+  // Autocomplete from the in-memory suggestions, once typing pauses
+  useEffect(() => {
+    const query = inputValue.trim();
+    if (!query) {
+      setSuggestions([]);
+      return;
+    }
+    const controller = new AbortController();
+    const timer = setTimeout(async () => {
+      try {
+        const response = await fetch(
+          `${process.env.REACT_APP_API_URL}/geodata/suggest?q=${encodeURIComponent(query)}&limit=8`,
+          { signal: controller.signal }
+        );
+        if (response.ok) {
+          setSuggestions(await response.json());
+        }
+      } catch (e) {
+        if (e.name !== 'AbortError') console.log(e);
+      }
+    }, 150);
+    return () => {
+      clearTimeout(timer);
+      controller.abort();
+    };
+  }, [inputValue]);
+
   const handleLocationNameChange = (e) => {
     setInputValue(e.target.value);
   };
@@ -121,7 +155,19 @@ function App() {
                   value={inputValue} 
                   onChange={handleLocationNameChange}
                   placeholder="Enter location name"
+                  list="location-suggestions"
+                  autoComplete="off"
                 />
+                <datalist id="location-suggestions">
+                  {suggestions.map((suggestion) => (
+                    <option
+                      key={`${suggestion.name}-${suggestion.lat}-${suggestion.long}`}
+                      value={suggestion.name}
+                    >
+                      {suggestion.country}
+                    </option>
+                  ))}
+                </datalist>
               </label>
               <button type="submit">Search</button>
             </form>
@@ -135,10 +181,19 @@ function App() {
       <main>
         <div className="weather-section">
           {locationName && !error && (
-            <CurrentWeather locationName={locationName} userName={effectiveUsername} />
+            <CurrentWeather
+              locationName={locationName}
+              userName={effectiveUsername}
+              location={overview && overview.location}
+              weather={overview && overview.current}
+            />
           )}
           {locationName && !error && (
-            <DailyForecast locationName={locationName} userName={effectiveUsername} />
+            <DailyForecast
+              locationName={locationName}
+              userName={effectiveUsername}
+              daily={overview && overview.daily}
+            />
           )}
           <ExportData userName={effectiveUsername} />
         </div>
@@ -1,59 +1,17 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState } from 'react';
 import { getWeatherIcon } from '../utils/weatherIcons';
 
-function CurrentWeather({ locationName, userName }) {
-  const [weather, setWeather] = useState(null);
-  const [loading, setLoading] = useState(true);
-  const [error, setError] = useState(null);
+function CurrentWeather({ locationName, userName, location, weather }) {
   const [saveStatus, setSaveStatus] = useState(null);
 
-  useEffect(() => {
-    if (!locationName) return;
-
-    const fetchCurrentWeather = async () => {
-      try {
-        setLoading(true);
-        const response = await fetch(`${process.env.REACT_APP_API_URL}/weather/current?name=${locationName}`);
-        if (!response.ok) {
-          throw new Error(`HTTP error! status: ${response.status}`);
-        }
-        const data = await response.json();
-        if (data.error) {
-          setError(data.detail);
-          setWeather(null);
-        } else {
-          setWeather(data);
-          setError(null);
-        }
-      } catch (e) {
-        setError(e);
-      } finally {
-        setLoading(false);
-      }
-    };
-
-    fetchCurrentWeather();
-  }, [locationName]);
-
   const saveWeatherData = async () => {
     if (!weather || !userName) return;
     
     try {
       setSaveStatus('saving');
-        // Location doesn't exist, create it
-      const locationResponse = await fetch(`${process.env.REACT_APP_API_URL}/geodata?name=${encodeURIComponent(locationName)}`, {
-        method: 'GET',
-        headers: {
-          'Content-Type': 'application/json',
-        }
-      });
-
-      if (!locationResponse.ok) {
-        throw new Error('Failed to create location');
-      }
-      const locationData = await locationResponse.json();
-      if (locationData.error) {
-        throw new Error(locationData.detail);
+      // The location comes with the page overview, see App
+      if (!location || location.id == null) {
+        throw new Error('Location not saved');
       }
 
       // Save weather data
@@ -76,7 +34,7 @@ function CurrentWeather({ locationName, userName }) {
         condition: weather.weather_condition,
         triggered_user: userName,
         api_source: 'Open-Meteo',
-        loc_id: locationData.id,
+        loc_id: location.id,
         date: new Date().toISOString()
       };
 
@@ -101,9 +59,7 @@ function CurrentWeather({ locationName, userName }) {
     }
   };
 
-  if (loading) return <p>Loading current weather...</p>;
-  if (error) return <p>Error: {error.message}</p>;
-  if (!weather) return <p>No current weather data available.</p>;
+  if (!weather) return <p>Loading current weather...</p>;
 
   return (
     <div className="current-weather">
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useMemo } from 'react';
 import { getWeatherIcon } from '../utils/weatherIcons';
 
 const getWeatherCodeFromDescription = (description) => {
@@ -12,70 +12,29 @@ const getWeatherCodeFromDescription = (description) => {
   return 1; // Default to partly cloudy
 };
 
-function DailyForecast({ locationName }) {
-  const [forecast, setForecast] = useState([]);
-  const [loading, setLoading] = useState(true);
-  const [error, setError] = useState(null);
-
-  useEffect(() => {
-    if (!locationName) return;
-
-    const fetchDailyForecast = async () => {
-      try {
-        setLoading(true);
-        const today = new Date();
-        const endDate = new Date();
-        endDate.setDate(today.getDate() + 4);
-
-        // Format date to YYYY-MM-DD
-        const formatDate = (date) => date.toISOString().split('T')[0];
-
-        console.log(`Fetching daily forecast for ${locationName} from ${formatDate(today)} to ${formatDate(endDate)}`);
-
-        const response = await fetch(
-          `${process.env.REACT_APP_API_URL}/weather/daily?name=${locationName}&start_date=${formatDate(today)}&end_date=${formatDate(endDate)}`
-        );
-        if (!response.ok) {
-          throw new Error(`HTTP error! status: ${response.status}`);
-        }
-        const data = await response.json();
-        console.log('Daily forecast response:', data);
-        if (data.error) {
-          setError(data.detail);
-          setForecast([]);
-        } else {
-          const transformedForecast = [];
-          if (data.daily_time && Array.isArray(data.daily_time)) {
-            for (let i = 0; i < 5; i++) {
-              transformedForecast.push({
-                date: data.daily_time[i],
-                weather_description: data.daily_conditions[i] || 'Unknown',
-                weather_code: getWeatherCodeFromDescription(data.daily_conditions[i] || ''),
-                temperature_2m_max: data.temperature_2m_max[i],
-                temperature_2m_min: data.temperature_2m_min[i],
-                apparent_temperature_max: data.apparent_temperature_max[i],
-                sunshine_duration: data.sunshine_duration[i],
-                cloud_cover_mean: data.cloud_cover_mean[i],
-                relative_humidity_2m_mean: data.relative_humidity_2m_mean[i],
-                wind_speed_10m_mean: data.wind_speed_10m_mean[i]
-              });
-            }
-          }
-          setForecast(transformedForecast);
-          setError(null);
-        }
-      } catch (e) {
-        setError(e);
-      } finally {
-        setLoading(false);
-      }
-    };
-
-    fetchDailyForecast();
-  }, [locationName]);
-
-  if (loading) return <p>Loading daily forecast...</p>;
-  if (error) return <p>Error: {error.message}</p>;
+function DailyForecast({ locationName, daily }) {
+  // The daily section of the page overview, see App
+  const forecast = useMemo(() => {
+    if (!daily || !Array.isArray(daily.daily_time)) return [];
+    const transformedForecast = [];
+    for (let i = 0; i < Math.min(5, daily.daily_time.length); i++) {
+      transformedForecast.push({
+        date: daily.daily_time[i],
+        weather_description: daily.daily_conditions[i] || 'Unknown',
+        weather_code: getWeatherCodeFromDescription(daily.daily_conditions[i] || ''),
+        temperature_2m_max: daily.temperature_2m_max[i],
+        temperature_2m_min: daily.temperature_2m_min[i],
+        apparent_temperature_max: daily.apparent_temperature_max[i],
+        sunshine_duration: daily.sunshine_duration[i],
+        cloud_cover_mean: daily.cloud_cover_mean[i],
+        relative_humidity_2m_mean: daily.relative_humidity_2m_mean[i],
+        wind_speed_10m_mean: daily.wind_speed_10m_mean[i]
+      });
+    }
+    return transformedForecast;
+  }, [daily]);
+
+  if (!daily) return <p>Loading daily forecast...</p>;
   if (!Array.isArray(forecast) || forecast.length === 0) return <p>No daily forecast data available.</p>;
 
   return (
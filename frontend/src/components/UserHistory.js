@@ -8,7 +8,8 @@ function UserHistory({ userName }) {
   useEffect(() => {
     const fetchHistory = async () => {
       try {
-        const response = await fetch(`${process.env.REACT_APP_API_URL}/weather/user?user=${userName}`);
+        // Records and their locations, listed once, in one request
+        const response = await fetch(`${process.env.REACT_APP_API_URL}/weather/user?user=${encodeURIComponent(userName)}&locations=table`);
         if (!response.ok) {
           throw new Error(`HTTP error! status: ${response.status}`);
         }
@@ -17,13 +18,20 @@ function UserHistory({ userName }) {
         if (data.error) {
           setError(data.detail);
           setHistory([]);
+          setLocationNames({});
         } else {
-          setHistory(data);
+          setHistory(data.records);
+          setLocationNames(
+            Object.fromEntries(
+              Object.entries(data.locations).map(([locId, location]) => [locId, location.name])
+            )
+          );
           setError(null);
         }
       } catch (e) {
         setError(`Failed to fetch history: ${e.message}`);
         setHistory([]);
+        setLocationNames({});
       }
     };
 
@@ -32,47 +40,6 @@ function UserHistory({ userName }) {
     }
   }, [userName]);
 
-  // Fetch location names when history changes
-  useEffect(() => {
-    const fetchLocationNames = async () => {
-      for (const record of history) {
-        if (!locationNames[record.loc_id]) {
-          await getLocationName(record.loc_id);
-        }
-      }
-    };
-
-    if (history.length > 0) {
-      fetchLocationNames();
-    }
-  }, [history]);
-
-  const getLocationName = async (locId) => {
-    if (locationNames[locId]) {
-      return locationNames[locId];
-    }
-    
-    try {
-      const response = await fetch(`${process.env.REACT_APP_API_URL}/geodata/${locId}`);
-      if (!response.ok) {
-        throw new Error(`HTTP error! status: ${response.status}`);
-      }
-      const data = await response.json();
-      const name = data.name || 'Unknown Location';
-      
-      // Update the locationNames state
-      setLocationNames(prev => ({
-        ...prev,
-        [locId]: name
-      }));
-      
-      return name;
-    } catch (e) {
-      console.error(`Failed to fetch location name for ${locId}:`, e);
-      return 'Unknown Location';
-    }
-  };
-
   const deleteRecord = async (recordId) => {
     try {
       const response = await fetch(`${process.env.REACT_APP_API_URL}/weather/${recordId}`, {
@@ -109,7 +76,7 @@ function UserHistory({ userName }) {
           {history.map(record => (
             <tr key={record.id}>
               <td>{record.created_at}</td>
-              <td>{locationNames[record.loc_id] || 'Loading...'}</td>
+              <td>{locationNames[record.loc_id] || 'Unknown Location'}</td>
               <td>{record.temp}°C</td>
               <td>{record.condition}</td>
               <td>
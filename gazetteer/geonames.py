@@ -0,0 +1,70 @@
+"""
+# gazetteer/geonames.py
+# This module reads GeoNames dumps (https://download.geonames.org/export/dump/),
+# e.g. cities15000.txt, tab-separated with one place per line.
+"""
+import csv
+from typing import Iterator, Optional
+
+# Columns of the GeoNames "geoname" table
+NAME, ASCII_NAME, ALTERNATE_NAMES = 1, 2, 3
+LATITUDE, LONGITUDE, FEATURE_CLASS, COUNTRY_CODE, POPULATION = 4, 5, 6, 8, 14
+# Columns of countryInfo.txt
+COUNTRY_ISO, COUNTRY_NAME = 0, 4
+
+
+def read_country_names(path: str) -> dict[str, str]:
+    """
+    Map ISO country codes to names from a GeoNames countryInfo.txt.
+    """
+    names = {}
+    with open(path, encoding="utf-8") as countries:
+        for row in csv.reader(countries, delimiter="\t", quoting=csv.QUOTE_NONE):
+            if row and not row[0].startswith("#") and len(row) > COUNTRY_NAME:
+                names[row[COUNTRY_ISO]] = row[COUNTRY_NAME]
+    return names
+
+
+def read_places(
+    path: str,
+    countries: Optional[dict[str, str]] = None,
+    min_population: int = 0,
+    feature_classes: str = "P",
+    alternate_names: bool = False,
+) -> Iterator[dict]:
+    """
+    Read the places of a GeoNames dump.
+
+    Args:
+        path: Tab-separated dump file.
+        countries: ISO code to country name, codes are kept when missing.
+        min_population: Skip smaller places.
+        feature_classes: GeoNames feature classes to keep, P for populated
+            places, empty for all.
+        alternate_names: Also return the alternate names of each place.
+
+    Yields:
+        dict: name, lat, long, country, population and aliases (other names
+            of the place to index).
+    """
+    countries = countries or {}
+    with open(path, encoding="utf-8") as places:
+        for row in csv.reader(places, delimiter="\t", quoting=csv.QUOTE_NONE):
+            if len(row) <= POPULATION:
+                continue
+            if feature_classes and row[FEATURE_CLASS] not in feature_classes:
+                continue
+            population = int(row[POPULATION] or 0)
+            if population < min_population:
+                continue
+            aliases = [row[ASCII_NAME]] if row[ASCII_NAME] != row[NAME] else []
+            if alternate_names and row[ALTERNATE_NAMES]:
+                aliases += row[ALTERNATE_NAMES].split(",")
+            yield {
+                "name": row[NAME],
+                "lat": float(row[LATITUDE]),
+                "long": float(row[LONGITUDE]),
+                "country": countries.get(row[COUNTRY_CODE], row[COUNTRY_CODE]),
+                "population": population,
+                "aliases": aliases,
+            }
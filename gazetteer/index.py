@@ -0,0 +1,253 @@
+"""
+# gazetteer/index.py
+# This module holds the gazetteer: known places, found by (fuzzy) name or by
+# coordinates without a database query or a geocoding API call.
+"""
+import itertools
+from typing import Iterable, Optional
+
+from gazetteer.names import NameIndex, fold_name
+from gazetteer.spatial import KDTree, distance_km
+from gazetteer.suggest import TOP_K, SuggestIndex
+
+# Places with the same folded name closer than this are the same place
+MERGE_DISTANCE_KM = 10.0
+# Prefix matches scored per search, names are scanned in alphabetical order
+PREFIX_CANDIDATES = 64
+# Places added since the KD-tree was built are scanned one by one until there
+# are more than this, or an eighth of the tree
+PENDING_LIMIT = 256
+
+
+class Gazetteer:
+    """
+    In-memory index of places.
+
+    Entries are location dicts (id, name, lat, long, country), with id None
+    for places that only come from a bulk file and were never saved as a
+    Location. Names are matched exactly, by prefix and by trigram similarity
+    after folding accents, case and punctuation. Coordinates are matched with
+    a KD-tree. Name prefixes suggest the places looked up most often.
+
+    Not thread-safe: build an instance off the event loop, then only add to
+    it from the loop.
+    """
+
+    def __init__(self, merge_distance_km: float = MERGE_DISTANCE_KM) -> None:
+        self.merge_distance_km = merge_distance_km
+        self._entries: list[dict] = []
+        self._populations: list[int] = []
+        self._by_id: dict[int, int] = {}
+        self._names = NameIndex()
+        self._suggest = SuggestIndex()
+        self._tree = KDTree([], [])
+        self._pending: list[int] = []
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def same_place(self, location: dict) -> Optional[int]:
+        """
+        Index of a known place with the same name within merge_distance_km.
+        """
+        for index in self._names.exact(location["name"]):
+            entry = self._entries[index]
+            if (
+                distance_km(entry["lat"], entry["long"], location["lat"], location["long"])
+                <= self.merge_distance_km
+            ):
+                return index
+        return None
+
+    def add(
+        self,
+        location: dict,
+        population: int = 0,
+        aliases: Iterable[str] = (),
+        keep_sorted: bool = True,
+    ) -> int:
+        """
+        Add a place, or merge it into a known place of the same name within
+        merge_distance_km. A saved location replaces the unsaved place it
+        merges into, so lookups return its ID.
+
+        Args:
+            location: Location dict, id None if not saved.
+            population: Ranks places with the same score.
+            aliases: Other names of the place.
+            keep_sorted: False for bulk adds, see add_many().
+
+        Returns:
+            int: Index of the entry.
+        """
+        loc_id = location.get("id")
+        index = self._by_id.get(loc_id) if loc_id is not None else None
+        if index is None:
+            index = self.same_place(location)
+        if index is None:
+            index = len(self._entries)
+            self._entries.append(location)
+            self._populations.append(population)
+            self._pending.append(index)
+        elif loc_id is not None and self._entries[index].get("id") in (None, loc_id):
+            self._entries[index] = location
+            self._populations[index] = max(self._populations[index], population)
+        if loc_id is not None:
+            self._by_id.setdefault(loc_id, index)
+        for name in (location["name"], *aliases):
+            folded = self._names.add(name, index, keep_sorted)
+            self._suggest.add(folded, index, self._populations[index], keep_sorted)
+        if keep_sorted and len(self._pending) > max(PENDING_LIMIT, self._tree.size // 8):
+            self._rebuild_tree()
+        return index
+
+    def add_many(self, places: Iterable[dict]) -> int:
+        """
+        Bulk add places, as read by gazetteer.geonames.read_places: location
+        dicts with optional population and aliases.
+
+        Returns:
+            int: Number of entries after the load.
+        """
+        for place in places:
+            population = place.pop("population", 0)
+            aliases = place.pop("aliases", ())
+            place.setdefault("id", None)
+            self.add(place, population, aliases, keep_sorted=False)
+        self._names.sort()
+        self._suggest.sort()
+        self._rebuild_tree()
+        return len(self._entries)
+
+    def _rebuild_tree(self) -> None:
+        self._tree = KDTree(
+            [entry["lat"] for entry in self._entries],
+            [entry["long"] for entry in self._entries],
+        )
+        self._pending = []
+
+    def entry(self, index: int) -> dict:
+        """
+        Location dict of an entry.
+        """
+        return self._entries[index]
+
+    def index_of(self, loc_id: int) -> Optional[int]:
+        """
+        Index of the entry of a saved location.
+        """
+        return self._by_id.get(loc_id)
+
+    def _rank(self, index: int) -> tuple:
+        # Saved locations first, then the most populated
+        return (self._entries[index].get("id") is not None, self._populations[index])
+
+    def search(
+        self,
+        name: str,
+        limit: int = 10,
+        min_score: float = 0.3,
+        words: Optional[int] = None,
+        prefixes: bool = True,
+    ) -> list[tuple[int, float]]:
+        """
+        Find places by name.
+
+        Exact matches score 1. Places whose name starts with the query score
+        the share of the name it covers, other places their trigram similarity.
+
+        Args:
+            name: Name as typed.
+            limit: Maximum number of results.
+            min_score: Ignore places scoring less.
+            words: Only match names (or aliases) of this many words.
+            prefixes: False to score by trigram similarity only.
+
+        Returns:
+            list[tuple[int, float]]: (entry index, score) pairs, best first,
+                ties broken by saved locations then population.
+        """
+        folded = fold_name(name)
+        if not folded:
+            return []
+        scores: dict[str, float] = {}
+        if prefixes:
+            for candidate in itertools.islice(self._names.prefix(folded), PREFIX_CANDIDATES):
+                scores[candidate] = len(folded) / len(candidate)
+        for candidate, score in self._names.fuzzy(folded, min_score, max(limit, 10)):
+            scores[candidate] = max(score, scores.get(candidate, 0.0))
+
+        best: dict[int, float] = {}
+        for candidate, score in scores.items():
+            if score < min_score or (words is not None and candidate.count(" ") + 1 != words):
+                continue
+            for index in self._names.entries(candidate):
+                best[index] = max(score, best.get(index, 0.0))
+        ranked = sorted(
+            best.items(), key=lambda item: (item[1], *self._rank(item[0])), reverse=True
+        )
+        return ranked[:limit]
+
+    def match(self, name: str, min_score: float = 0.6) -> Optional[int]:
+        """
+        Best place for a name, see search().
+
+        Inexact matches are scored by trigram similarity only, a partial name
+        ("Bern") is not completed to a longer one ("Bernau"). They must have
+        as many words as the name, so a qualifier such as the state in
+        "Paris, TX" is not dropped to match another place.
+
+        Returns:
+            Optional[int]: Entry index, None if no place scores min_score.
+        """
+        exact = self._names.exact(name)
+        if exact:
+            return max(exact, key=self._rank)
+        words = len(fold_name(name).split())
+        results = self.search(name, 1, min_score, words=words, prefixes=False)
+        return results[0][0] if results else None
+
+    def suggest(self, prefix: str, k: int = TOP_K) -> list[int]:
+        """
+        Places whose name starts with prefix, most looked up first, then the
+        most populated.
+
+        Returns:
+            list[int]: Up to k (at most TOP_K) entry indexes.
+        """
+        return self._suggest.suggest(fold_name(prefix), k)
+
+    def hit(self, index: int, count: int = 1) -> None:
+        """
+        Count lookups of a place, for suggest().
+        """
+        self._suggest.hit(index, count)
+
+    def nearest(
+        self, lat: float, long: float, k: int = 1, max_km: Optional[float] = None
+    ) -> list[tuple[int, float]]:
+        """
+        Find the places nearest to a location.
+
+        Returns:
+            list[tuple[int, float]]: (entry index, distance in km) pairs,
+                nearest first.
+        """
+        found = self._tree.query(lat, long, k, max_km)
+        for index in self._pending:
+            entry = self._entries[index]
+            distance = distance_km(lat, long, entry["lat"], entry["long"])
+            if max_km is None or distance <= max_km:
+                found.append((index, distance))
+        found.sort(key=lambda item: item[1])
+        return found[:k]
+
+    def stats(self) -> dict:
+        """
+        Return the entry, saved location and indexed name counts.
+        """
+        return {
+            "entries": len(self._entries),
+            "saved": len(self._by_id),
+            "names": len(self._names),
+        }
@@ -0,0 +1,145 @@
+"""
+# gazetteer/names.py
+# This module indexes location names by their folded form for exact, prefix and
+# trigram (fuzzy) lookups.
+"""
+import bisect
+import math
+import re
+import unicodedata
+from typing import Iterator
+
+_SEPARATORS = re.compile(r"[\W_]+")
+
+
+def fold_name(name: str) -> str:
+    """
+    Fold a name for matching: strip accents, casefold, turn punctuation into
+    spaces and collapse whitespace, so "Saint-Étienne " matches "saint etienne".
+    """
+    if not name.isascii():
+        decomposed = unicodedata.normalize("NFKD", name)
+        name = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(_SEPARATORS.sub(" ", name.casefold()).split())
+
+
+def trigrams(folded: str) -> set[str]:
+    """
+    Trigrams of a folded name, padded like pg_trgm so word starts weigh more.
+    """
+    padded = f"  {folded} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndex:
+    """
+    Maps folded names to entry IDs.
+
+    Exact lookups are a dict access, prefix lookups a binary search over the
+    sorted names and fuzzy lookups score the names found through an inverted
+    trigram index. Names are only ever added.
+    """
+
+    def __init__(self) -> None:
+        self._keys: dict[str, int] = {}
+        self._names: list[str] = []
+        self._entries: list[list[int]] = []
+        self._trigram_counts: list[int] = []
+        self._trigrams: dict[str, list[int]] = {}
+        self._sorted: list[str] = []
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def add(self, name: str, entry_id: int, keep_sorted: bool = True) -> str:
+        """
+        Index entry_id under name.
+
+        Args:
+            name: Name as written, folded here.
+            entry_id: ID returned by the lookups.
+            keep_sorted: Insert into the prefix index right away, bulk loads
+                pass False and call sort() once at the end.
+
+        Returns:
+            str: The folded name.
+        """
+        folded = fold_name(name)
+        if not folded:
+            return folded
+        key = self._keys.get(folded)
+        if key is None:
+            key = len(self._names)
+            self._keys[folded] = key
+            self._names.append(folded)
+            self._entries.append([])
+            grams = trigrams(folded)
+            self._trigram_counts.append(len(grams))
+            for gram in grams:
+                self._trigrams.setdefault(gram, []).append(key)
+            if keep_sorted:
+                bisect.insort(self._sorted, folded)
+            else:
+                self._sorted.append(folded)
+        if entry_id not in self._entries[key]:
+            self._entries[key].append(entry_id)
+        return folded
+
+    def sort(self) -> None:
+        """
+        Sort the prefix index after adds with keep_sorted=False.
+        """
+        self._sorted.sort()
+
+    def exact(self, name: str) -> list[int]:
+        """
+        Entry IDs indexed under the folded name.
+        """
+        key = self._keys.get(fold_name(name))
+        return list(self._entries[key]) if key is not None else []
+
+    def prefix(self, name: str) -> Iterator[str]:
+        """
+        Folded names starting with the folded query, in alphabetical order.
+        """
+        folded = fold_name(name)
+        if not folded:
+            return
+        names = self._sorted
+        for position in range(bisect.bisect_left(names, folded), len(names)):
+            if not names[position].startswith(folded):
+                return
+            yield names[position]
+
+    def fuzzy(
+        self, name: str, min_score: float = 0.3, limit: int = 10
+    ) -> list[tuple[str, float]]:
+        """
+        Folded names by trigram similarity to the query (shared trigrams over
+        the union, as pg_trgm's similarity()).
+
+        Returns:
+            list[tuple[str, float]]: Up to limit (folded name, similarity)
+                pairs scoring at least min_score, best first.
+        """
+        grams = trigrams(fold_name(name))
+        # A name scoring min_score shares at least `needed` trigrams with the
+        # query, so it is in one of the len(grams) - needed + 1 shortest postings
+        needed = max(1, math.ceil(min_score * len(grams)))
+        postings = sorted((self._trigrams.get(gram, ()) for gram in grams), key=len)
+        candidates = set().union(*postings[:len(grams) - needed + 1])
+        scored = []
+        for key in candidates:
+            shared = len(grams & trigrams(self._names[key]))
+            score = shared / (len(grams) + self._trigram_counts[key] - shared)
+            if score >= min_score:
+                scored.append((self._names[key], score))
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return scored[:limit]
+
+    def entries(self, folded: str) -> list[int]:
+        """
+        Entry IDs of an already folded name, as returned by prefix() and fuzzy().
+        """
+        key = self._keys.get(folded)
+        return list(self._entries[key]) if key is not None else []
@@ -0,0 +1,137 @@
+"""
+# gazetteer/spatial.py
+# This module implements nearest-location lookups with a KD-tree over points on
+# the unit sphere, so distances need no special cases at the poles or the antimeridian.
+"""
+import heapq
+import math
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+# Points per leaf, compared at once with NumPy
+LEAF_SIZE = 32
+
+
+def to_unit_vectors(lat, long) -> np.ndarray:
+    """
+    Convert latitudes and longitudes in degrees to (n, 3) unit vectors.
+    """
+    lat = np.radians(np.asarray(lat, dtype=np.float64))
+    long = np.radians(np.asarray(long, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return np.column_stack((cos_lat * np.cos(long), cos_lat * np.sin(long), np.sin(lat)))
+
+
+def chord_to_km(chord: float) -> float:
+    """
+    Great-circle distance in kilometers of a chord between two unit vectors.
+    """
+    return 2 * EARTH_RADIUS_KM * math.asin(min(chord / 2, 1.0))
+
+
+def km_to_chord(km: float) -> float:
+    """
+    Chord length between two unit vectors km apart on the surface.
+    """
+    return 2 * math.sin(min(km / EARTH_RADIUS_KM, math.pi) / 2)
+
+
+def distance_km(lat1: float, long1: float, lat2: float, long2: float) -> float:
+    """
+    Great-circle (haversine) distance in kilometers between two locations.
+    """
+    lat1, long1, lat2, long2 = map(math.radians, (lat1, long1, lat2, long2))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((long2 - long1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(min(math.sqrt(a), 1.0))
+
+
+class KDTree:
+    """
+    Static KD-tree over unit vectors.
+
+    Every node covers a contiguous slice of the reordered points and is split
+    at the median of its widest axis, leaves are scanned with NumPy.
+    """
+
+    def __init__(self, lat, long) -> None:
+        points = to_unit_vectors(lat, long)
+        self.size = len(points)
+        self._order = np.arange(self.size)
+        # (start, end, axis, split, left, right), axis -1 for leaves
+        self._nodes: list[tuple] = []
+        if self.size:
+            self._build(points)
+        self._points = points[self._order]
+
+    def _build(self, points: np.ndarray) -> None:
+        order = self._order
+        self._nodes.append(None)
+        stack = [(0, 0, self.size)]
+        while stack:
+            node, start, end = stack.pop()
+            if end - start <= LEAF_SIZE:
+                self._nodes[node] = (start, end, -1, 0.0, -1, -1)
+                continue
+            chunk = points[order[start:end]]
+            axis = int(np.argmax(chunk.max(axis=0) - chunk.min(axis=0)))
+            middle = (end - start) // 2
+            partition = np.argpartition(chunk[:, axis], middle)
+            order[start:end] = order[start:end][partition]
+            split = float(points[order[start + middle], axis])
+            left, right = len(self._nodes), len(self._nodes) + 1
+            self._nodes += [None, None]
+            self._nodes[node] = (start, end, axis, split, left, right)
+            stack.append((left, start, start + middle))
+            stack.append((right, start + middle, end))
+
+    def query(
+        self, lat: float, long: float, k: int = 1, max_km: float | None = None
+    ) -> list[tuple[int, float]]:
+        """
+        Find the k points nearest to a location.
+
+        Args:
+            lat: Latitude in degrees.
+            long: Longitude in degrees.
+            k: Number of points.
+            max_km: Ignore points further than this.
+
+        Returns:
+            list[tuple[int, float]]: (index given at construction, distance in
+                km) pairs, nearest first.
+        """
+        if not self.size or k <= 0:
+            return []
+        target = to_unit_vectors([lat], [long])[0]
+        bound = km_to_chord(max_km) ** 2 if max_km is not None else math.inf
+        # Max-heap of the best k as (-squared chord, position)
+        best: list[tuple[float, int]] = []
+        stack = [(0, 0.0)]
+        while stack:
+            node, gap = stack.pop()
+            limit = -best[0][0] if len(best) == k else bound
+            if gap > limit:
+                continue
+            start, end, axis, split, left, right = self._nodes[node]
+            if axis < 0:
+                distances = ((self._points[start:end] - target) ** 2).sum(axis=1)
+                for position in np.flatnonzero(distances <= limit):
+                    item = (-float(distances[position]), start + int(position))
+                    if len(best) < k:
+                        heapq.heappush(best, item)
+                    elif item > best[0]:
+                        heapq.heapreplace(best, item)
+                continue
+            offset = target[axis] - split
+            near, far = (left, right) if offset < 0 else (right, left)
+            # Far side first on the stack, so the near side is searched first
+            stack.append((far, max(gap, offset * offset)))
+            stack.append((near, gap))
+        return [
+            (int(self._order[position]), chord_to_km(math.sqrt(-distance)))
+            for distance, position in sorted(best, reverse=True)
+        ]
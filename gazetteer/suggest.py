@@ -0,0 +1,136 @@
+"""
+# gazetteer/suggest.py
+# This module ranks place names for autocompletion: the most popular places whose
+# name starts with what was typed so far.
+"""
+import bisect
+import heapq
+
+# Results kept per prefix, the most a suggestion request can return
+TOP_K = 10
+# Prefixes up to this length have their top places kept up to date
+CACHED_DEPTH = 4
+# Longer prefixes matching more names than this are ranked once, then kept up to date
+SCAN_LIMIT = 256
+_LAST_CHAR = "\U0010ffff"
+
+
+class SuggestIndex:
+    """
+    Top places by prefix of their folded names.
+
+    Names are kept in a sorted array. The best TOP_K places of every prefix up
+    to CACHED_DEPTH characters, and of longer prefixes matching many names,
+    are kept in a dict, so suggestions for them are a dict access. Other
+    prefixes match few names, which are ranked on request.
+
+    Scores only grow (more hits, a larger population), so adding a name or
+    raising a score updates the cached lists of the prefixes of its names.
+    """
+
+    def __init__(self) -> None:
+        self._sorted: list[tuple[str, int]] = []
+        self._names: dict[int, list[str]] = {}
+        self._scores: dict[int, tuple[int, int]] = {}
+        self._top: dict[str, list[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._sorted)
+
+    def score(self, entry: int) -> tuple[int, int]:
+        """
+        Rank of an entry: (hits, population).
+        """
+        return self._scores.get(entry, (0, 0))
+
+    def add(
+        self, folded: str, entry: int, population: int = 0, keep_sorted: bool = True
+    ) -> None:
+        """
+        Suggest entry for the prefixes of a folded name.
+
+        Args:
+            folded: Folded name, see gazetteer.names.fold_name.
+            entry: Entry ID returned by suggest().
+            population: Ranks entries with the same number of hits.
+            keep_sorted: False for bulk adds, followed by sort().
+        """
+        if not folded:
+            return
+        hits, known_population = self.score(entry)
+        self._scores[entry] = (hits, max(population, known_population))
+        names = self._names.setdefault(entry, [])
+        if folded not in names:
+            names.append(folded)
+            if keep_sorted:
+                bisect.insort(self._sorted, (folded, entry))
+            else:
+                self._sorted.append((folded, entry))
+        if keep_sorted:
+            self._promote(entry, names)
+
+    def sort(self) -> None:
+        """
+        Sort the names and rank the cached prefixes after bulk adds.
+        """
+        self._sorted.sort()
+        self._top = {}
+        # Best first, so every prefix keeps the first TOP_K entries it sees
+        by_score = sorted(self._sorted, key=lambda item: self.score(item[1]), reverse=True)
+        for folded, entry in by_score:
+            for length in range(1, min(len(folded), CACHED_DEPTH) + 1):
+                ranked = self._top.setdefault(folded[:length], [])
+                if len(ranked) < TOP_K and entry not in ranked:
+                    ranked.append(entry)
+
+    def hit(self, entry: int, count: int = 1) -> None:
+        """
+        Count a lookup of an entry, moving it up in the suggestions.
+        """
+        names = self._names.get(entry)
+        if not names:
+            return
+        hits, population = self.score(entry)
+        self._scores[entry] = (hits + count, population)
+        self._promote(entry, names)
+
+    def _promote(self, entry: int, names: list[str]) -> None:
+        key = self.score
+        for folded in names:
+            for length in range(1, len(folded) + 1):
+                prefix = folded[:length]
+                ranked = self._top.get(prefix)
+                if ranked is None:
+                    if length > CACHED_DEPTH:
+                        continue
+                    ranked = self._top[prefix] = []
+                if entry not in ranked:
+                    if len(ranked) >= TOP_K and key(entry) <= key(ranked[-1]):
+                        continue
+                    ranked.append(entry)
+                ranked.sort(key=key, reverse=True)
+                del ranked[TOP_K:]
+
+    def suggest(self, folded: str, k: int = TOP_K) -> list[int]:
+        """
+        Best entries with a name starting with a folded prefix.
+
+        Args:
+            folded: Folded prefix.
+            k: Number of entries, at most TOP_K.
+
+        Returns:
+            list[int]: Entry IDs, by hits then population.
+        """
+        if not folded:
+            return []
+        ranked = self._top.get(folded)
+        if ranked is not None:
+            return ranked[:k]
+        start = bisect.bisect_left(self._sorted, (folded,))
+        end = bisect.bisect_left(self._sorted, (folded + _LAST_CHAR,), start)
+        entries = dict.fromkeys(entry for _, entry in self._sorted[start:end])
+        ranked = heapq.nlargest(TOP_K, entries, key=self.score)
+        if end - start > SCAN_LIMIT:
+            self._top[folded] = ranked
+        return ranked[:k]
@@ -0,0 +1,235 @@
+"""
+# logger.py
+# Application logging: configured once from settings.toml, records are handed to a
+# queue and written by a background thread, so logging never blocks a request.
+
+Usage:
+    from logger import get_logger
+
+    logger = get_logger(__name__)
+    logger.info("Saved location %s", name)  # formatted only if info is enabled
+"""
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+
+import orjson
+
+# Root of the application loggers, third-party loggers are left untouched
+ROOT_LOGGER = "waist"
+
+# log_level values of settings.toml / LOG_LEVEL, names are accepted as well
+LOG_LEVELS = {
+    -1: logging.CRITICAL + 10,  # off
+    0: logging.ERROR,
+    1: logging.WARNING,
+    2: logging.INFO,
+    3: logging.DEBUG,
+}
+LEVEL_NAMES = {
+    "off": -1,
+    "error": 0,
+    "warn": 1,
+    "warning": 1,
+    "info": 2,
+    "debug": 3,
+}
+
+COLOR = {
+    logging.DEBUG: "\033[94m",  # Blue
+    logging.INFO: "\033[92m",  # Green
+    logging.WARNING: "\033[93m",  # Yellow
+    logging.ERROR: "\033[91m",  # Red
+    logging.CRITICAL: "\033[91m",  # Red
+}
+RESET = "\033[0m"
+# Level labels of the original fprint output
+LABELS = {logging.WARNING: "WARN"}
+
+_configure_lock = threading.Lock()
+_listener: logging.handlers.QueueListener | None = None
+
+
+def _exception_text(formatter: logging.Formatter, record: logging.LogRecord) -> str:
+    # Records from the queue carry the traceback already rendered in exc_text
+    if record.exc_info and not record.exc_text:
+        record.exc_text = formatter.formatException(record.exc_info)
+    return record.exc_text or ""
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that only merges the message arguments in the calling
+    thread, formatting is left to the listener thread.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The record is only seen by this handler, no need to copy it
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            # Tracebacks hold frames, render them before the caller moves on
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class TextFormatter(logging.Formatter):
+    """
+    "[LEVEL] message" lines, colored when writing to a terminal.
+    """
+
+    def __init__(self, color: bool = False) -> None:
+        super().__init__()
+        self.color = color
+
+    def format(self, record: logging.LogRecord) -> str:
+        label = LABELS.get(record.levelno, record.levelname)
+        message = record.getMessage()
+        exception = _exception_text(self, record)
+        if exception:
+            message = f"{message}\n{exception}"
+        if self.color:
+            return f"{COLOR.get(record.levelno, '')}[{label}]{RESET} {message}"
+        return f"[{label}] {message}"
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    One JSON object per line: time, level, logger, message, plus the fields
+    passed through extra={"fields": {...}}.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": record.created,
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        exception = _exception_text(self, record)
+        if exception:
+            entry["exception"] = exception
+        return orjson.dumps(entry, default=str).decode()
+
+
+def parse_level(value) -> int:
+    """
+    Convert a configured log level to a logging level.
+
+    Args:
+        value: -1 (off), 0 (error), 1 (warning), 2 (info), 3 (debug), or one
+            of the names in LEVEL_NAMES.
+
+    Raises:
+        ValueError: If the value is not a known level.
+    """
+    if isinstance(value, str):
+        value = value.strip().lower()
+        value = LEVEL_NAMES[value] if value in LEVEL_NAMES else int(value)
+    if value not in LOG_LEVELS:
+        raise ValueError(f"Unknown log level {value}, expected -1 to 3 or a level name")
+    return LOG_LEVELS[value]
+
+
+def setup_logging(force: bool = False) -> logging.Logger:
+    """
+    Configure the application loggers from settings.toml and the environment.
+    Runs once per process, later calls return the configured root logger.
+
+    Settings ([app] log_level, [logging] format and queue) are overridden by
+    the LOG_LEVEL, LOG_FORMAT and LOG_QUEUE environment variables.
+
+    Args:
+        force: Reconfigure even if logging was already set up.
+
+    Returns:
+        logging.Logger: The application root logger.
+    """
+    global _listener
+    root = logging.getLogger(ROOT_LOGGER)
+    if root.handlers and not force:
+        return root
+    with _configure_lock:
+        if root.handlers and not force:
+            return root
+        from utils import load_settings
+
+        settings = load_settings()
+        log_settings = settings.get("logging", {})
+        level = parse_level(
+            os.getenv("LOG_LEVEL", settings.get("app", {}).get("log_level", 0))
+        )
+        log_format = os.getenv("LOG_FORMAT", log_settings.get("format", "text")).lower()
+        use_queue = os.getenv("LOG_QUEUE", str(log_settings.get("queue", True)))
+        use_queue = use_queue.lower() in ("1", "true", "yes")
+
+        _stop_listener()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+
+        stream = logging.StreamHandler(sys.stdout)
+        if log_format == "json":
+            stream.setFormatter(JSONFormatter())
+        else:
+            stream.setFormatter(TextFormatter(color=sys.stdout.isatty()))
+
+        if use_queue:
+            # Callers only enqueue the record, the listener thread does the I/O
+            records: queue.SimpleQueue = queue.SimpleQueue()
+            root.addHandler(_QueueHandler(records))
+            _listener = logging.handlers.QueueListener(
+                records, stream, respect_handler_level=True
+            )
+            _listener.start()
+        else:
+            root.addHandler(stream)
+
+        root.setLevel(level)
+        root.propagate = False
+        # Records carry no caller, thread or process details, skip collecting them
+        logging._srcfile = None
+        logging.logThreads = False
+        logging.logProcesses = False
+        logging.logMultiprocessing = False
+    return root
+
+
+def _stop_listener() -> None:
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def shutdown_logging() -> None:
+    """
+    Flush the queued records and stop the listener thread.
+    """
+    with _configure_lock:
+        _stop_listener()
+        root = logging.getLogger(ROOT_LOGGER)
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+            handler.close()
+
+
+atexit.register(shutdown_logging)
+
+
+def get_logger(name: str) -> logging.Logger:
+    """
+    Return an application logger, configuring logging on first use.
+
+    Args:
+        name: Usually __name__ of the calling module.
+    """
+    root = setup_logging()
+    return root.getChild(name) if name != ROOT_LOGGER else root
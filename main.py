@@ -2,19 +2,50 @@
 # main.py
 # This module initializes the FastAPI application and includes the routers.
 """
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-import uvicorn
 
 from router import location_router, weather_router
 from router.export_router import router as export_router
-from model.db import create_tables
+from router.metrics_router import router as metrics_router
+from router.stats_router import router as stats_router
+from router.backfill_router import router as backfill_router
+from model.db import create_tables, dispose_engines, get_async_engine
+from controller.upstream import close_session, get_client
+from controller.forecast_cache import close_forecast_cache
+from controller.gazetteer import load_gazetteer
+from controller.prefetch import start_prefetcher, stop_prefetcher
+from controller.backfill import stop_backfills
+from metrics import MetricsMiddleware
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    """
+    Application lifespan: build the shared upstream client and the async
+    database engine, load the gazetteer and start the forecast prefetcher on
+    startup, stop it and the running backfill jobs (resumable later) and
+    release the pooled upstream connections, the forecast cache backend and
+    the database pools on shutdown.
+    """
+    get_client()
+    get_async_engine()
+    await load_gazetteer()
+    start_prefetcher()
+    yield
+    await stop_prefetcher()
+    await stop_backfills()
+    await close_session()
+    await close_forecast_cache()
+    await dispose_engines()
 
 # Metadata
 app = FastAPI(
     title="Weather API",
     description="An API to get weather data and manage weather records.",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # CORS Middleware
@@ -25,11 +56,16 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Outermost, so the recorded latency covers the whole middleware stack
+app.add_middleware(MetricsMiddleware)
 
 # Include routers
 app.include_router(location_router.router, tags=["location"])
 app.include_router(weather_router.router, tags=["weather"])
 app.include_router(export_router, tags=["export"])
+app.include_router(stats_router, tags=["stats"])
+app.include_router(backfill_router, tags=["admin"])
+app.include_router(metrics_router, tags=["metrics"])
 
 @app.get("/")
 async def root():
@@ -43,6 +79,8 @@ def main():
     Main function to run the FastAPI application.
     It creates the database tables and starts the Uvicorn server.
     """
+    import uvicorn
+
     create_tables()
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
 
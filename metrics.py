@@ -0,0 +1,208 @@
+"""
+# metrics.py
+# Prometheus metrics of the API: request latency by route, upstream calls, processing
+# stages, cache hit ratios, database pool usage and export volume. Served at /metrics.
+"""
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from prometheus_client import REGISTRY, Counter, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.registry import Collector
+
+# Sub-millisecond stages (parsing, serialization, pool checkout) up to slow upstream calls
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency, streamed bodies included",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+UPSTREAM_LATENCY = Histogram(
+    "upstream_request_duration_seconds",
+    "Open-Meteo API call latency",
+    ["api", "kind"],
+    buckets=LATENCY_BUCKETS,
+)
+UPSTREAM_REQUESTS = Counter(
+    "upstream_requests",
+    "Open-Meteo API calls by HTTP status, error when no response was received",
+    ["api", "kind", "status"],
+)
+STAGE_LATENCY = Histogram(
+    "stage_duration_seconds",
+    "Latency of the processing stages of a request",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+DB_POOL_CHECKOUT = Histogram(
+    "db_pool_checkout_seconds",
+    "Time waiting for a pooled connection, or opening one when the pool grows; pre-ping excluded",
+    ["engine"],
+    buckets=LATENCY_BUCKETS,
+)
+PREFETCH_REFRESHES = Counter(
+    "prefetch_refreshes",
+    "Forecasts of hot locations refreshed ahead of their expiry",
+    ["kind"],
+)
+BACKFILL_CHUNKS = Counter(
+    "backfill_chunks",
+    "Backfill chunks loaded from the archive API, by outcome",
+    ["status"],
+)
+EXPORT_ROWS = Counter("export_rows", "Rows written by the exports", ["export"])
+EXPORT_BYTES = Counter("export_bytes", "Bytes streamed by the exports", ["export"])
+
+# Route label of requests that matched no route, keeps the label set bounded
+UNMATCHED_ROUTE = "unmatched"
+
+
+class _UpstreamCall:
+    __slots__ = ("status",)
+
+    def __init__(self) -> None:
+        self.status = "200"
+
+
+@contextmanager
+def upstream_call(api: str, kind: str) -> Iterator[_UpstreamCall]:
+    """
+    Time one upstream call and count it by status.
+
+    The status defaults to 200 (the Open-Meteo client raises on any other),
+    callers holding the response set call.status themselves. An exception
+    is counted as status error.
+
+    Args:
+        api: Upstream API (forecast, geocoding).
+        kind: Request kind (current, hourly, daily, search).
+    """
+    call = _UpstreamCall()
+    start = time.perf_counter()
+    try:
+        yield call
+    except BaseException:
+        call.status = "error"
+        raise
+    finally:
+        UPSTREAM_LATENCY.labels(api, kind).observe(time.perf_counter() - start)
+        UPSTREAM_REQUESTS.labels(api, kind, call.status).inc()
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """
+    Time a processing stage of a request, e.g. geocode_db or parse_daily.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_LATENCY.labels(name).observe(time.perf_counter() - start)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording the latency of every HTTP request by route
+    template, so /weather/{weather_id} is one series whatever the ID.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = "500"
+
+        async def send_with_status(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router stores the matched route in the scope
+            route = scope.get("route")
+            REQUEST_LATENCY.labels(
+                scope["method"],
+                getattr(route, "path", UNMATCHED_ROUTE),
+                status,
+            ).observe(time.perf_counter() - start)
+
+
+# Pools reported by the collector, by engine name, registered when an engine is created
+_pools: dict = {}
+
+
+def register_pool(engine: str, pool) -> None:
+    """
+    Report the connections of a SQLAlchemy pool under the given engine name.
+    """
+    _pools[engine] = pool
+
+
+class _StateCollector(Collector):
+    """
+    Reads cache counters and pool usage when scraped, instead of updating
+    metrics on every lookup.
+    """
+
+    @staticmethod
+    def _families() -> dict:
+        return {
+            "cache_hits": CounterMetricFamily(
+                "cache_hits", "Cache lookups served", labels=["cache"]
+            ),
+            "cache_misses": CounterMetricFamily(
+                "cache_misses", "Cache lookups missed", labels=["cache"]
+            ),
+            "cache_hit_ratio": GaugeMetricFamily(
+                "cache_hit_ratio", "Hits over lookups since start", labels=["cache"]
+            ),
+            "in_use": GaugeMetricFamily(
+                "db_pool_connections_in_use", "Connections checked out", labels=["engine"]
+            ),
+            "idle": GaugeMetricFamily(
+                "db_pool_connections_idle", "Connections idle in the pool", labels=["engine"]
+            ),
+            "overflow": GaugeMetricFamily(
+                "db_pool_overflow", "Connections open beyond pool_size", labels=["engine"]
+            ),
+        }
+
+    def describe(self):
+        # Lets the registry check names without scraping the caches
+        return list(self._families().values())
+
+    def collect(self):
+        # Imported here, the caches live in modules that import this one
+        from controller.forecast_cache import get_forecast_cache
+        from controller.location_controller import geodata_cache_stats
+
+        families = self._families()
+        for name, stats in (
+            ("geocode", geodata_cache_stats()),
+            ("forecast", get_forecast_cache().stats()),
+        ):
+            families["cache_hits"].add_metric([name], stats["hits"])
+            families["cache_misses"].add_metric([name], stats["misses"])
+            families["cache_hit_ratio"].add_metric([name], stats["hit_ratio"])
+        for engine, pool in _pools.items():
+            families["in_use"].add_metric([engine], pool.checkedout())
+            families["idle"].add_metric([engine], pool.checkedin())
+            families["overflow"].add_metric([engine], max(pool.overflow(), 0))
+        return list(families.values())
+
+
+REGISTRY.register(_StateCollector())
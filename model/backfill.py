@@ -0,0 +1,241 @@
+"""
+# model/backfill.py
+# This module defines the backfill job and chunk models: the checkpoints of the
+# historical weather loads, so an interrupted job resumes with the chunks left.
+"""
+
+from datetime import date, datetime
+from typing import Optional
+from sqlalchemy import (
+    Column,
+    Date,
+    DateTime,
+    ForeignKey,
+    Integer,
+    String,
+    func,
+    insert,
+    select,
+    update,
+)
+from .db import Base
+
+# Job statuses; chunks are pending, done or failed
+PENDING, RUNNING, DONE, FAILED, CANCELLED = (
+    "pending",
+    "running",
+    "done",
+    "failed",
+    "cancelled",
+)
+
+
+class BackfillJob(Base):
+    """
+    BackfillJob model represents a load of the weather records of some
+    locations over a date range, split into chunks.
+    """
+
+    __tablename__ = "backfill_job"
+
+    id = Column(Integer, primary_key=True, index=True)
+    start_date = Column(Date, nullable=False)
+    end_date = Column(Date, nullable=False)
+    chunk_days = Column(Integer, nullable=False)
+    triggered_user = Column(String, nullable=True)
+    status = Column(String, nullable=False, default=PENDING)
+    error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    @classmethod
+    async def create_async(
+        cls,
+        db,
+        chunks: list[tuple[int, date, date]],
+        start_date: date,
+        end_date: date,
+        chunk_days: int,
+        triggered_user: Optional[str] = None,
+    ) -> "BackfillJob":
+        """
+        Save a job and its pending chunks using an async session.
+
+        Args:
+            db: Async database session
+            chunks: (loc_id, start_date, end_date) of every chunk
+            start_date: First day of the job
+            end_date: Last day of the job
+            chunk_days: Days per chunk
+            triggered_user: Optional user stored on the loaded records
+
+        Returns:
+            BackfillJob: The saved job
+        """
+        job = cls(
+            start_date=start_date,
+            end_date=end_date,
+            chunk_days=chunk_days,
+            triggered_user=triggered_user,
+        )
+        db.add(job)
+        await db.flush()
+        if chunks:
+            await db.execute(
+                insert(BackfillChunk),
+                [
+                    {"job_id": job.id, "loc_id": loc_id, "start_date": start, "end_date": end}
+                    for loc_id, start, end in chunks
+                ],
+            )
+        await db.commit()
+        await db.refresh(job)
+        return job
+
+    @classmethod
+    async def get_by_id_async(cls, db, job_id: int) -> Optional["BackfillJob"]:
+        """
+        Fetch a job by ID using an async session.
+        """
+        return await db.get(cls, job_id)
+
+    @classmethod
+    async def get_recent_async(cls, db, limit: int = 20) -> list["BackfillJob"]:
+        """
+        Fetch the most recent jobs using an async session.
+        """
+        statement = select(cls).order_by(cls.id.desc()).limit(limit)
+        return (await db.scalars(statement)).all()
+
+    async def set_status_async(self, db, status: str, error: Optional[str] = None):
+        """
+        Update the status of the job using an async session.
+        """
+        self.status = status
+        self.error = error
+        await db.commit()
+        await db.refresh(self)
+        return self
+
+    async def progress_async(self, db) -> dict:
+        """
+        Count the chunks of the job by status and the records they loaded,
+        using an async session.
+
+        Returns:
+            dict: chunks (status mapped to count) and rows
+        """
+        statement = (
+            select(BackfillChunk.status, func.count(), func.sum(BackfillChunk.rows))
+            .where(BackfillChunk.job_id == self.id)
+            .group_by(BackfillChunk.status)
+        )
+        result = (await db.execute(statement)).all()
+        return {
+            "chunks": {status: count for status, count, _ in result},
+            "rows": sum(rows or 0 for _, _, rows in result),
+        }
+
+    def to_dict(self):
+        """
+        Convert the job to a dictionary.
+        """
+        return {
+            "id": self.id,
+            "start_date": self.start_date.isoformat() if self.start_date else None,
+            "end_date": self.end_date.isoformat() if self.end_date else None,
+            "chunk_days": self.chunk_days,
+            "triggered_user": self.triggered_user,
+            "status": self.status,
+            "error": self.error,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+        }
+
+    def __repr__(self):
+        return (
+            f"BackfillJob(id={self.id}, start_date={self.start_date}, "
+            f"end_date={self.end_date}, status='{self.status}')"
+        )
+
+
+class BackfillChunk(Base):
+    """
+    BackfillChunk model is the checkpoint of one location and date range of
+    a job. Chunks are marked done once their records are written.
+    """
+
+    __tablename__ = "backfill_chunk"
+
+    job_id = Column(
+        Integer, ForeignKey("backfill_job.id", ondelete="CASCADE"), primary_key=True
+    )
+    loc_id = Column(
+        Integer, ForeignKey("location.id", ondelete="CASCADE"), primary_key=True
+    )
+    start_date = Column(Date, primary_key=True)
+    end_date = Column(Date, nullable=False)
+    status = Column(String, nullable=False, default=PENDING)
+    rows = Column(Integer, nullable=False, default=0)
+    attempts = Column(Integer, nullable=False, default=0)
+    error = Column(String, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    @classmethod
+    async def get_unfinished_async(cls, db, job_id: int) -> list["BackfillChunk"]:
+        """
+        Fetch the pending and failed chunks of a job, oldest dates first,
+        using an async session.
+        """
+        statement = (
+            select(cls)
+            .where(cls.job_id == job_id, cls.status != DONE)
+            .order_by(cls.start_date, cls.loc_id)
+        )
+        return (await db.scalars(statement)).all()
+
+    @classmethod
+    async def mark_async(
+        cls,
+        db,
+        job_id: int,
+        start_date: date,
+        rows: dict[int, int],
+        status: str = DONE,
+        error: Optional[str] = None,
+    ) -> None:
+        """
+        Record the outcome of an attempt at chunks of a job sharing a start
+        date, using an async session.
+
+        Args:
+            db: Async database session
+            job_id: Job ID
+            start_date: Start date of the chunks
+            rows: Records written, by loc_id of the chunks
+            status: done or failed
+            error: Reason of a failure
+        """
+        for loc_id, count in rows.items():
+            await db.execute(
+                update(cls)
+                .where(
+                    cls.job_id == job_id,
+                    cls.loc_id == loc_id,
+                    cls.start_date == start_date,
+                )
+                .values(
+                    status=status,
+                    rows=count,
+                    error=error,
+                    attempts=cls.attempts + 1,
+                    updated_at=datetime.utcnow(),
+                )
+            )
+        await db.commit()
+
+    def __repr__(self):
+        return (
+            f"BackfillChunk(job_id={self.job_id}, loc_id={self.loc_id}, "
+            f"start_date={self.start_date}, status='{self.status}')"
+        )
@@ -4,11 +4,22 @@
 # It represents a geographical location with attributes like name, latitude, and longitude.
 """
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Float, DateTime, CheckConstraint
+from sqlalchemy import Column, Integer, String, Float, DateTime, CheckConstraint, Index, func, select, text
 from sqlalchemy.orm import relationship
 from .db import Base
 
 
+def _has_pg_trgm(ddl, target, bind, **kw) -> bool:
+    """
+    Only create the trigram index when the pg_trgm extension is installed.
+    """
+    return bool(
+        bind.execute(
+            text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        ).scalar()
+    )
+
+
 class Location(Base):
     """
     Location model represents a geographical location with its attributes.
@@ -22,6 +33,15 @@ class Location(Base):
         CheckConstraint(
             "long >= -180 AND long <= 180", name="valid_longitude"
         ),
+        # Exact case-insensitive lookups (get_by_names)
+        Index("ix_location_name_lower", text("lower(name)")),
+        # Substring and ILIKE searches, needs the pg_trgm extension
+        Index(
+            "ix_location_name_trgm",
+            "name",
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql", callable_=_has_pg_trgm),
     )
 
     id = Column(Integer, primary_key=True, index=True)
@@ -58,6 +78,75 @@ class Location(Base):
         """
         return db.query(cls).filter(cls.id == loc_id).first()
 
+    @classmethod
+    def get_by_names(cls, db, names):
+        """
+        Fetch all locations whose name case-insensitively matches one of names.
+        """
+        if not names:
+            return []
+        lowered = {name.lower() for name in names}
+        return db.query(cls).filter(func.lower(cls.name).in_(lowered)).all()
+
+    @classmethod
+    def get_by_ids(cls, db, loc_ids):
+        """
+        Fetch all locations with one of the given IDs.
+        """
+        if not loc_ids:
+            return []
+        return db.query(cls).filter(cls.id.in_(set(loc_ids))).all()
+
+    async def save_async(self, db):
+        """
+        Save the location to the database using an async session.
+        """
+        db.add(self)
+        await db.commit()
+        await db.refresh(self)
+        return self
+
+    @classmethod
+    async def get_by_name_async(cls, db, name):
+        """
+        Fetch the location by name using an async session.
+        """
+        return (await db.scalars(select(cls).where(cls.name.ilike(name)).limit(1))).first()
+
+    @classmethod
+    async def get_by_id_async(cls, db, loc_id):
+        """
+        Fetch the location by ID using an async session.
+        """
+        return await db.get(cls, loc_id)
+
+    @classmethod
+    async def get_by_names_async(cls, db, names):
+        """
+        Fetch all locations whose name case-insensitively matches one of names,
+        using an async session.
+        """
+        if not names:
+            return []
+        lowered = {name.lower() for name in names}
+        return (await db.scalars(select(cls).where(func.lower(cls.name).in_(lowered)))).all()
+
+    @classmethod
+    async def get_all_async(cls, db):
+        """
+        Fetch every location using an async session.
+        """
+        return (await db.scalars(select(cls).order_by(cls.id))).all()
+
+    @classmethod
+    async def get_by_ids_async(cls, db, loc_ids):
+        """
+        Fetch all locations with one of the given IDs using an async session.
+        """
+        if not loc_ids:
+            return []
+        return (await db.scalars(select(cls).where(cls.id.in_(set(loc_ids))))).all()
+
     def to_dict(self):
         """
         Convert the location object to a dictionary.
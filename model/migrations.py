@@ -0,0 +1,313 @@
+"""
+# model/migrations.py
+# This module brings existing databases up to the declared schema and checks query plans.
+# create_all() only creates missing tables, indexes added to the models later are applied here.
+"""
+import argparse
+from datetime import date
+from typing import Optional
+
+from sqlalchemy import func, inspect, select, text, tuple_
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from logger import get_logger
+from .db import Base, get_engine
+from .location import Location
+from .weather import Weather
+from .weather_stats import WeatherMonthly
+
+logger = get_logger(__name__)
+
+# PostgreSQL extensions the declared indexes depend on
+EXTENSIONS = ("pg_trgm",)
+
+# (loc_id, date) pairs stored more than once, which block uq_weather_loc_date
+WEATHER_DUPLICATES = """
+    SELECT loc_id, date, count(*) AS records, string_agg(DISTINCT triggered_user, ', ') AS users
+    FROM weather
+    GROUP BY loc_id, date
+    HAVING count(*) > 1
+    ORDER BY loc_id, date
+"""
+
+# Rows older than the newest of their (loc_id, date) pair
+OLDER_DUPLICATES = """
+    FROM weather AS older
+    WHERE EXISTS (
+        SELECT 1 FROM weather AS newer
+        WHERE newer.loc_id = older.loc_id
+          AND newer.date = older.date
+          AND newer.id > older.id
+    )
+"""
+
+# Table the rows removed by --dedupe-weather are copied to
+DUPLICATES_BACKUP_TABLE = "weather_duplicates"
+
+# Duplicate pairs listed in the log
+MAX_REPORTED_DUPLICATES = 20
+
+
+def ensure_extensions(bind: Optional[Engine] = None) -> None:
+    """
+    Install the PostgreSQL extensions used by the indexes, if permitted.
+
+    A missing extension is logged and its indexes are skipped, the
+    queries they serve still work, only slower.
+    """
+    bind = bind if bind is not None else get_engine()
+    if bind.dialect.name != "postgresql":
+        return
+    for extension in EXTENSIONS:
+        try:
+            with bind.begin() as conn:
+                conn.execute(text(f"CREATE EXTENSION IF NOT EXISTS {extension}"))
+        except Exception as e:
+            logger.warning("Could not install extension %s: %s", extension, e)
+
+
+def _existing_indexes(bind: Engine) -> set[str]:
+    inspector = inspect(bind)
+    names = set()
+    for table in Base.metadata.sorted_tables:
+        if inspector.has_table(table.name):
+            names.update(index["name"] for index in inspector.get_indexes(table.name))
+            names.update(
+                constraint["name"]
+                for constraint in inspector.get_unique_constraints(table.name)
+            )
+    return names
+
+
+def _dedupe_weather(conn) -> int:
+    """
+    Keep the newest row of every (loc_id, date) pair. The removed rows are
+    copied to DUPLICATES_BACKUP_TABLE first.
+
+    Returns:
+        int: Number of removed rows
+    """
+    conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {DUPLICATES_BACKUP_TABLE} "
+        "(LIKE weather INCLUDING DEFAULTS)"
+    ))
+    conn.execute(text(f"INSERT INTO {DUPLICATES_BACKUP_TABLE} SELECT older.* {OLDER_DUPLICATES}"))
+    removed = conn.execute(text(f"DELETE {OLDER_DUPLICATES}")).rowcount
+    logger.warning(
+        "Removed %d duplicate weather records, copied to %s",
+        removed,
+        DUPLICATES_BACKUP_TABLE,
+    )
+    return removed
+
+
+def _add_weather_unique_constraint(bind: Engine, dedupe: bool = False) -> None:
+    """
+    Add uq_weather_loc_date to the weather table.
+
+    Records sharing a (loc_id, date) pair may belong to different users, so
+    they are never removed implicitly: the duplicates are reported and the
+    migration fails, unless dedupe is set.
+
+    Raises:
+        RuntimeError: If duplicate records exist and dedupe is not set.
+    """
+    with bind.begin() as conn:
+        duplicates = conn.execute(text(WEATHER_DUPLICATES)).all()
+        if duplicates and not dedupe:
+            for loc_id, day, records, users in duplicates[:MAX_REPORTED_DUPLICATES]:
+                logger.error(
+                    "Location %s on %s has %d weather records (users: %s)",
+                    loc_id,
+                    day,
+                    records,
+                    users or "none",
+                )
+            raise RuntimeError(
+                f"Cannot add uq_weather_loc_date: {len(duplicates)} (loc_id, date) "
+                "pairs have several weather records. Resolve them, or keep the "
+                "newest record of each with python -m model.migrations --dedupe-weather"
+            )
+        if duplicates:
+            _dedupe_weather(conn)
+        conn.execute(text(
+            "CREATE UNIQUE INDEX uq_weather_loc_date ON weather (loc_id, date)"
+        ))
+        conn.execute(text(
+            "ALTER TABLE weather ADD CONSTRAINT uq_weather_loc_date "
+            "UNIQUE USING INDEX uq_weather_loc_date"
+        ))
+
+
+def _create_missing_tables(bind: Engine) -> None:
+    """
+    Create the tables added to the models since the database was created.
+    A new weather rollup is built from the existing weather records.
+    """
+    inspector = inspect(bind)
+    for table in Base.metadata.sorted_tables:
+        if inspector.has_table(table.name):
+            continue
+        table.create(bind)
+        logger.info("Created table %s", table.name)
+        if table.name == WeatherMonthly.__tablename__:
+            with Session(bind) as db:
+                WeatherMonthly.rebuild(db)
+            logger.info("Built %s from the weather records", table.name)
+
+
+def apply_migrations(bind: Optional[Engine] = None, dedupe_weather: bool = False) -> None:
+    """
+    Create new tables and add the constraints and indexes declared on the
+    models to existing tables.
+
+    Safe to run on every start: only missing objects are created and no
+    records are removed. Indexes are built without CONCURRENTLY, so writes
+    to the table wait for the first run on a large table.
+
+    Args:
+        bind: Engine, the configured one by default
+        dedupe_weather: Remove all but the newest weather record of every
+            (loc_id, date) pair if needed to add uq_weather_loc_date
+
+    Raises:
+        RuntimeError: If uq_weather_loc_date is missing, duplicate weather
+            records exist and dedupe_weather is not set.
+    """
+    bind = bind if bind is not None else get_engine()
+    if bind.dialect.name != "postgresql":
+        return
+    _create_missing_tables(bind)
+    existing = _existing_indexes(bind)
+
+    if "uq_weather_loc_date" not in existing:
+        logger.info("Adding unique constraint uq_weather_loc_date")
+        _add_weather_unique_constraint(bind, dedupe=dedupe_weather)
+
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            with bind.begin() as conn:
+                # Goes through the DDL visitor so ddl_if conditions are honored
+                index.create(conn, checkfirst=True)
+                if inspect(conn).has_index(table.name, index.name):
+                    logger.info("Created index %s", index.name)
+                else:
+                    logger.warning("Skipped index %s", index.name)
+
+
+# Hot queries and the index each one is expected to use
+QUERY_PLAN_CHECKS = (
+    (
+        "weather by location and date",
+        select(Weather).where(Weather.loc_id == 1, Weather.date == date(2024, 1, 1)),
+        "uq_weather_loc_date",
+    ),
+    (
+        "recent weather by location",
+        select(Weather).where(Weather.loc_id == 1).order_by(Weather.date.desc()).limit(10),
+        "uq_weather_loc_date",
+    ),
+    (
+        "weather by location and date range",
+        select(Weather).where(
+            Weather.loc_id == 1,
+            Weather.date >= date(2024, 1, 1),
+            Weather.date <= date(2024, 1, 31),
+        ),
+        "uq_weather_loc_date",
+    ),
+    (
+        "weather by user",
+        select(Weather).where(Weather.triggered_user == "john_doe"),
+        "ix_weather_triggered_user",
+    ),
+    (
+        "weather records page",
+        select(Weather)
+        .where(tuple_(Weather.date, Weather.id) < tuple_(date(2024, 1, 1), 1000))
+        .order_by(Weather.date.desc(), Weather.id.desc())
+        .limit(50),
+        "ix_weather_date_id",
+    ),
+    (
+        "monthly weather stats by location",
+        select(WeatherMonthly).where(
+            WeatherMonthly.loc_id == 1, WeatherMonthly.month >= date(2024, 1, 1)
+        ),
+        "weather_monthly_pkey",
+    ),
+    (
+        "monthly weather stats by date range",
+        select(WeatherMonthly).where(WeatherMonthly.month >= date(2024, 1, 1)),
+        "ix_weather_monthly_month",
+    ),
+    (
+        "location by name substring",
+        select(Location).where(Location.name.ilike("%berl%")),
+        "ix_location_name_trgm",
+    ),
+    (
+        "locations by exact names",
+        select(Location).where(func.lower(Location.name).in_(["berlin", "paris"])),
+        "ix_location_name_lower",
+    ),
+)
+
+
+def explain(conn, statement) -> str:
+    """
+    Return the PostgreSQL query plan of a SQLAlchemy statement as text.
+    """
+    compiled = statement.compile(
+        dialect=conn.dialect, compile_kwargs={"literal_binds": True}
+    )
+    rows = conn.exec_driver_sql(f"EXPLAIN {compiled}")
+    return "\n".join(row[0] for row in rows)
+
+
+def check_query_plans(bind: Optional[Engine] = None) -> dict[str, bool]:
+    """
+    Check that every hot query in QUERY_PLAN_CHECKS can be served by its index.
+
+    Sequential scans are disabled while planning so the result does not
+    depend on table size, a query the index cannot serve still plans as a
+    sequential scan.
+
+    Returns:
+        dict: Query description mapped to whether the plan uses the expected index
+    """
+    bind = bind if bind is not None else get_engine()
+    results = {}
+    with bind.connect() as conn:
+        conn.execute(text("SET LOCAL enable_seqscan = off"))
+        for description, statement, index_name in QUERY_PLAN_CHECKS:
+            results[description] = index_name in explain(conn, statement)
+        conn.rollback()
+    return results
+
+
+if __name__ == "__main__":
+    # python -m model.migrations: migrate the configured database and verify the plans
+    parser = argparse.ArgumentParser(description="Migrate the database and check query plans")
+    parser.add_argument(
+        "--dedupe-weather",
+        action="store_true",
+        help=(
+            "keep only the newest weather record of every (loc_id, date) pair, "
+            f"the others are copied to {DUPLICATES_BACKUP_TABLE}"
+        ),
+    )
+    args = parser.parse_args()
+    ensure_extensions()
+    apply_migrations(dedupe_weather=args.dedupe_weather)
+    failed = False
+    for description, uses_index in check_query_plans().items():
+        if uses_index:
+            logger.info("%s: index scan", description)
+        else:
+            logger.error("%s: NO INDEX", description)
+        failed = failed or not uses_index
+    raise SystemExit(1 if failed else 0)
@@ -3,7 +3,8 @@
 # This module defines the Weather model for the weather application.
 """
 
-from datetime import datetime
+from collections import Counter
+from datetime import date, datetime
 from typing import Optional
 from sqlalchemy import (
     Column,
@@ -14,9 +15,45 @@ from sqlalchemy import (
     DateTime,
     ForeignKey,
     CheckConstraint,
+    Index,
+    UniqueConstraint,
+    column,
+    func,
+    select,
+    table,
+    text,
+    tuple_,
 )
-from sqlalchemy.orm import relationship
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import joinedload, relationship
 from .db import Base
+from .location import Location
+
+
+def _as_date(value) -> date:
+    """
+    Accept a date or an ISO 8601 date(time) string, asyncpg only binds date objects.
+    """
+    return value if isinstance(value, date) else date.fromisoformat(value[:10])
+
+
+def _column_value(key: str, value):
+    """
+    Coerce an updated field to its column type: dates from ISO strings,
+    humidity (a float in the API schema) rounded to the integer column.
+    """
+    if key == "date":
+        return _as_date(value)
+    if key == "humidity":
+        return round(value)
+    return value
+
+
+def _stats():
+    # Imported on use, the rollup model imports this module
+    from .weather_stats import WeatherMonthly
+
+    return WeatherMonthly
 
 
 class Weather(Base):
@@ -29,6 +66,37 @@ class Weather(Base):
         CheckConstraint("temp >= -100 AND temp <= 100", name="valid_temperature"),
         CheckConstraint("humidity >= 0 AND humidity <= 100", name="valid_humidity"),
         CheckConstraint("wind_speed >= 0", name="valid_wind_speed"),
+        # One record per location and day, the target of bulk upserts; its index
+        # also serves the loc_id and loc_id + date range lookups
+        UniqueConstraint("loc_id", "date", name="uq_weather_loc_date"),
+        Index("ix_weather_triggered_user", "triggered_user"),
+        # Keyset pagination order, see page()
+        Index("ix_weather_date_id", "date", "id"),
+    )
+
+    # Columns overwritten when an upsert hits an existing (loc_id, date) row.
+    # Upserts only update rows of the same owner (upsert_many) or source
+    # (upsert_source_async), so triggered_user is never rewritten
+    UPSERT_COLUMNS = (
+        "temp",
+        "condition",
+        "wind_speed",
+        "humidity",
+        "api_source",
+    )
+
+    # Temporary table bulk rows are copied into before being merged with one
+    # INSERT ... SELECT, kept for the connection and emptied on commit
+    STAGING_TABLE = "weather_staging"
+    STAGING_COLUMNS = (
+        "loc_id",
+        "date",
+        "temp",
+        "condition",
+        "wind_speed",
+        "humidity",
+        "triggered_user",
+        "api_source",
     )
 
     id = Column(Integer, primary_key=True, index=True)
@@ -48,20 +116,151 @@ class Weather(Base):
 
     def save(self, db):
         """
-        Save the weather record to the database.
+        Save the weather record to the database and refresh its monthly rollup.
         """
         db.add(self)
+        db.flush()
+        _stats().refresh(db, [(self.loc_id, self.date)])
         db.commit()
         db.refresh(self)
         return self
 
+    async def save_async(self, db):
+        """
+        Save the weather record to the database using an async session.
+        """
+        db.add(self)
+        await db.flush()
+        await _stats().refresh_async(db, [(self.loc_id, self.date)])
+        await db.commit()
+        await db.refresh(self)
+        return self
+
+    @classmethod
+    def upsert_many(cls, db, rows: list[dict]) -> set[tuple]:
+        """
+        Insert or update many weather records keyed by (loc_id, date).
+
+        Uses a multi-row INSERT ... ON CONFLICT (loc_id, date) DO UPDATE,
+        batched by SQLAlchemy's insertmanyvalues. An existing row is only
+        overwritten, source included, when it has the same triggered_user;
+        rows of other users are left alone and not returned. Rows must not
+        repeat a (loc_id, date) pair within one call. The monthly rollup of
+        the written months is refreshed in the same transaction.
+
+        Args:
+            db: Database session
+            rows: Column dictionaries, date as datetime.date
+
+        Returns:
+            set[tuple]: (loc_id, date) pairs of the written rows
+        """
+        if not rows:
+            return set()
+        written = set(map(tuple, db.execute(cls._upsert_statement(cls._same_owner()), rows)))
+        _stats().refresh(db, written)
+        db.commit()
+        return written
+
+    @classmethod
+    async def upsert_many_async(cls, db, rows: list[dict]) -> set[tuple]:
+        """
+        Insert or update many weather records keyed by (loc_id, date)
+        using an async session, see upsert_many.
+        """
+        if not rows:
+            return set()
+        written = set(await cls._write_async(db, rows, cls._same_owner()))
+        await _stats().refresh_async(db, written)
+        await db.commit()
+        return written
+
+    @classmethod
+    async def upsert_source_async(cls, db, rows: list[dict], api_source: str) -> dict[int, int]:
+        """
+        Insert many weather records loaded from api_source, updating only
+        existing (loc_id, date) rows that were loaded from the same source,
+        using an async session. Records from other sources, e.g. created by
+        users, are kept as they are.
+
+        Args:
+            db: Async database session
+            rows: Column dictionaries, date as datetime.date
+            api_source: Source of the rows, the only one overwritten
+
+        Returns:
+            dict[int, int]: Number of written rows by loc_id
+        """
+        if not rows:
+            return {}
+        written = Counter(
+            loc_id for loc_id, _ in await cls._write_async(db, rows, cls.api_source == api_source)
+        )
+        await _stats().refresh_async(db, [(row["loc_id"], row["date"]) for row in rows])
+        await db.commit()
+        return dict(written)
+
+    @classmethod
+    async def _write_async(cls, db, rows: list[dict], where) -> list[tuple]:
+        """
+        Upsert rows with an async session and return the written (loc_id, date)
+        keys. On asyncpg the rows are loaded with COPY into the staging table
+        and merged with one INSERT ... SELECT ... ON CONFLICT, other drivers
+        run the batched multi-row upsert.
+        """
+        if db.get_bind().dialect.driver != "asyncpg":
+            return list(map(tuple, await db.execute(cls._upsert_statement(where), rows)))
+
+        # Through the session first, so the transaction is open before COPY
+        await db.execute(text(
+            f"CREATE TEMPORARY TABLE IF NOT EXISTS {cls.STAGING_TABLE} ("
+            "loc_id integer, date date, temp double precision, condition varchar, "
+            "wind_speed double precision, humidity integer, triggered_user varchar, "
+            "api_source varchar) ON COMMIT DELETE ROWS"
+        ))
+        connection = await (await db.connection()).get_raw_connection()
+        await connection.driver_connection.copy_records_to_table(
+            cls.STAGING_TABLE,
+            records=[tuple(row[key] for key in cls.STAGING_COLUMNS) for row in rows],
+            columns=cls.STAGING_COLUMNS,
+        )
+        staging = table(cls.STAGING_TABLE, *(column(key) for key in cls.STAGING_COLUMNS))
+        source = select(*staging.c, func.timezone("utc", func.now()))
+        statement = cls._upsert_statement(where, source)
+        return list(map(tuple, await db.execute(statement)))
+
+    @classmethod
+    def _same_owner(cls):
+        # The excluded pseudo-table renders the same for every insert(cls)
+        return cls.triggered_user.is_not_distinct_from(insert(cls).excluded.triggered_user)
+
+    @classmethod
+    def _upsert_statement(cls, where=None, source=None):
+        """
+        Build the (loc_id, date) upsert, updating conflicting rows only
+        where the condition holds and returning the written keys. With a
+        source SELECT (STAGING_COLUMNS and created_at) it is an INSERT ... SELECT.
+        """
+        statement = insert(cls)
+        if source is not None:
+            statement = statement.from_select([*cls.STAGING_COLUMNS, "created_at"], source)
+        return statement.on_conflict_do_update(
+            index_elements=[cls.loc_id, cls.date],
+            set_={column: statement.excluded[column] for column in cls.UPSERT_COLUMNS},
+            where=where,
+        ).returning(cls.loc_id, cls.date)
+
     def update(self, db, **kwargs):
         """
         Update the weather record with provided fields.
+        The rollups of its previous and new month are refreshed.
         """
+        groups = [(self.loc_id, self.date)]
         for key, value in kwargs.items():
             if hasattr(self, key) and value is not None:
-                setattr(self, key, value)
+                setattr(self, key, _column_value(key, value))
+        db.flush()
+        _stats().refresh(db, groups + [(self.loc_id, self.date)])
         db.commit()
         db.refresh(self)
         return self
@@ -70,10 +269,46 @@ class Weather(Base):
         """
         Delete the weather record from the database.
         """
+        groups = [(self.loc_id, self.date)]
         db.delete(self)
+        db.flush()
+        _stats().refresh(db, groups)
         db.commit()
         return {"message": "Weather record deleted successfully"}
 
+    async def update_async(self, db, **kwargs):
+        """
+        Update the weather record with provided fields using an async session.
+        The rollups of its previous and new month are refreshed.
+        """
+        groups = [(self.loc_id, self.date)]
+        for key, value in kwargs.items():
+            if hasattr(self, key) and value is not None:
+                setattr(self, key, _column_value(key, value))
+        await db.flush()
+        await _stats().refresh_async(db, groups + [(self.loc_id, self.date)])
+        await db.commit()
+        await db.refresh(self)
+        return self
+
+    async def delete_async(self, db):
+        """
+        Delete the weather record from the database using an async session.
+        """
+        groups = [(self.loc_id, self.date)]
+        await db.delete(self)
+        await db.flush()
+        await _stats().refresh_async(db, groups)
+        await db.commit()
+        return {"message": "Weather record deleted successfully"}
+
+    @classmethod
+    async def get_by_id_async(cls, db, weather_id: int) -> Optional["Weather"]:
+        """
+        Fetch a weather record by ID using an async session.
+        """
+        return await db.get(cls, weather_id)
+
     @classmethod
     def get_by_location_and_date(
         cls, db, loc_id: int, date_param: str
@@ -90,6 +325,18 @@ class Weather(Base):
             db.query(cls).filter(cls.loc_id == loc_id, cls.date == date_param).first()
         )
 
+    @classmethod
+    async def get_by_location_and_date_async(
+        cls, db, loc_id: int, date_param: str
+    ) -> Optional["Weather"]:
+        """
+        Fetch a weather record by location ID and date using an async session.
+        """
+        statement = select(cls).where(
+            cls.loc_id == loc_id, cls.date == _as_date(date_param)
+        )
+        return (await db.scalars(statement.limit(1))).first()
+
     @classmethod
     def get_by_location(cls, db, loc_id: int, limit: int = 10):
         """
@@ -103,6 +350,19 @@ class Weather(Base):
             .all()
         )
 
+    @classmethod
+    async def get_by_location_async(cls, db, loc_id: int, limit: int = 10):
+        """
+        Fetch recent weather records for a location using an async session.
+        """
+        statement = (
+            select(cls)
+            .where(cls.loc_id == loc_id)
+            .order_by(cls.date.desc())
+            .limit(limit)
+        )
+        return (await db.scalars(statement)).all()
+
     def to_dict(self):
         """
         Convert the weather record to a dictionary.
@@ -120,6 +380,95 @@ class Weather(Base):
             "created_at": self.created_at.isoformat() if self.created_at else None,
         }
 
+    @classmethod
+    def filtered(
+        cls,
+        db,
+        location: Optional[str] = None,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        user: Optional[str] = None,
+    ):
+        """
+        Build a query of weather records joined with their location.
+
+        Args:
+            db: Database session
+            location: Optional location name filter (substring, case-insensitive)
+            start_date: Optional start date filter (YYYY-MM-DD)
+            end_date: Optional end date filter (YYYY-MM-DD)
+            user: Optional user name filter (substring, case-insensitive)
+        """
+        return db.query(cls).join(Location).filter(
+            *cls._filter_criteria(location, start_date, end_date, user)
+        )
+
+    @classmethod
+    def select_filtered(
+        cls,
+        location: Optional[str] = None,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        user: Optional[str] = None,
+    ):
+        """
+        Build a select() of weather records joined with their location,
+        for async sessions. Filters are the same as in filtered().
+
+        Raises:
+            ValueError: If a date is not in ISO 8601 format.
+        """
+        return select(cls).join(Location).where(
+            *cls._filter_criteria(location, start_date, end_date, user)
+        )
+
+    @classmethod
+    def _filter_criteria(cls, location, start_date, end_date, user) -> list:
+        criteria = []
+        if location:
+            criteria.append(Location.name.ilike(f"%{location}%"))
+        if start_date:
+            criteria.append(cls.date >= _as_date(start_date))
+        if end_date:
+            criteria.append(cls.date <= _as_date(end_date))
+        if user:
+            criteria.append(cls.triggered_user.ilike(f"%{user}%"))
+        return criteria
+
+    @classmethod
+    def page(cls, query, limit: int, after: Optional[tuple] = None) -> list["Weather"]:
+        """
+        Fetch one page of a weather query, newest first, by keyset on (date, id).
+
+        Seeks past the last row of the previous page instead of using
+        OFFSET, so every page costs the same regardless of its depth.
+
+        Args:
+            query: Weather query, e.g. from filtered()
+            limit: Maximum number of records
+            after: (date, id) of the last record of the previous page
+
+        Returns:
+            list[Weather]: Up to limit records
+        """
+        return cls._keyset(query, limit, after).all()
+
+    @classmethod
+    async def page_async(
+        cls, db, statement, limit: int, after: Optional[tuple] = None
+    ) -> list["Weather"]:
+        """
+        Fetch one page of a weather select() using an async session, see page().
+        """
+        return (await db.scalars(cls._keyset(statement, limit, after))).all()
+
+    @classmethod
+    def _keyset(cls, statement, limit: int, after: Optional[tuple]):
+        # Works on both legacy Query and select() objects
+        if after is not None:
+            statement = statement.filter(tuple_(cls.date, cls.id) < tuple_(*after))
+        return statement.order_by(cls.date.desc(), cls.id.desc()).limit(limit)
+
     @classmethod
     def get_from_date_range(
         cls, db, loc_id: int, start_date: str, end_date: str
@@ -138,6 +487,24 @@ class Weather(Base):
             .all()
         )
 
+    @classmethod
+    async def get_from_date_range_async(
+        cls, db, loc_id: int, start_date: str, end_date: str
+    ):
+        """
+        Fetch weather records for a location within a date range using an async session.
+        """
+        statement = (
+            select(cls)
+            .where(
+                cls.loc_id == loc_id,
+                cls.date >= _as_date(start_date),
+                cls.date <= _as_date(end_date),
+            )
+            .order_by(cls.date.desc())
+        )
+        return (await db.scalars(statement)).all()
+
     def get_from_user(self, db, user: str):
         """
         Fetch weather records triggered by a specific user.
@@ -149,6 +516,48 @@ class Weather(Base):
             .all()
         )
 
+    @classmethod
+    async def get_by_user_async(cls, db, user: str):
+        """
+        Fetch weather records triggered by a specific user using an async session.
+        """
+        statement = (
+            select(cls).where(cls.triggered_user == user).order_by(cls.date.desc())
+        )
+        return (await db.scalars(statement)).all()
+
+    @classmethod
+    async def get_by_user_with_location_async(cls, db, user: str):
+        """
+        Fetch weather records triggered by a specific user with their location
+        loaded by the same query (an inner join), using an async session.
+        """
+        statement = (
+            select(cls)
+            .options(joinedload(cls.location, innerjoin=True))
+            .where(cls.triggered_user == user)
+            .order_by(cls.date.desc())
+        )
+        return (await db.scalars(statement)).all()
+
+    @classmethod
+    async def get_user_locations_async(cls, db, user: str) -> list[Location]:
+        """
+        Fetch the distinct locations of the weather records of a user, in one
+        query, using an async session.
+        """
+        loc_ids = select(cls.loc_id).where(cls.triggered_user == user)
+        statement = select(Location).where(Location.id.in_(loc_ids)).order_by(Location.id)
+        return (await db.scalars(statement)).all()
+
+    @classmethod
+    async def count_by_location_async(cls, db) -> dict[int, int]:
+        """
+        Count the weather records of every location using an async session.
+        """
+        statement = select(cls.loc_id, func.count()).group_by(cls.loc_id)
+        return dict((await db.execute(statement)).all())
+
     def __repr__(self):
         return (
             f"Weather(id={self.id}, loc_id={self.loc_id}, "
@@ -0,0 +1,364 @@
+"""
+# model/weather_stats.py
+# This module defines the monthly weather rollup: per-location aggregates kept up
+# to date on every write, so statistics over years are read from a few rows per
+# location instead of scanning the weather table.
+"""
+
+from datetime import date, timedelta
+from typing import Iterable, Literal, Optional
+from sqlalchemy import (
+    Column,
+    Date,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    column,
+    delete,
+    func,
+    null,
+    select,
+    text,
+    true,
+    tuple_,
+    values,
+)
+from sqlalchemy.dialects.postgresql import insert
+from .db import Base
+from .location import Location
+from .weather import Weather, _as_date
+
+Period = Literal["day", "month", "year", "all"]
+
+# (loc_id, month) groups recomputed per statement
+REFRESH_CHUNK_SIZE = 1000
+
+# One transaction-scoped lock per (loc_id, month since year 0), taken in array order
+LOCK_GROUPS = text(
+    "SELECT count(pg_advisory_xact_lock(g.loc_id, g.month)) "
+    "FROM unnest(CAST(:loc_ids AS integer[]), CAST(:months AS integer[])) AS g(loc_id, month)"
+)
+
+AGGREGATE_COLUMNS = (
+    "records",
+    "temp_sum",
+    "temp_min",
+    "temp_max",
+    "humidity_count",
+    "humidity_sum",
+    "humidity_min",
+    "humidity_max",
+)
+
+
+def month_start(day: date) -> date:
+    """
+    First day of the month of a date.
+    """
+    return day.replace(day=1)
+
+
+def next_month(day: date) -> date:
+    """
+    First day of the month after the month of a date.
+    """
+    return (month_start(day) + timedelta(days=32)).replace(day=1)
+
+
+class WeatherMonthly(Base):
+    """
+    Aggregates of the weather records of one location, month and triggering
+    user (empty for records without one).
+
+    Stores sums and counts rather than means so rows combine exactly into
+    years and across users. A (loc_id, month) group is recomputed from the
+    weather table whenever one of its records is written, see refresh().
+    """
+
+    __tablename__ = "weather_monthly"
+    __table_args__ = (
+        # Date-only filters over all locations
+        Index("ix_weather_monthly_month", "month"),
+    )
+
+    loc_id = Column(
+        Integer, ForeignKey("location.id", ondelete="CASCADE"), primary_key=True
+    )
+    month = Column(Date, primary_key=True)
+    triggered_user = Column(String, primary_key=True, default="")
+    records = Column(Integer, nullable=False)
+    temp_sum = Column(Float, nullable=False)
+    temp_min = Column(Float, nullable=False)
+    temp_max = Column(Float, nullable=False)
+    humidity_count = Column(Integer, nullable=False)
+    humidity_sum = Column(Float)
+    humidity_min = Column(Integer)
+    humidity_max = Column(Integer)
+
+    @classmethod
+    def _aggregate(cls, *group_by):
+        """
+        Select the rollup columns of the weather records grouped by group_by,
+        a None key is selected as NULL and not grouped by.
+        """
+        return select(
+            *(key if key is not None else null() for key in group_by),
+            func.count(),
+            func.sum(Weather.temp),
+            func.min(Weather.temp),
+            func.max(Weather.temp),
+            func.count(Weather.humidity),
+            func.sum(Weather.humidity),
+            func.min(Weather.humidity),
+            func.max(Weather.humidity),
+        ).group_by(*_grouping(*group_by))
+
+    @classmethod
+    def _rollup_select(cls):
+        month = func.date_trunc("month", Weather.date).cast(Date)
+        return cls._aggregate(
+            Weather.loc_id, month, func.coalesce(Weather.triggered_user, "")
+        )
+
+    @classmethod
+    def _insert(cls, aggregated):
+        statement = insert(cls).from_select(
+            ["loc_id", "month", "triggered_user", *AGGREGATE_COLUMNS], aggregated
+        )
+        return statement.on_conflict_do_update(
+            index_elements=[cls.loc_id, cls.month, cls.triggered_user],
+            set_={name: statement.excluded[name] for name in AGGREGATE_COLUMNS},
+        )
+
+    @classmethod
+    def refresh_statements(cls, groups: Iterable[tuple[int, date]]) -> list:
+        """
+        Build the statements recomputing the rollup rows of some records.
+
+        Every (loc_id, month) group is deleted and aggregated again from the
+        weather table, which keeps min/max exact after updates and deletes
+        and covers records moving between users, days or locations.
+
+        Groups are locked until the transaction ends, in sorted order, so a
+        concurrent write to the same month waits for this one to commit and
+        then aggregates both; without it each would miss the other's records.
+
+        Args:
+            groups: (loc_id, date) of the written records, in any order and
+                with repetitions.
+
+        Returns:
+            list: Lock, DELETE and INSERT statements, in execution order.
+        """
+        months = sorted({(loc_id, month_start(_as_date(day))) for loc_id, day in groups})
+        statements = []
+        for offset in range(0, len(months), REFRESH_CHUNK_SIZE):
+            chunk = months[offset:offset + REFRESH_CHUNK_SIZE]
+            spans = values(
+                column("loc_id", Integer),
+                column("start", Date),
+                column("stop", Date),
+                name="spans",
+            ).data([(loc_id, month, next_month(month)) for loc_id, month in chunk])
+            # Aggregated per group in a lateral subquery, which the planner cannot
+            # flatten: each group is one range scan of uq_weather_loc_date instead
+            # of a join on loc_id comparing every record with every month
+            aggregates = (
+                cls._aggregate(func.coalesce(Weather.triggered_user, ""))
+                .where(
+                    Weather.loc_id == spans.c.loc_id,
+                    Weather.date >= spans.c.start,
+                    Weather.date < spans.c.stop,
+                )
+                .lateral("aggregates")
+            )
+            aggregated = select(
+                spans.c.loc_id, spans.c.start, *aggregates.c
+            ).select_from(spans.join(aggregates, true()))
+            statements.append(
+                LOCK_GROUPS.bindparams(
+                    loc_ids=[loc_id for loc_id, _ in chunk],
+                    months=[month.year * 12 + month.month - 1 for _, month in chunk],
+                )
+            )
+            statements.append(delete(cls).where(tuple_(cls.loc_id, cls.month).in_(chunk)))
+            statements.append(cls._insert(aggregated))
+        return statements
+
+    @classmethod
+    def refresh(cls, db, groups: Iterable[tuple[int, date]]) -> None:
+        """
+        Recompute the rollup rows of written records in the current
+        transaction, see refresh_statements. The caller commits.
+        """
+        for statement in cls.refresh_statements(groups):
+            db.execute(statement)
+
+    @classmethod
+    async def refresh_async(cls, db, groups: Iterable[tuple[int, date]]) -> None:
+        """
+        Recompute the rollup rows of written records using an async session,
+        see refresh.
+        """
+        for statement in cls.refresh_statements(groups):
+            await db.execute(statement)
+
+    @classmethod
+    def rebuild(cls, db) -> None:
+        """
+        Rebuild the whole rollup from the weather table, e.g. after writes
+        made outside the Weather model, and commit.
+        """
+        db.execute(delete(cls))
+        db.execute(cls._insert(cls._rollup_select()))
+        db.commit()
+
+    @classmethod
+    async def stats_async(
+        cls,
+        db,
+        location: Optional[str] = None,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        user: Optional[str] = None,
+        period: Period = "month",
+    ) -> list[dict]:
+        """
+        Temperature and humidity statistics per location and period using an
+        async session. Filters are the same as in Weather.filtered().
+
+        Whole months of the window are read from the rollup, only the partial
+        months at its edges (at most two) from the weather records. Daily
+        statistics are the records themselves, one per location and day, so
+        they are always read from the weather table.
+
+        Args:
+            db: Async database session
+            location: Optional location name filter (substring, case-insensitive)
+            start_date: Optional start date filter (YYYY-MM-DD)
+            end_date: Optional end date filter (YYYY-MM-DD)
+            user: Optional user name filter (substring, case-insensitive)
+            period: Length of the periods, "all" for one row per location
+
+        Returns:
+            list[dict]: Statistics by location, then period start.
+
+        Raises:
+            ValueError: If a date is not in ISO 8601 format.
+        """
+        start = _as_date(start_date) if start_date else None
+        end = _as_date(end_date) if end_date else None
+        totals: dict[tuple, list] = {}
+
+        if period == "day":
+            ranges = [(start, end)]
+        else:
+            ranges = _partial_months(start, end)
+            rollup = select(Location.name).select_from(cls).join(
+                Location, Location.id == cls.loc_id
+            )
+            if location:
+                rollup = rollup.where(Location.name.ilike(f"%{location}%"))
+            if start:
+                rollup = rollup.where(cls.month >= start)
+            if end:
+                rollup = rollup.where(cls.month < month_start(end + timedelta(days=1)))
+            if user:
+                rollup = rollup.where(cls.triggered_user.ilike(f"%{user}%"))
+            bucket = _bucket(cls.month, period)
+            statement = rollup.add_columns(
+                cls.loc_id,
+                bucket if bucket is not None else null(),
+                func.sum(cls.records),
+                func.sum(cls.temp_sum),
+                func.min(cls.temp_min),
+                func.max(cls.temp_max),
+                func.sum(cls.humidity_count),
+                func.sum(cls.humidity_sum),
+                func.min(cls.humidity_min),
+                func.max(cls.humidity_max),
+            ).group_by(*_grouping(Location.name, cls.loc_id, bucket))
+            _merge(totals, (await db.execute(statement)).all())
+
+        for first, last in ranges:
+            bucket = _bucket(Weather.date, period)
+            statement = (
+                cls._aggregate(Location.name, Weather.loc_id, bucket)
+                .select_from(Weather)
+                .join(Location)
+                .where(*Weather._filter_criteria(location, first, last, user))
+            )
+            _merge(totals, (await db.execute(statement)).all())
+
+        return [
+            _summary(name, loc_id, bucket, total)
+            for (name, loc_id, bucket), total in sorted(
+                totals.items(), key=lambda item: (item[0][1], item[0][2] or date.min)
+            )
+        ]
+
+
+def _partial_months(
+    start: Optional[date], end: Optional[date]
+) -> list[tuple[date, date]]:
+    """
+    Date ranges of a window not covered by whole months, at most one at each end.
+    """
+    ranges = []
+    if start and start.day != 1:
+        head_end = next_month(start) - timedelta(days=1)
+        ranges.append((start, min(head_end, end) if end else head_end))
+    if end:
+        cutoff = month_start(end + timedelta(days=1))
+        if cutoff <= end:
+            tail_start = max(cutoff, start) if start else cutoff
+            if not ranges or tail_start > ranges[0][1]:
+                ranges.append((tail_start, end))
+    return ranges
+
+
+def _grouping(*keys) -> list:
+    # PostgreSQL rejects constants in GROUP BY, the NULL period of "all" is left out
+    return [key for key in keys if key is not None]
+
+
+def _bucket(day_column, period: Period):
+    if period == "all":
+        return None
+    if period == "day":
+        return day_column
+    return func.date_trunc(period, day_column).cast(Date)
+
+
+def _merge(totals: dict[tuple, list], rows) -> None:
+    """
+    Add aggregated rows (name, loc_id, period, records, temp sum/min/max,
+    humidity count/sum/min/max) into totals keyed by (name, loc_id, period).
+    """
+    for name, loc_id, bucket, *aggregates in rows:
+        total = totals.get((name, loc_id, bucket))
+        if total is None:
+            totals[(name, loc_id, bucket)] = list(aggregates)
+            continue
+        for i, function in enumerate((sum, sum, min, max, sum, sum, min, max)):
+            known = [value for value in (total[i], aggregates[i]) if value is not None]
+            total[i] = function(known) if known else None
+
+
+def _summary(name: str, loc_id: int, bucket: Optional[date], total: list) -> dict:
+    records, temp_sum, temp_min, temp_max, humidity_count, humidity_sum, humidity_min, humidity_max = total
+    return {
+        "loc_id": loc_id,
+        "location": name,
+        "period": bucket,
+        "records": records,
+        "temp_mean": temp_sum / records if records else None,
+        "temp_min": temp_min,
+        "temp_max": temp_max,
+        "humidity_count": humidity_count,
+        "humidity_mean": humidity_sum / humidity_count if humidity_count else None,
+        "humidity_min": humidity_min,
+        "humidity_max": humidity_max,
+    }
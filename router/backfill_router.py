@@ -0,0 +1,122 @@
+"""
+# router/backfill_router.py
+# This module defines the admin API endpoints of the historical weather backfill.
+# Jobs run in the background of the serving process, see controller/backfill.py.
+"""
+
+import os
+import secrets
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+
+from controller.backfill import (
+    CHUNK_DAYS,
+    WORKERS,
+    cancel_job,
+    create_job,
+    job_status,
+    recent_jobs,
+    start_job,
+)
+from controller.location_controller import resolve_locations
+from schema.backfill import BackfillJobStatus, BackfillRequest
+from utils import load_settings
+
+ADMIN_TOKEN = os.getenv(
+    "BACKFILL_ADMIN_TOKEN", load_settings().get("backfill", {}).get("admin_token", "")
+)
+
+
+def check_admin_token(x_admin_token: Optional[str] = Header(None)) -> None:
+    """
+    Require the configured admin token. Without one the endpoints are
+    disabled, so a default install cannot start backfills.
+    """
+    if not ADMIN_TOKEN:
+        raise HTTPException(
+            status_code=403,
+            detail="Backfill admin API is disabled, set BACKFILL_ADMIN_TOKEN to enable it",
+        )
+    if not secrets.compare_digest(x_admin_token or "", ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+router = APIRouter(prefix="/admin/backfill", dependencies=[Depends(check_admin_token)])
+
+
+async def _get_job(job_id: int) -> dict:
+    job = await job_status(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Backfill job {job_id} not found")
+    return job
+
+
+@router.post("", response_model=BackfillJobStatus, status_code=202)
+async def create_backfill(request: BackfillRequest):
+    """
+    Endpoint to create a backfill job and start it in the background.
+
+    Args:
+        request: Locations, date range and chunking of the job.
+
+    Returns:
+        BackfillJobStatus: The created job, follow it with GET /admin/backfill/{job_id}.
+    """
+    locations, not_found = await resolve_locations(request.names, request.ids)
+    if not_found:
+        raise HTTPException(
+            status_code=404, detail=f"Locations not found: {', '.join(not_found)}"
+        )
+    loc_ids = list(dict.fromkeys(location["id"] for location in locations.values()))
+    try:
+        job = await create_job(
+            loc_ids,
+            request.start_date,
+            request.end_date,
+            request.chunk_days or CHUNK_DAYS,
+            request.triggered_user,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    start_job(job["id"], request.workers or WORKERS)
+    return await _get_job(job["id"])
+
+
+@router.get("", response_model=list[BackfillJobStatus])
+async def list_backfills():
+    """
+    Endpoint to list the most recent backfill jobs with their progress.
+    """
+    return await recent_jobs()
+
+
+@router.get("/{job_id}", response_model=BackfillJobStatus)
+async def get_backfill(job_id: int):
+    """
+    Endpoint to get a backfill job with its progress.
+    """
+    return await _get_job(job_id)
+
+
+@router.post("/{job_id}/resume", response_model=BackfillJobStatus, status_code=202)
+async def resume_backfill(job_id: int, workers: Optional[int] = None):
+    """
+    Endpoint to run the pending and failed chunks of a job again, e.g. after
+    a restart or failed requests.
+    """
+    await _get_job(job_id)
+    if not start_job(job_id, workers or WORKERS):
+        raise HTTPException(status_code=409, detail=f"Backfill job {job_id} is running")
+    return await _get_job(job_id)
+
+
+@router.post("/{job_id}/cancel", response_model=BackfillJobStatus)
+async def cancel_backfill(job_id: int):
+    """
+    Endpoint to stop a running job, it can be resumed later.
+    """
+    await _get_job(job_id)
+    if not await cancel_job(job_id):
+        raise HTTPException(status_code=409, detail=f"Backfill job {job_id} is not running")
+    return await _get_job(job_id)
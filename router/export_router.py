@@ -1,72 +1,283 @@
 """
 # router/export_router.py
 # This module defines the API endpoints for exporting data in various formats.
+# Exports are streamed from a server-side cursor, so memory stays constant
+# regardless of the number of exported rows.
 """
 
 import csv
 import json
-import xml.etree.ElementTree as ET
 from datetime import datetime
+from functools import lru_cache
 from io import StringIO
-from typing import Optional
+from typing import TYPE_CHECKING, AsyncIterator, Literal, Optional
+from xml.sax.saxutils import escape
 
-from fastapi import APIRouter, Depends, HTTPException, Query, Response
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Select, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from model.db import get_db
+from model.db import AsyncSessionLocal, get_async_db
 from model.location import Location
 from model.weather import Weather
+from metrics import EXPORT_BYTES, EXPORT_ROWS
+
+if TYPE_CHECKING:
+    import pyarrow as pa
 
 
 router = APIRouter(prefix="/export")
 
+# Rows fetched per server-side cursor round trip, and emitted per streamed chunk
+STREAM_CHUNK_SIZE = 1000
+
+WEATHER_FIELDS = [
+    "id",
+    "loc_id",
+    "date",
+    "temp",
+    "condition",
+    "wind_speed",
+    "humidity",
+    "triggered_user",
+    "api_source",
+    "created_at",
+]
+
+# Rows per record batch for the columnar formats (one Parquet row group each)
+COLUMNAR_CHUNK_SIZE = 65536
 
-def _get_all_data(
-    db: Session,
+
+@lru_cache(maxsize=1)
+def _arrow_schema() -> "pa.Schema":
+    """
+    Arrow schema of the columnar exports, in WEATHER_FIELDS order.
+    pyarrow is only imported once a columnar export is requested.
+    """
+    import pyarrow as pa
+
+    return pa.schema(
+        [
+            ("id", pa.int32()),
+            ("loc_id", pa.int32()),
+            ("date", pa.date32()),
+            ("temp", pa.float32()),
+            ("condition", pa.string()),
+            ("wind_speed", pa.float32()),
+            ("humidity", pa.int32()),
+            ("triggered_user", pa.string()),
+            ("api_source", pa.string()),
+            ("created_at", pa.timestamp("us")),
+        ]
+    )
+
+
+def _export_statement(
     location: Optional[str] = None,
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
     user: Optional[str] = None,
-):
+) -> Select:
+    """
+    Build the select of the filtered records, newest first.
+
+    Called by the handlers before the response starts, so invalid filters
+    are answered with a 400 instead of a truncated 200 stream.
+
+    Raises:
+        HTTPException: 400 if a date is not in ISO 8601 format.
+    """
+    try:
+        statement = Weather.select_filtered(location, start_date, end_date, user)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid date: {e}") from e
+    return statement.order_by(Weather.date.desc())
+
+
+async def _get_all_data(
+    db: AsyncSession,
+    location: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    user: Optional[str] = None,
+) -> AsyncIterator[list[dict]]:
     """
-    Helper function to fetch all data based on filters.
+    Helper function to stream all data based on filters.
 
     Args:
-        db: Database session
+        db: Async database session, must stay open while the iterator is consumed
         location: Optional location name filter
         start_date: Optional start date filter (YYYY-MM-DD)
         end_date: Optional end date filter (YYYY-MM-DD)
         user: Optional user name filter
 
-    Returns:
-        List of dictionaries containing weather and location data
+    Yields:
+        Lists of up to STREAM_CHUNK_SIZE weather record dictionaries
+    """
+    statement = _export_statement(location, start_date, end_date, user)
+    async for chunk in _stream_chunks(db, statement):
+        yield chunk
+
+
+async def _stream_chunks(db: AsyncSession, statement: Select) -> AsyncIterator[list[dict]]:
+    """
+    Stream the records of a select in chunks of STREAM_CHUNK_SIZE dictionaries.
+    """
+    # yield_per switches to a server-side cursor and fetches in fixed-size batches
+    records = await db.stream_scalars(
+        statement, execution_options={"yield_per": STREAM_CHUNK_SIZE}
+    )
+    async for partition in records.partitions():
+        yield [record.to_dict() for record in partition]
+
+
+async def _stream_records(statement: Select, export: str = "json") -> AsyncIterator[list[dict]]:
+    """
+    Stream the records of a select (see _export_statement) in chunks on a
+    session owned by the iterator. The session outlives the request handler
+    and is closed once streaming ends. Rows are counted under the export label.
+    """
+    rows = EXPORT_ROWS.labels(export)
+    async with AsyncSessionLocal() as db:
+        async for chunk in _stream_chunks(db, statement):
+            rows.inc(len(chunk))
+            yield chunk
+
+
+def _to_record_batch(rows) -> "pa.RecordBatch":
+    """
+    Transpose rows of WEATHER_FIELDS columns into a typed record batch.
+    """
+    import pyarrow as pa
+
+    schema = _arrow_schema()
+    return pa.record_batch(
+        [pa.array(values, type=field.type) for field, values in zip(schema, zip(*rows))],
+        schema=schema,
+    )
+
+
+async def _stream_record_batches(
+    statement: Select, export: str = "parquet"
+) -> AsyncIterator["pa.RecordBatch"]:
+    """
+    Stream the records of a select (see _export_statement) as typed Arrow
+    record batches.
+
+    Columns are selected directly (no ORM objects) from a server-side cursor,
+    each cursor chunk is transposed into one record batch in a worker thread.
+    """
+    columns = [getattr(Weather, name) for name in WEATHER_FIELDS]
+    statement = statement.with_only_columns(*columns)
+    exported = EXPORT_ROWS.labels(export)
+    async with AsyncSessionLocal() as db:
+        rows = await db.stream(
+            statement, execution_options={"yield_per": COLUMNAR_CHUNK_SIZE}
+        )
+        async for partition in rows.partitions():
+            exported.inc(len(partition))
+            yield await run_in_threadpool(_to_record_batch, partition)
+
+
+class _ChunkSink:
+    """
+    Write-only file object collecting the bytes written by an Arrow writer
+    so they can be drained into a streamed response after every batch.
+    """
+
+    def __init__(self) -> None:
+        self._parts: list[bytes] = []
+        self.closed = False
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+async def _columnar_stream(
+    batches: AsyncIterator["pa.RecordBatch"], open_writer
+) -> AsyncIterator[bytes]:
+    """
+    Feed record batches to an Arrow writer and yield its output as it is produced.
+    Encoding and compression run in a worker thread.
+
+    Args:
+        batches: Record batches to write.
+        open_writer: Callable taking a pyarrow file and returning a writer with
+            write_batch and close methods.
+    """
+    import pyarrow as pa
+
+    sink = _ChunkSink()
+    writer = open_writer(pa.PythonFile(sink, mode="w"))
+    async for batch in batches:
+        await run_in_threadpool(writer.write_batch, batch)
+        data = sink.drain()
+        if data:
+            yield data
+    await run_in_threadpool(writer.close)
+    yield sink.drain()
+
+
+async def _metered(
+    body: AsyncIterator[str | bytes], export: str
+) -> AsyncIterator[bytes]:
     """
-    query = db.query(Weather).join(Location)
+    Encode a streamed response body and count the bytes sent under the export label.
+    """
+    sent = EXPORT_BYTES.labels(export)
+    async for part in body:
+        data = part.encode() if isinstance(part, str) else part
+        sent.inc(len(data))
+        yield data
 
-    # Only get records from the exact user
-    if user:
-        query = query.filter(Weather.triggered_user.ilike(f"%{user}%"))
 
-    if location:
-        query = query.filter(Location.name.ilike(f"%{location}%"))
+def _attachment(prefix: str, extension: str) -> dict:
+    """
+    Build the Content-Disposition header for a timestamped export file.
+    """
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return {"Content-Disposition": f"attachment; filename={prefix}_{timestamp}.{extension}"}
 
-    if start_date:
-        query = query.filter(Weather.date >= start_date)
 
-    if end_date:
-        query = query.filter(Weather.date <= end_date)
+async def _json_stream(
+    chunks: AsyncIterator[list[dict]], metadata: dict
+) -> AsyncIterator[str]:
+    """
+    Serialize record chunks as {"data": [...], "metadata": {...}}.
 
-    if user:
-        query = query.filter(Weather.triggered_user.ilike(f"%{user}%"))
+    The metadata object comes last because the record count is only known
+    once the cursor is exhausted.
+    """
+    count = 0
+    yield '{"data": ['
+    async for chunk in chunks:
+        body = ",\n".join(json.dumps(record) for record in chunk)
+        yield ("\n" if count == 0 else ",\n") + body
+        count += len(chunk)
+    metadata["record_count"] = count
+    yield f'\n], "metadata": {json.dumps(metadata)}}}\n'
 
-    weather_records = query.order_by(Weather.date.desc()).all()
 
-    return [record.to_dict() for record in weather_records]
+def _xml_element(tag: str, value) -> str:
+    return f"<{tag}>{escape(str(value)) if value is not None else ''}</{tag}>"
 
 
 @router.get("/json")
 async def export_json(
-    db: Session = Depends(get_db),
     location: Optional[str] = Query(None, description="Filter by location name"),
     start_date: Optional[str] = Query(
         None, description="Start date filter (YYYY-MM-DD)"
@@ -77,21 +288,18 @@ async def export_json(
     Export all data as JSON format.
 
     Args:
-        db: Database session
         location: Optional location name filter
         start_date: Optional start date filter
         end_date: Optional end date filter
 
     Returns:
-        JSON response with weather and location data
+        Streamed JSON response with weather and location data
     """
+    statement = _export_statement(location, start_date, end_date)
     try:
-        data = _get_all_data(db, location, start_date, end_date)
-
         export_metadata = {
             "export_timestamp": datetime.utcnow().isoformat(),
             "export_format": "JSON",
-            "record_count": len(data),
             "filters_applied": {
                 "location": location,
                 "start_date": start_date,
@@ -99,14 +307,16 @@ async def export_json(
             },
         }
 
-        response_data = {"metadata": export_metadata, "data": data}
-
-        return Response(
-            content=json.dumps(response_data, indent=2),
+        return StreamingResponse(
+            _metered(
+                _json_stream(
+                    _stream_records(statement, export="json"),
+                    export_metadata,
+                ),
+                "json",
+            ),
             media_type="application/json",
-            headers={
-                "Content-Disposition": f"attachment; filename=weather_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-            },
+            headers=_attachment("weather_export", "json"),
         )
 
     except Exception as e:
@@ -115,7 +325,6 @@ async def export_json(
 
 @router.get("/xml")
 async def export_xml(
-    db: Session = Depends(get_db),
     location: Optional[str] = Query(None, description="Filter by location name"),
     start_date: Optional[str] = Query(
         None, description="Start date filter (YYYY-MM-DD)"
@@ -126,50 +335,45 @@ async def export_xml(
     Export all data as XML format.
 
     Args:
-        db: Database session
         location: Optional location name filter
         start_date: Optional start date filter
         end_date: Optional end date filter
 
     Returns:
-        XML response with weather and location data
+        Streamed XML response with weather and location data
     """
-    try:
-        data = _get_all_data(db, location, start_date, end_date)
-
-        # Create XML structure
-        root = ET.Element("weather_export")
-
-        # Add metadata
-        metadata = ET.SubElement(root, "metadata")
-        ET.SubElement(metadata, "export_timestamp").text = datetime.utcnow().isoformat()
-        ET.SubElement(metadata, "export_format").text = "XML"
-        ET.SubElement(metadata, "record_count").text = str(len(data))
-
-        filters = ET.SubElement(metadata, "filters_applied")
-        ET.SubElement(filters, "location").text = location or ""
-        ET.SubElement(filters, "start_date").text = start_date or ""
-        ET.SubElement(filters, "end_date").text = end_date or ""
-
-        # Add data
-        data_element = ET.SubElement(root, "data")
-
-        for record in data:
-            record_element = ET.SubElement(data_element, "weather_record")
-
-            for key, value in record.items():
-                element = ET.SubElement(record_element, key)
-                element.text = str(value) if value is not None else ""
-
-        # Convert to string
-        xml_str = ET.tostring(root, encoding="unicode", method="xml")
+    statement = _export_statement(location, start_date, end_date)
+
+    async def generate() -> AsyncIterator[str]:
+        count = 0
+        yield '<?xml version="1.0" encoding="utf-8"?>\n<weather_export><data>'
+        async for chunk in _stream_records(statement, export="xml"):
+            yield "".join(
+                "<weather_record>"
+                + "".join(_xml_element(key, value) for key, value in record.items())
+                + "</weather_record>"
+                for record in chunk
+            )
+            count += len(chunk)
+
+        # Metadata goes last, the record count is only known at the end
+        yield (
+            "</data><metadata>"
+            + _xml_element("export_timestamp", datetime.utcnow().isoformat())
+            + _xml_element("export_format", "XML")
+            + _xml_element("record_count", count)
+            + "<filters_applied>"
+            + _xml_element("location", location or "")
+            + _xml_element("start_date", start_date or "")
+            + _xml_element("end_date", end_date or "")
+            + "</filters_applied></metadata></weather_export>\n"
+        )
 
-        return Response(
-            content=xml_str,
+    try:
+        return StreamingResponse(
+            _metered(generate(), "xml"),
             media_type="application/xml",
-            headers={
-                "Content-Disposition": f"attachment; filename=weather_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xml"
-            },
+            headers=_attachment("weather_export", "xml"),
         )
 
     except Exception as e:
@@ -178,7 +382,7 @@ async def export_xml(
 
 @router.get("/csv")
 async def export_csv(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     location: Optional[str] = Query(None, description="Filter by location name"),
     start_date: Optional[str] = Query(
         None, description="Start date filter (YYYY-MM-DD)"
@@ -189,50 +393,149 @@ async def export_csv(
     Export all data as CSV format.
 
     Args:
-        db: Database session
+        db: Async database session
         location: Optional location name filter
         start_date: Optional start date filter
         end_date: Optional end date filter
 
     Returns:
-        CSV response with weather and location data
+        Streamed CSV response with weather and location data
     """
-    try:
-        data = _get_all_data(db, location, start_date, end_date)
+    statement = _export_statement(location, start_date, end_date)
 
-        if not data:
-            return {"error": 404, "detail": "No data found with the specified filters"}
-
-        # Create CSV content
+    async def generate() -> AsyncIterator[str]:
+        count = 0
         output = StringIO()
+        writer = csv.DictWriter(output, fieldnames=WEATHER_FIELDS)
 
         # Write metadata as comments
-        output.write(f"# Weather Data Export\n")
+        output.write("# Weather Data Export\n")
         output.write(f"# Export Timestamp: {datetime.now().isoformat()}\n")
-        output.write(f"# Export Format: CSV\n")
-        output.write(f"# Record Count: {len(data)}\n")
+        output.write("# Export Format: CSV\n")
         output.write(
             f"# Filters Applied - Location: {location or 'None'}, Start Date: {start_date or 'None'}, End Date: {end_date or 'None'}\n"
         )
-        output.write(f"#\n")
-
-        # Write CSV data
-        fieldnames = data[0].keys()
-        writer = csv.DictWriter(output, fieldnames=fieldnames)
+        output.write("#\n")
         writer.writeheader()
-        writer.writerows(data)
 
-        csv_content = output.getvalue()
+        async for chunk in _stream_records(statement, export="csv"):
+            writer.writerows(chunk)
+            count += len(chunk)
+            yield output.getvalue()
+            output.seek(0)
+            output.truncate(0)
+
+        # The record count is only known once the cursor is exhausted
+        output.write(f"# Record Count: {count}\n")
+        yield output.getvalue()
         output.close()
 
-        return Response(
-            content=csv_content,
+    try:
+        has_data = await db.scalar(select(statement.exists()))
+        if not has_data:
+            return {"error": 404, "detail": "No data found with the specified filters"}
+
+        return StreamingResponse(
+            _metered(generate(), "csv"),
             media_type="text/csv",
-            headers={
-                "Content-Disposition": \
-                f"attachment; \
-                filename=weather_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-            },
+            headers=_attachment("weather_export", "csv"),
+        )
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Export failed: {str(e)}")
+
+
+@router.get("/parquet")
+async def export_parquet(
+    location: Optional[str] = Query(None, description="Filter by location name"),
+    start_date: Optional[str] = Query(
+        None, description="Start date filter (YYYY-MM-DD)"
+    ),
+    end_date: Optional[str] = Query(None, description="End date filter (YYYY-MM-DD)"),
+    user: Optional[str] = Query(None, description="Filter by user name"),
+    compression: Literal["none", "snappy", "zstd", "gzip", "lz4", "brotli"] = Query(
+        "zstd", description="Parquet compression codec"
+    ),
+):
+    """
+    Export weather data as a Parquet file with typed columns.
+
+    Args:
+        location: Optional location name filter
+        start_date: Optional start date filter
+        end_date: Optional end date filter
+        user: Optional user name filter
+        compression: Compression codec
+
+    Returns:
+        Streamed Parquet file, one row group per cursor chunk
+    """
+    import pyarrow.parquet as pq
+
+    statement = _export_statement(location, start_date, end_date, user)
+    try:
+        return StreamingResponse(
+            _metered(
+                _columnar_stream(
+                    _stream_record_batches(statement, export="parquet"),
+                    lambda sink: pq.ParquetWriter(
+                        sink, _arrow_schema(), compression=compression
+                    ),
+                ),
+                "parquet",
+            ),
+            media_type="application/vnd.apache.parquet",
+            headers=_attachment("weather_export", "parquet"),
+        )
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Export failed: {str(e)}")
+
+
+@router.get("/arrow")
+async def export_arrow(
+    location: Optional[str] = Query(None, description="Filter by location name"),
+    start_date: Optional[str] = Query(
+        None, description="Start date filter (YYYY-MM-DD)"
+    ),
+    end_date: Optional[str] = Query(None, description="End date filter (YYYY-MM-DD)"),
+    user: Optional[str] = Query(None, description="Filter by user name"),
+    compression: Literal["none", "lz4", "zstd"] = Query(
+        "none", description="Arrow IPC buffer compression codec"
+    ),
+):
+    """
+    Export weather data as an Arrow IPC stream with typed columns.
+
+    Args:
+        location: Optional location name filter
+        start_date: Optional start date filter
+        end_date: Optional end date filter
+        user: Optional user name filter
+        compression: Compression codec
+
+    Returns:
+        Streamed Arrow IPC stream, one record batch per cursor chunk
+    """
+    import pyarrow as pa
+
+    options = pa.ipc.IpcWriteOptions(
+        compression=None if compression == "none" else compression
+    )
+    statement = _export_statement(location, start_date, end_date, user)
+    try:
+        return StreamingResponse(
+            _metered(
+                _columnar_stream(
+                    _stream_record_batches(statement, export="arrow"),
+                    lambda sink: pa.ipc.new_stream(
+                        sink, _arrow_schema(), options=options
+                    ),
+                ),
+                "arrow",
+            ),
+            media_type="application/vnd.apache.arrow.stream",
+            headers=_attachment("weather_export", "arrows"),
         )
 
     except Exception as e:
@@ -240,32 +543,35 @@ async def export_csv(
 
 
 @router.get("/locations/json")
-async def export_locations_json(db: Session = Depends(get_db)):
+async def export_locations_json():
     """
     Export all locations as JSON format.
 
     Returns:
-        JSON response with location data
+        Streamed JSON response with location data
     """
-    try:
-        locations = db.query(Location).order_by(Location.name).all()
-        data = [location.to_dict() for location in locations]
 
+    async def chunks() -> AsyncIterator[list[dict]]:
+        async with AsyncSessionLocal() as db:
+            locations = await db.stream_scalars(
+                select(Location).order_by(Location.name),
+                execution_options={"yield_per": STREAM_CHUNK_SIZE},
+            )
+            async for partition in locations.partitions():
+                EXPORT_ROWS.labels("locations_json").inc(len(partition))
+                yield [location.to_dict() for location in partition]
+
+    try:
         export_metadata = {
             "export_timestamp": datetime.utcnow().isoformat(),
             "export_format": "JSON",
-            "record_count": len(data),
             "data_type": "locations_only",
         }
 
-        response_data = {"metadata": export_metadata, "data": data}
-
-        return Response(
-            content=json.dumps(response_data, indent=2),
+        return StreamingResponse(
+            _metered(_json_stream(chunks(), export_metadata), "locations_json"),
             media_type="application/json",
-            headers={
-                "Content-Disposition": f"attachment; filename=locations_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-            },
+            headers=_attachment("locations_export", "json"),
         )
 
     except Exception as e:
@@ -274,7 +580,6 @@ async def export_locations_json(db: Session = Depends(get_db)):
 
 @router.get("/weather/json")
 async def export_weather_json(
-    db: Session = Depends(get_db),
     location: Optional[str] = Query(None, description="Filter by location name"),
     start_date: Optional[str] = Query(
         None, description="Start date filter (YYYY-MM-DD)"
@@ -285,28 +590,13 @@ async def export_weather_json(
     Export weather data only as JSON format.
 
     Returns:
-        JSON response with weather data only
+        Streamed JSON response with weather data only
     """
+    statement = _export_statement(location, start_date, end_date)
     try:
-        query = db.query(Weather)
-
-        # Apply filters
-        if location:
-            query = query.join(Location).filter(Location.name.ilike(f"%{location}%"))
-
-        if start_date:
-            query = query.filter(Weather.date >= start_date)
-
-        if end_date:
-            query = query.filter(Weather.date <= end_date)
-
-        weather_records = query.order_by(Weather.date.desc()).all()
-        data = [record.to_dict() for record in weather_records]
-
         export_metadata = {
             "export_timestamp": datetime.utcnow().isoformat(),
             "export_format": "JSON",
-            "record_count": len(data),
             "data_type": "weather_only",
             "filters_applied": {
                 "location": location,
@@ -315,16 +605,16 @@ async def export_weather_json(
             },
         }
 
-        response_data = {"metadata": export_metadata, "data": data}
-
-        return Response(
-            content=json.dumps(response_data, indent=2),
+        return StreamingResponse(
+            _metered(
+                _json_stream(
+                    _stream_records(statement, export="weather_json"),
+                    export_metadata,
+                ),
+                "weather_json",
+            ),
             media_type="application/json",
-            headers={
-                "Content-Disposition": \
-                f"attachment; \
-                filename=weather_only_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-            },
+            headers=_attachment("weather_only_export", "json"),
         )
 
     except HTTPException as e:
@@ -2,9 +2,17 @@
 # routers/location_router.py
 # This module defines the API endpoints for location-related services.
 """
-from fastapi import APIRouter, HTTPException
-from controller.location_controller import get_geodata, get_geodata_by_id
-from schema.location import LocationData
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query
+from controller.location_controller import (
+    get_geodata,
+    get_geodata_by_id,
+    reverse_geodata,
+    suggest_geodata,
+)
+from gazetteer.suggest import TOP_K
+from schema.location import LocationData, LocationSuggestion, NearestLocation
 
 router = APIRouter(prefix="/geodata")
 
@@ -20,10 +28,52 @@ async def read_geodata_endpoint(name: str):
         LocationData: The geodata for the specified location.
     """
     try:
-        return get_geodata(name)
+        return await get_geodata(name)
     except HTTPException as e:
         return {"error": 404, "detail": str(e)}
 
+@router.get("/suggest", response_model=list[LocationSuggestion])
+async def suggest_geodata_endpoint(
+    q: str = Query(..., min_length=1, max_length=100, description="Start of a location name"),
+    limit: int = Query(TOP_K, ge=1, le=TOP_K, description="Number of suggestions"),
+):
+    """
+    Endpoint to autocomplete a location name, served from memory without a
+    database query or a geocoding call.
+
+    Args:
+        q: The name typed so far, accents and case are ignored.
+        limit: The number of suggestions.
+
+    Returns:
+        list[LocationSuggestion]: Known locations starting with q, most looked up first.
+    """
+    return suggest_geodata(q, limit)
+
+@router.get("/reverse", response_model=NearestLocation)
+async def reverse_geodata_endpoint(
+    lat: float = Query(..., ge=-90, le=90, description="Latitude in degrees"),
+    long: float = Query(..., ge=-180, le=180, description="Longitude in degrees"),
+    max_distance: Optional[float] = Query(
+        None, gt=0, description="Maximum distance in kilometers"
+    ),
+):
+    """
+    Endpoint to find the known location nearest to the given coordinates.
+
+    Args:
+        lat: Latitude of the point.
+        long: Longitude of the point.
+        max_distance: Ignore locations further than this many kilometers.
+
+    Returns:
+        NearestLocation: The nearest location and its distance.
+    """
+    result = reverse_geodata(lat, long, max_distance)
+    if not result:
+        raise HTTPException(status_code=404, detail="No known location in range")
+    return result
+
 @router.get("/{loc_id}", response_model=LocationData)
 async def read_geodata_by_id_endpoint(loc_id: int):
     """
@@ -36,6 +86,6 @@ async def read_geodata_by_id_endpoint(loc_id: int):
         LocationData: The geodata for the specified location.
     """
     try:
-        return get_geodata_by_id(loc_id)
+        return await get_geodata_by_id(loc_id)
     except HTTPException as e:
         return {"error": 404, "detail": str(e)}
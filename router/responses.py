@@ -0,0 +1,23 @@
+"""
+# router/responses.py
+# This module defines response classes shared by the routers.
+"""
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+
+from metrics import stage
+
+
+class NumpyJSONResponse(JSONResponse):
+    """
+    JSON response serialized with orjson, NumPy arrays are written directly
+    from their buffers instead of being converted to Python lists first.
+    """
+
+    def render(self, content: Any) -> bytes:
+        with stage("render_numpy_json"):
+            return orjson.dumps(
+                content, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+            )
@@ -0,0 +1,48 @@
+"""
+# router/stats_router.py
+# This module defines the API endpoint for weather statistics per location,
+# served from the monthly rollup instead of exporting the records.
+"""
+
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from model.db import get_async_db
+from model.weather_stats import Period, WeatherMonthly
+from schema.weather import WeatherStats
+
+router = APIRouter(prefix="/stats")
+
+
+@router.get("", response_model=list[WeatherStats])
+async def get_stats(
+    location: Optional[str] = Query(None, description="Filter by location name"),
+    start_date: Optional[str] = Query(
+        None, description="Start date filter (YYYY-MM-DD)"
+    ),
+    end_date: Optional[str] = Query(None, description="End date filter (YYYY-MM-DD)"),
+    user: Optional[str] = Query(None, description="Filter by user name"),
+    period: Period = Query("month", description="Period of each row, all for the whole window"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Mean, lowest and highest temperature and humidity per location and period.
+
+    Args:
+        location: Optional location name filter
+        start_date: Optional start date filter
+        end_date: Optional end date filter
+        user: Optional user name filter
+        period: day, month, year or all
+
+    Returns:
+        List of statistics by location, then period
+    """
+    try:
+        return await WeatherMonthly.stats_async(
+            db, location, start_date, end_date, user, period
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid filter: {e}")
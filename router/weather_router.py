@@ -3,115 +3,503 @@
 # This module defines the API endpoints for weather data services.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+import base64
+import json
+from datetime import date
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from controller.weather_controller import (
     get_current_weather,
+    get_current_weather_batch,
     get_daily_forecast,
+    get_daily_forecast_batch,
     get_hourly_forecast,
+    get_hourly_forecast_batch,
+    get_weather_overview,
+    get_weather_overview_batch,
+)
+from controller.location_controller import get_geodata, resolve_locations
+from controller.prefetch import track_location
+from controller.weather.variables import (
+    DEFAULT_FORECAST_DAYS,
+    MAX_FORECAST_DAYS,
+    check_forecast_days,
+    get_plan,
+)
+from controller.weather.daily import daily_window
+from controller.ingest_controller import (
+    MAX_JSON_ARRAY_BYTES,
+    BodyTooLargeError,
+    create_record,
+    ingest_chunk,
+    iter_json_chunks,
+    validated_chunks,
+)
+from schema.weather import (
+    BatchRequest,
+    UserWeatherHistory,
+    UserWeatherRecord,
+    WeatherData,
+    WeatherPage,
+    WeatherRecord,
 )
-from controller.location_controller import get_geodata
-from schema.weather import WeatherData
 from model.weather import Weather
-from model.db import get_db
-from utils import fprint, random_user_string
+from model.db import get_async_db
+from router.responses import NumpyJSONResponse
+from logger import get_logger
+from utils import random_user_string
+
+logger = get_logger(__name__)
 
 router = APIRouter(prefix="/weather")
 
 
+VARIABLES_QUERY = Query(
+    None,
+    description="Comma-separated upstream variable names, the defaults when omitted",
+)
+FORECAST_DAYS_QUERY = Query(
+    DEFAULT_FORECAST_DAYS,
+    ge=1,
+    le=MAX_FORECAST_DAYS,
+    description="Forecast horizon in days",
+)
+
+
+def _check_selection(kind: str, variables, forecast_days: Optional[int] = None) -> None:
+    """
+    Reject unknown variables and out of range horizons before any upstream call.
+    """
+    try:
+        get_plan(kind, variables)
+        if forecast_days is not None:
+            check_forecast_days(forecast_days)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+
+
+def _check_window(start_date: Optional[str], end_date: Optional[str]) -> None:
+    """
+    Reject malformed or unavailable daily windows before any upstream call.
+    """
+    try:
+        daily_window(start_date, end_date)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+
+
 # READ-ONLY ENDPOINTS
 @router.get("/current")
-async def current_weather_endpoint(name: str):
+async def current_weather_endpoint(name: str, variables: Optional[str] = VARIABLES_QUERY):
     """
     Endpoint to fetch current weather for a given location name.
 
     Args:
         name: The name of the city or location.
+        variables: Comma-separated current variables.
 
     Returns:
         WeatherData: The current weather data.
     """
+    _check_selection("current", variables)
     try:
-        location = get_geodata(name)
+        location = await get_geodata(name)
         if not location:
             return {"error": 404, "detail": "Location not found"}
+        track_location(location)
 
-        res = get_current_weather(location["lat"], location["long"])
-        res["latitude"] = location["lat"]
-        res["longitude"] = location["long"]
-        return res
+        res = await get_current_weather(location["lat"], location["long"], variables)
+        # The result may be shared with coalesced callers, so don't mutate it
+        return {**res, "latitude": location["lat"], "longitude": location["long"]}
     except HTTPException as e:
         return {"error": 400, "detail": str(e)}
 
 
+# Response layouts of the forecast endpoints: per-step lists of values and
+# ISO timestamps, or columnar arrays with an epoch start + interval time axis
+ForecastFormat = Literal["json", "columnar"]
+FORMAT_QUERY = Query(
+    "json",
+    alias="format",
+    description="json: lists with one timestamp per step; "
+    "columnar: value arrays with an epoch start/end/interval time axis",
+)
+
+
+def _forecast_response(result, response_format: ForecastFormat):
+    """
+    Serialize columnar results straight from their NumPy arrays.
+    """
+    return NumpyJSONResponse(result) if response_format == "columnar" else result
+
+
 @router.get("/daily")
-async def daily_forecast_endpoint(name: str):
+async def daily_forecast_endpoint(
+    name: str,
+    response_format: ForecastFormat = FORMAT_QUERY,
+    variables: Optional[str] = VARIABLES_QUERY,
+    start_date: Optional[str] = Query(
+        None, description="First day (YYYY-MM-DD), today by default"
+    ),
+    end_date: Optional[str] = Query(
+        None, description="Last day (YYYY-MM-DD), a week after start_date by default"
+    ),
+):
     """
     Endpoint to fetch daily weather forecast for a given location name.
 
     Args:
         name: The name of the city or location.
+        response_format: json (default) or columnar.
+        variables: Comma-separated daily variables.
+        start_date: First day of the window.
+        end_date: Last day of the window, included.
 
     Returns:
         list[WeatherData]: A list of daily weather forecasts.
     """
+    _check_selection("daily", variables)
+    _check_window(start_date, end_date)
     try:
-        location = get_geodata(name)
+        location = await get_geodata(name)
         if not location:
             return {"error": 404, "detail": "Location not found"}
-        return get_daily_forecast(location["lat"], location["long"])
+        track_location(location)
+        columnar = response_format == "columnar"
+        forecast = await get_daily_forecast(
+            location["lat"],
+            location["long"],
+            start_date,
+            end_date,
+            columnar=columnar,
+            variables=variables,
+        )
+        return _forecast_response(forecast, response_format)
+    except ValueError as e:
+        # No forecast upstream for the window
+        raise HTTPException(status_code=404, detail=str(e)) from e
     except HTTPException as e:
         return {"error": 400, "detail": str(e)}
 
 
 @router.get("/hourly")
-async def hourly_forecast_endpoint(name: str):
+async def hourly_forecast_endpoint(
+    name: str,
+    response_format: ForecastFormat = FORMAT_QUERY,
+    variables: Optional[str] = VARIABLES_QUERY,
+    days: int = FORECAST_DAYS_QUERY,
+):
     """
     Endpoint to fetch hourly weather forecast for a given location name.
 
     Args:
         name: The name of the city or location.
+        response_format: json (default) or columnar.
+        variables: Comma-separated hourly variables, e.g.
+            temperature_2m,wind_speed_10m,precipitation,relative_humidity_2m.
+        days: Forecast horizon, 1 to 16 days.
 
     Returns:
         list[WeatherData]: A list of hourly weather forecasts.
     """
+    _check_selection("hourly", variables)
     try:
-        location = get_geodata(name)
+        location = await get_geodata(name)
         if not location:
             return {"error": 404, "detail": "Location not found"}
-        return get_hourly_forecast(location["lat"], location["long"])
+        track_location(location)
+        columnar = response_format == "columnar"
+        forecast = await get_hourly_forecast(
+            location["lat"],
+            location["long"],
+            columnar=columnar,
+            variables=variables,
+            forecast_days=days,
+        )
+        return _forecast_response(forecast, response_format)
+    except HTTPException as e:
+        return {"error": 400, "detail": str(e)}
+
+@router.get("/overview")
+async def weather_overview_endpoint(
+    name: str,
+    response_format: ForecastFormat = FORMAT_QUERY,
+    days: int = FORECAST_DAYS_QUERY,
+):
+    """
+    Endpoint to fetch current weather, daily and hourly forecasts for a
+    given location name, with one geocode lookup and one upstream call.
+
+    Args:
+        name: The name of the city or location.
+        response_format: json (default) or columnar, for the daily and hourly sections.
+        days: Hourly forecast horizon, 1 to 16 days. The daily section covers
+            at least the default /weather/daily window (8 days).
+
+    Returns:
+        dict: The location and its current, daily and hourly sections.
+    """
+    try:
+        location = await get_geodata(name)
+        if not location:
+            return {"error": 404, "detail": "Location not found"}
+        track_location(location)
+        overview = await get_weather_overview(
+            location["lat"],
+            location["long"],
+            columnar=response_format == "columnar",
+            forecast_days=days,
+        )
+        return _forecast_response({"location": location, **overview}, response_format)
+    except HTTPException as e:
+        return {"error": 400, "detail": str(e)}
+
+async def _batch_forecast(request: BatchRequest, fetch_many) -> dict:
+    """
+    Resolve the requested locations and fetch their forecasts with fetch_many.
+
+    Each distinct location is requested once upstream, results are keyed by
+    the requested name or ID. A location whose forecast failed (fetch_many
+    returned an exception for it) is listed under errors, the others are
+    still returned.
+    """
+    locations, not_found = await resolve_locations(request.names, request.ids)
+    unique = {location["id"]: location for location in locations.values()}
+    for location in unique.values():
+        track_location(location)
+    coordinates = [(location["lat"], location["long"]) for location in unique.values()]
+    forecasts = dict(zip(unique, await fetch_many(coordinates))) if coordinates else {}
+    results, errors = {}, {}
+    for key, location in locations.items():
+        forecast = forecasts[location["id"]]
+        if isinstance(forecast, Exception):
+            errors[key] = str(forecast)
+        else:
+            results[key] = {"location": location, "forecast": forecast}
+    return {"results": results, "not_found": not_found, "errors": errors}
+
+
+@router.post("/batch/current")
+async def batch_current_weather_endpoint(request: BatchRequest):
+    """
+    Endpoint to fetch current weather for many locations at once.
+
+    Args:
+        request: Location names and/or IDs, optional variables.
+
+    Returns:
+        dict: Forecasts keyed by requested location, and the unresolved keys.
+    """
+    _check_selection("current", request.variables)
+    try:
+        return await _batch_forecast(
+            request,
+            lambda coordinates: get_current_weather_batch(coordinates, request.variables),
+        )
+    except HTTPException as e:
+        return {"error": 400, "detail": str(e)}
+
+
+@router.post("/batch/daily")
+async def batch_daily_forecast_endpoint(
+    request: BatchRequest, response_format: ForecastFormat = FORMAT_QUERY
+):
+    """
+    Endpoint to fetch daily weather forecasts for many locations at once.
+
+    Args:
+        request: Location names and/or IDs, optional start and end dates and variables.
+        response_format: json (default) or columnar.
+
+    Returns:
+        dict: Forecasts keyed by requested location, the unresolved keys, and
+        the reasons of the locations without a forecast in the window.
+    """
+    options = {
+        key: value
+        for key, value in (("start_date", request.start_date), ("end_date", request.end_date))
+        if value
+    }
+    options["columnar"] = response_format == "columnar"
+    options["variables"] = request.variables
+    _check_selection("daily", request.variables)
+    _check_window(request.start_date, request.end_date)
+    try:
+        result = await _batch_forecast(
+            request, lambda coordinates: get_daily_forecast_batch(coordinates, **options)
+        )
+        return _forecast_response(result, response_format)
+    except HTTPException as e:
+        return {"error": 400, "detail": str(e)}
+
+
+@router.post("/batch/hourly")
+async def batch_hourly_forecast_endpoint(
+    request: BatchRequest, response_format: ForecastFormat = FORMAT_QUERY
+):
+    """
+    Endpoint to fetch hourly weather forecasts for many locations at once.
+
+    Args:
+        request: Location names and/or IDs, optional variables and horizon.
+        response_format: json (default) or columnar.
+
+    Returns:
+        dict: Forecasts keyed by requested location, and the unresolved keys.
+    """
+    forecast_days = request.forecast_days or DEFAULT_FORECAST_DAYS
+    _check_selection("hourly", request.variables, forecast_days)
+    columnar = response_format == "columnar"
+    try:
+        result = await _batch_forecast(
+            request,
+            lambda coordinates: get_hourly_forecast_batch(
+                coordinates, columnar, request.variables, forecast_days
+            ),
+        )
+        return _forecast_response(result, response_format)
     except HTTPException as e:
         return {"error": 400, "detail": str(e)}
 
-@router.get("/user")
+
+@router.post("/batch/overview")
+async def batch_weather_overview_endpoint(
+    request: BatchRequest, response_format: ForecastFormat = FORMAT_QUERY
+):
+    """
+    Endpoint to fetch current weather, daily and hourly forecasts for many
+    locations at once, one upstream location per distinct place.
+
+    Args:
+        request: Location names and/or IDs, optional horizon.
+        response_format: json (default) or columnar.
+
+    Returns:
+        dict: Overviews keyed by requested location, and the unresolved keys.
+    """
+    forecast_days = request.forecast_days or DEFAULT_FORECAST_DAYS
+    _check_selection("current", None, forecast_days)
+    columnar = response_format == "columnar"
+    try:
+        result = await _batch_forecast(
+            request,
+            lambda coordinates: get_weather_overview_batch(
+                coordinates, columnar, forecast_days
+            ),
+        )
+        return _forecast_response(result, response_format)
+    except HTTPException as e:
+        return {"error": 400, "detail": str(e)}
+
+
+@router.get("/user", response_model=list[UserWeatherRecord] | UserWeatherHistory)
 async def get_user_weather_records(
     user: str = Query(None, description="Filter by user name"),
-    db: Session = Depends(get_db)
+    locations: Literal["inline", "table"] = Query(
+        "inline",
+        description="inline: each record embeds its location; "
+        "table: records and a side table of their distinct locations by ID",
+    ),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
-    Endpoint to get weather records filtered by user name.
+    Endpoint to get weather records filtered by user name, with the location
+    of every record, so the history needs no per-record location lookups.
 
     Args:
         user: The name of the user to filter records by.
+        locations: Layout of the locations, inline (default) or table.
         db: The database session dependency.
 
     Returns:
-        list[WeatherData]: A list of weather records for the specified user.
+        list[UserWeatherRecord] | UserWeatherHistory: The weather records of
+            the user with their locations.
     """
     if not user:
         raise HTTPException(status_code=400, detail="User name is required")
 
-    records = db.query(Weather).filter(Weather.triggered_user == user).all()
+    if locations == "table":
+        records = await Weather.get_by_user_async(db, user)
+        if not records:
+            raise HTTPException(status_code=404, detail="No records found for this user")
+        return UserWeatherHistory(
+            records=records,
+            locations={
+                location.id: location
+                for location in await Weather.get_user_locations_async(db, user)
+            },
+        )
+
+    records = await Weather.get_by_user_with_location_async(db, user)
     if not records:
         raise HTTPException(status_code=404, detail="No records found for this user")
+    return records
+
+def _encode_cursor(record: Weather) -> str:
+    """
+    Encode the keyset position after record as an opaque token.
+    """
+    position = json.dumps([record.date.isoformat(), record.id])
+    return base64.urlsafe_b64encode(position.encode()).decode()
+
 
-    return [record for record in records]
+def _decode_cursor(cursor: str) -> tuple:
+    """
+    Decode a token from _encode_cursor back into (date, id).
+    """
+    try:
+        day, record_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return date.fromisoformat(day), int(record_id)
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=400, detail="Invalid cursor") from e
+
+
+@router.get("/records", response_model=WeatherPage)
+async def list_weather_records(
+    location: Optional[str] = Query(None, description="Filter by location name"),
+    start_date: Optional[str] = Query(None, description="Start date (YYYY-MM-DD)"),
+    end_date: Optional[str] = Query(None, description="End date (YYYY-MM-DD)"),
+    user: Optional[str] = Query(None, description="Filter by user name"),
+    limit: int = Query(50, ge=1, le=1000, description="Records per page"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Endpoint to page through stored weather records, newest first.
+
+    Filters match the export endpoints. Pass next_cursor from a response
+    as cursor to get the following page.
+
+    Args:
+        location: Filter by location name (partial match).
+        start_date: Filter by start date (YYYY-MM-DD).
+        end_date: Filter by end date (YYYY-MM-DD).
+        user: Filter by user name (partial match).
+        limit: Maximum number of records per page.
+        cursor: Continuation token from the previous page.
+        db: The database session dependency.
+
+    Returns:
+        WeatherPage: The records and the token for the next page.
+    """
+    after = _decode_cursor(cursor) if cursor else None
+    try:
+        statement = Weather.select_filtered(location, start_date, end_date, user)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid date: {e}") from e
+    # One extra row tells whether another page follows
+    records = await Weather.page_async(db, statement, limit + 1, after)
+    next_cursor = _encode_cursor(records[limit - 1]) if len(records) > limit else None
+    return WeatherPage(items=records[:limit], next_cursor=next_cursor)
 
 # CREATE ENDPOINT
 @router.post("/create")
 async def create_weather_record(
     weather: WeatherData,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
     ):
     """
     Endpoint to create a new current weather record in the database.
@@ -122,18 +510,75 @@ async def create_weather_record(
 
     Returns:
         WeatherData: The created weather record.
+
+    Raises:
+        HTTPException: 400 if the record is invalid, 409 if a record for
+        the same location and date exists.
     """
-    weather_data = Weather(**weather.model_dump())
     try:
-        created_record = weather_data.save(db)
-        return {"message": "Weather record created successfully",}
-    except HTTPException as e:
-        return {"error": 500, "detail": f"Database error: {str(e)}"}
+        # Same validation as the bulk endpoint, but a plain insert
+        await create_record(db, weather.model_dump())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    except IntegrityError as e:
+        raise HTTPException(
+            status_code=409,
+            detail=f"A weather record for location {weather.loc_id} on {weather.date[:10]} already exists",
+        ) from e
+    return {"message": "Weather record created successfully",}
+
+
+@router.post("/bulk")
+async def bulk_create_weather_records(request: Request, db: AsyncSession = Depends(get_async_db)):
+    """
+    Endpoint to load many weather records at once.
 
+    The body is either a JSON array or NDJSON (Content-Type
+    application/x-ndjson), each item a WeatherData object. Records are
+    validated and upserted on (loc_id, date) in chunks. JSON arrays larger
+    than MAX_JSON_ARRAY_BYTES are refused with 413, NDJSON is not limited.
 
+    Args:
+        request: The incoming request, its body is streamed.
+        db: The database session dependency.
 
-@router.get("/{weather_id}", response_model=WeatherData)
-async def get_weather_record(weather_id: int, db: Session = Depends(get_db)):
+    Returns:
+        dict: Per-chunk and total accepted/rejected counts.
+    """
+    content_type = request.headers.get("content-type", "")
+    ndjson = "ndjson" in content_type or "jsonl" in content_type
+    chunks = []
+    try:
+        if not ndjson and int(request.headers.get("content-length") or 0) > MAX_JSON_ARRAY_BYTES:
+            raise BodyTooLargeError()
+        body = iter_json_chunks(request.stream(), ndjson)
+        async for records, validation in validated_chunks(body):
+            try:
+                result = await ingest_chunk(db, records, await validation)
+            except Exception as e:
+                await db.rollback()
+                logger.error("Bulk chunk %d failed: %s", len(chunks), e)
+                result = {
+                    "accepted": 0,
+                    "rejected": len(records),
+                    "errors": [{"index": None, "error": f"Database error: {e}"}],
+                }
+            chunks.append({"chunk": len(chunks), **result})
+    except BodyTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid request body: {e}")
+
+    return {
+        "accepted": sum(chunk["accepted"] for chunk in chunks),
+        "rejected": sum(chunk["rejected"] for chunk in chunks),
+        "chunks": chunks,
+    }
+
+
+
+@router.get("/{weather_id}", response_model=WeatherRecord)
+async def get_weather_record(weather_id: int, db: AsyncSession = Depends(get_async_db)):
     """
     Endpoint to get a specific weather record from the database.
 
@@ -142,18 +587,18 @@ async def get_weather_record(weather_id: int, db: Session = Depends(get_db)):
         db: The database session dependency.
 
     Returns:
-        WeatherData: The requested weather record.
+        WeatherRecord: The requested weather record.
     """
-    existing_weather = db.query(Weather).filter(Weather.id == weather_id).first()
+    existing_weather = await Weather.get_by_id_async(db, weather_id)
     if not existing_weather:
         raise HTTPException(status_code=404, detail="Weather record not found")
 
-    return WeatherData.model_validate(existing_weather)
+    return WeatherRecord.model_validate(existing_weather)
 
 
-@router.put("/{weather_id}", response_model=WeatherData)
+@router.put("/{weather_id}", response_model=WeatherRecord)
 async def update_weather_record(
-    weather_id: int, weather: WeatherData, db: Session = Depends(get_db)
+    weather_id: int, weather: WeatherData, db: AsyncSession = Depends(get_async_db)
 ):
     """
     Endpoint to update an existing weather record.
@@ -164,21 +609,31 @@ async def update_weather_record(
         db: The database session dependency.
 
     Returns:
-        WeatherData: The updated weather record.
+        WeatherRecord: The updated weather record.
+
+    Raises:
+        HTTPException: 404 if the record does not exist, 409 if another
+        record has the new location and date.
     """
-    existing_weather = db.query(Weather).filter(Weather.id == weather_id).first()
+    existing_weather = await Weather.get_by_id_async(db, weather_id)
     if not existing_weather:
         raise HTTPException(status_code=404, detail="Weather record not found")
 
     try:
-        updated_record = existing_weather.update(db, **weather.model_dump())
-        return WeatherData.model_validate(updated_record)
+        updated_record = await existing_weather.update_async(db, **weather.model_dump())
+        return WeatherRecord.model_validate(updated_record)
+    except IntegrityError as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=409,
+            detail=f"A weather record for location {weather.loc_id} on {weather.date[:10]} already exists",
+        ) from e
     except HTTPException as e:
         return {"error": 500, "detail": f"Database error: {str(e)}"}
 
 
 @router.delete("/{weather_id}")
-async def delete_weather_record(weather_id: int, db: Session = Depends(get_db)):
+async def delete_weather_record(weather_id: int, db: AsyncSession = Depends(get_async_db)):
     """
     Endpoint to delete a weather record.
 
@@ -189,14 +644,12 @@ async def delete_weather_record(weather_id: int, db: Session = Depends(get_db)):
     Returns:
         dict: A success message.
     """
-    existing_weather = db.query(Weather).filter(Weather.id == weather_id).first()
+    existing_weather = await Weather.get_by_id_async(db, weather_id)
     if not existing_weather:
         return {"error": 404, "detail": "Weather record not found"}
 
     try:
-        db.delete(existing_weather)
-        db.commit()
-        return {"message": "Weather record deleted successfully"}
+        return await existing_weather.delete_async(db)
     except HTTPException as e:
-        db.rollback()
+        await db.rollback()
         return {"error": 500, "detail": f"Database error: {str(e)}"}
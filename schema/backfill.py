@@ -0,0 +1,65 @@
+"""
+# schema/backfill.py
+# This module defines the schema for historical weather backfill jobs.
+"""
+from datetime import date
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+
+class BackfillRequest(BaseModel):
+    """
+    Backfill job request, locations are given by name and/or ID.
+    """
+
+    names: list[str] = Field(
+        default_factory=list, max_length=1000, description="Location names"
+    )
+    ids: list[int] = Field(
+        default_factory=list, max_length=1000, description="Location IDs"
+    )
+    start_date: date = Field(..., description="First day to load")
+    end_date: date = Field(..., description="Last day to load")
+    chunk_days: Optional[int] = Field(
+        None, ge=1, le=3660, description="Days per chunk, the configured default when omitted"
+    )
+    workers: Optional[int] = Field(
+        None, ge=1, le=32, description="Requests in flight, the configured default when omitted"
+    )
+    triggered_user: Optional[str] = Field(
+        None, description="User stored on the loaded weather records"
+    )
+
+    model_config = {
+        "json_schema_extra": {
+            "example": {
+                "names": ["Berlin", "Paris"],
+                "start_date": "2020-01-01",
+                "end_date": "2024-12-31",
+            }
+        }
+    }
+
+
+class BackfillJobStatus(BaseModel):
+    """
+    Backfill job with the progress of its chunks.
+    """
+
+    id: int = Field(..., description="Job ID")
+    start_date: date = Field(..., description="First day of the job")
+    end_date: date = Field(..., description="Last day of the job")
+    chunk_days: int = Field(..., description="Days per chunk")
+    triggered_user: Optional[str] = Field(None, description="User stored on the records")
+    status: str = Field(
+        ..., description="pending, running, done, failed or cancelled"
+    )
+    error: Optional[str] = Field(None, description="Reason of a failure")
+    chunks: dict[str, int] = Field(
+        default_factory=dict, description="Number of chunks by status"
+    )
+    rows: int = Field(0, description="Weather records loaded so far")
+    active: bool = Field(False, description="Whether the job runs in this process")
+    created_at: Optional[str] = Field(None, description="Time the job was created")
+    updated_at: Optional[str] = Field(None, description="Time the job last changed")
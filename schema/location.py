@@ -2,6 +2,8 @@
 # schema/location.py
 # This module defines the schema for location data.
 """
+from typing import Optional
+
 from pydantic import BaseModel, Field
 
 class LocationData(BaseModel):
@@ -26,3 +28,26 @@ class LocationData(BaseModel):
             }
         }
     }
+
+
+class NearestLocation(BaseModel):
+    """
+    Location nearest to coordinates, as found by a reverse lookup.
+    """
+    id: Optional[int] = Field(None, description="The location ID, null if the place was never saved.")
+    name: str = Field(..., description="The name of the location.")
+    lat: float = Field(..., description="The latitude of the location.")
+    long: float = Field(..., description="The longitude of the location.")
+    country: str = Field(..., description="The country of the location.")
+    distance_km: float = Field(..., description="Great-circle distance to the coordinates.")
+
+
+class LocationSuggestion(BaseModel):
+    """
+    Known location suggested for a partially typed name.
+    """
+    id: Optional[int] = Field(None, description="The location ID, null if the place was never saved.")
+    name: str = Field(..., description="The name of the location.")
+    lat: float = Field(..., description="The latitude of the location.")
+    long: float = Field(..., description="The longitude of the location.")
+    country: str = Field(..., description="The country of the location.")
@@ -3,8 +3,11 @@
 # This module defines the schema for weather data.
 """
 
+from datetime import date as date_type, datetime
 from typing import Optional
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
+
+from schema.location import LocationData
 
 
 class WeatherData(BaseModel):
@@ -54,3 +57,139 @@ class WeatherData(BaseModel):
             }
         },
     }
+
+
+class BatchRequest(BaseModel):
+    """
+    Multi-location forecast request, locations are given by name and/or ID.
+    """
+
+    names: list[str] = Field(
+        default_factory=list, max_length=1000, description="Location names"
+    )
+    ids: list[int] = Field(
+        default_factory=list, max_length=1000, description="Location IDs"
+    )
+    start_date: Optional[str] = Field(
+        None, description="Start date for daily forecasts (YYYY-MM-DD)"
+    )
+    end_date: Optional[str] = Field(
+        None, description="End date for daily forecasts (YYYY-MM-DD)"
+    )
+    variables: Optional[list[str]] = Field(
+        None, description="Upstream variable names, the defaults when omitted"
+    )
+    forecast_days: Optional[int] = Field(
+        None, ge=1, le=16, description="Hourly forecast horizon in days"
+    )
+
+    @model_validator(mode="after")
+    def check_locations(self):
+        """
+        Require at least one location.
+        """
+        if not self.names and not self.ids:
+            raise ValueError("At least one location name or ID is required")
+        return self
+
+    model_config = {
+        "json_schema_extra": {
+            "example": {
+                "names": ["Berlin", "Paris"],
+                "ids": [1],
+            }
+        },
+    }
+
+
+class WeatherRecord(BaseModel):
+    """
+    Stored weather record schema for listing responses.
+    """
+
+    id: int = Field(..., description="Weather record ID")
+    loc_id: int = Field(..., description="Location ID associated with the weather data")
+    date: date_type = Field(..., description="Date of the weather data")
+    temp: float = Field(..., description="Temperature in degrees Celsius")
+    condition: str = Field(..., description="Weather condition")
+    wind_speed: Optional[float] = Field(None, description="Wind speed in km/h")
+    humidity: Optional[int] = Field(None, description="Humidity percentage")
+    triggered_user: Optional[str] = Field(
+        None, description="User who triggered the weather data retrieval"
+    )
+    api_source: Optional[str] = Field(None, description="Source of the weather data API")
+    created_at: Optional[datetime] = Field(None, description="Time the record was stored")
+
+    model_config = {"from_attributes": True}
+
+
+class UserWeatherRecord(WeatherRecord):
+    """
+    Stored weather record with its location, for the history of a user.
+    """
+
+    location: LocationData = Field(..., description="Location of the weather data")
+
+
+class UserWeatherHistory(BaseModel):
+    """
+    Weather records of a user with their locations listed once, by ID.
+    """
+
+    records: list[WeatherRecord] = Field(..., description="Weather records, newest first")
+    locations: dict[int, LocationData] = Field(
+        ..., description="Locations of the records, by loc_id"
+    )
+
+
+class WeatherStats(BaseModel):
+    """
+    Temperature and humidity statistics of a location over one period.
+    """
+
+    loc_id: int = Field(..., description="Location ID")
+    location: str = Field(..., description="Location name")
+    period: Optional[date_type] = Field(
+        None, description="First day of the period, null for the whole window"
+    )
+    records: int = Field(..., description="Number of weather records")
+    temp_mean: float = Field(..., description="Mean temperature in degrees Celsius")
+    temp_min: float = Field(..., description="Lowest temperature in degrees Celsius")
+    temp_max: float = Field(..., description="Highest temperature in degrees Celsius")
+    humidity_count: int = Field(..., description="Number of records with a humidity")
+    humidity_mean: Optional[float] = Field(None, description="Mean humidity percentage")
+    humidity_min: Optional[int] = Field(None, description="Lowest humidity percentage")
+    humidity_max: Optional[int] = Field(None, description="Highest humidity percentage")
+
+
+class WeatherPage(BaseModel):
+    """
+    One page of weather records, newest first.
+    """
+
+    items: list[WeatherRecord] = Field(..., description="Weather records of this page")
+    next_cursor: Optional[str] = Field(
+        None, description="Token for the next page, null on the last page"
+    )
+
+    model_config = {
+        "json_schema_extra": {
+            "example": {
+                "items": [
+                    {
+                        "id": 42,
+                        "loc_id": 1,
+                        "date": "2023-10-01",
+                        "temp": 22.5,
+                        "condition": "Sunny",
+                        "wind_speed": 15.0,
+                        "humidity": 60,
+                        "triggered_user": "john_doe",
+                        "api_source": "Open-Meteo",
+                        "created_at": "2023-10-01T12:00:00",
+                    }
+                ],
+                "next_cursor": "WyIyMDIzLTEwLTAxIiwgNDJd",
+            }
+        },
+    }
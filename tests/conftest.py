@@ -0,0 +1,54 @@
+"""
+# tests/conftest.py
+# Shared fixtures. Tests that need PostgreSQL run against the configured database
+# (DATABASE_URL, use a scratch one) and are skipped when it cannot be reached.
+"""
+
+import asyncio
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+
+@pytest.fixture(scope="session")
+def engine():
+    """
+    The configured sync engine with all tables migrated, skips without PostgreSQL.
+    """
+    from model.db import get_engine
+    from model.migrations import apply_migrations, ensure_extensions
+
+    engine = get_engine()
+    if engine.dialect.name != "postgresql":
+        pytest.skip("DATABASE_URL is not a PostgreSQL database")
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    except OperationalError as e:
+        pytest.skip(f"PostgreSQL is not available: {e.orig}")
+    ensure_extensions(engine)
+    apply_migrations(engine)
+    return engine
+
+
+@pytest.fixture
+def run():
+    """
+    Run a coroutine in a new event loop, closing the async engine and the
+    upstream session it opened before the loop ends.
+    """
+    from controller.upstream import close_session
+    from model.db import dispose_engines
+
+    def run(coroutine):
+        async def main():
+            try:
+                return await coroutine
+            finally:
+                await close_session()
+                await dispose_engines()
+
+        return asyncio.run(main())
+
+    return run
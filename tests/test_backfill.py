@@ -0,0 +1,280 @@
+"""
+# tests/test_backfill.py
+# Backfill planning, archive parsing and jobs run against the local Open-Meteo
+# stand-in (benchmarks.fake_openmeteo) instead of the archive API.
+"""
+
+import asyncio
+from datetime import date, timedelta
+
+import pytest
+from openmeteo_sdk.WeatherApiResponse import WeatherApiResponse
+from sqlalchemy import delete, func, select
+
+from benchmarks.fake_openmeteo import encode_location, start_server
+from controller import backfill
+from controller.backfill import (
+    API_SOURCE,
+    ARCHIVE_PLAN,
+    ARCHIVE_START,
+    archive_rows,
+    batch_chunks,
+    plan_chunks,
+)
+from model.backfill import CANCELLED, DONE, FAILED, PENDING, BackfillChunk, BackfillJob
+from model.db import SessionLocal
+from model.location import Location
+from model.weather import Weather
+from model.weather_stats import WeatherMonthly
+
+USER = "pytest-backfill"
+# Three chunks of 31 days per location: Jan, Feb 1 - Mar 2, Mar 3 - 31
+START, END, CHUNK_DAYS = date(2024, 1, 1), date(2024, 3, 31), 31
+SPANS = [date(2024, 1, 1), date(2024, 2, 1), date(2024, 3, 3)]
+DAYS = (END - START).days + 1
+
+
+def test_plan_chunks_covers_the_range_once():
+    chunks = plan_chunks([1, 2], date(2024, 1, 1), date(2024, 1, 11), 5)
+    assert chunks == [
+        (1, date(2024, 1, 1), date(2024, 1, 5)),
+        (2, date(2024, 1, 1), date(2024, 1, 5)),
+        (1, date(2024, 1, 6), date(2024, 1, 10)),
+        (2, date(2024, 1, 6), date(2024, 1, 10)),
+        (1, date(2024, 1, 11), date(2024, 1, 11)),
+        (2, date(2024, 1, 11), date(2024, 1, 11)),
+    ]
+
+
+def test_plan_chunks_single_day_and_repeated_locations():
+    day = date(2024, 2, 29)
+    assert plan_chunks([3, 3, 1, 3], day, day, 365) == [(3, day, day), (1, day, day)]
+
+
+def test_plan_chunks_exact_multiple():
+    chunks = plan_chunks([1], date(2024, 1, 1), date(2024, 1, 10), 5)
+    assert [(start, end) for _, start, end in chunks] == [
+        (date(2024, 1, 1), date(2024, 1, 5)),
+        (date(2024, 1, 6), date(2024, 1, 10)),
+    ]
+
+
+@pytest.mark.parametrize(
+    "start, end, chunk_days",
+    [
+        (date(2024, 1, 1), date(2024, 1, 31), 0),
+        (date(2024, 1, 31), date(2024, 1, 1), 31),
+        (ARCHIVE_START - timedelta(days=1), date(2024, 1, 1), 31),
+        (date(2024, 1, 1), date.today() + timedelta(days=1), 31),
+    ],
+    ids=["chunk_days", "reversed", "before archive", "after today"],
+)
+def test_plan_chunks_rejects_invalid_ranges(start, end, chunk_days):
+    with pytest.raises(ValueError):
+        plan_chunks([1], start, end, chunk_days)
+
+
+def test_batch_chunks_groups_spans_and_skips_deleted_locations():
+    locations = {
+        loc_id: Location(id=loc_id, name=f"L{loc_id}", lat=loc_id, long=-loc_id)
+        for loc_id in (1, 2, 3)
+    }
+    chunks = [
+        BackfillChunk(loc_id=loc_id, start_date=start, end_date=end)
+        for loc_id, start, end in plan_chunks([1, 2, 3, 4], date(2024, 1, 1), date(2024, 1, 10), 5)
+    ]
+    batches = batch_chunks(chunks, locations, size=2)
+    assert [(batch.start_date, batch.end_date, batch.locations) for batch in batches] == [
+        (date(2024, 1, 1), date(2024, 1, 5), ((1, 1, -1), (2, 2, -2))),
+        (date(2024, 1, 1), date(2024, 1, 5), ((3, 3, -3),)),
+        (date(2024, 1, 6), date(2024, 1, 10), ((1, 1, -1), (2, 2, -2))),
+        (date(2024, 1, 6), date(2024, 1, 10), ((3, 3, -3),)),
+    ]
+    assert batch_chunks([], locations) == []
+
+
+@pytest.mark.parametrize("utc_offset", [0, 3600, -5 * 3600, 14 * 3600])
+def test_archive_rows_are_local_days(utc_offset):
+    params = {
+        "latitude": "52.52",
+        "longitude": "13.41",
+        "daily": ARCHIVE_PLAN.param,
+        "start_date": "2024-01-30",
+        "end_date": "2024-02-02",
+    }
+    data = encode_location(52.52, 13.41, params, now=1_700_000_000, utc_offset=utc_offset)
+    response = WeatherApiResponse.GetRootAs(data[4:], 0)
+
+    rows = archive_rows(response, 7, "alice")
+
+    assert [row["date"] for row in rows] == [
+        date(2024, 1, 30), date(2024, 1, 31), date(2024, 2, 1), date(2024, 2, 2)
+    ]
+    for row in rows:
+        assert row["loc_id"] == 7
+        assert row["triggered_user"] == "alice"
+        assert row["api_source"] == API_SOURCE
+        assert -100 <= row["temp"] <= 100
+        assert row["humidity"] is None or 0 <= row["humidity"] <= 100
+
+
+@pytest.fixture(scope="module")
+def archive():
+    """
+    Point the backfill at the stand-in archive for the tests of this module.
+    """
+    server, url = start_server(latency=0.0)
+    archive_url = backfill.ARCHIVE_URL
+    backfill.ARCHIVE_URL = f"{url}/v1/archive"
+    yield
+    backfill.ARCHIVE_URL = archive_url
+    server.shutdown()
+
+
+@pytest.fixture
+def locations(engine, archive):
+    """
+    Three scratch locations, deleted with their records and jobs afterwards.
+    """
+    with SessionLocal() as db:
+        ids = [
+            Location(name=f"Backfilltest {i}", lat=10.0 + i, long=20.0 + i, country="Testland")
+            .save(db)
+            .id
+            for i in range(3)
+        ]
+    yield ids
+    with SessionLocal() as db:
+        db.execute(delete(BackfillJob).where(BackfillJob.triggered_user == USER))
+        db.execute(delete(Location).where(Location.id.in_(ids)))
+        db.commit()
+
+
+def _weather(loc_ids: list[int]) -> dict:
+    with SessionLocal() as db:
+        rows = db.execute(
+            select(Weather.loc_id, Weather.date, Weather.temp, Weather.triggered_user, Weather.api_source)
+            .where(Weather.loc_id.in_(loc_ids))
+        ).all()
+        rolled_up = db.scalar(
+            select(func.sum(WeatherMonthly.records)).where(WeatherMonthly.loc_id.in_(loc_ids))
+        )
+    assert rolled_up == (len(rows) or None)
+    return {(row.loc_id, row.date): row for row in rows}
+
+
+@pytest.fixture
+def fetched(monkeypatch):
+    """
+    Start dates of the batches requested from the archive.
+    """
+    starts = []
+    fetch_batch = backfill.fetch_batch
+
+    async def fetch(batch):
+        starts.append(batch.start_date)
+        return await fetch_batch(batch)
+
+    monkeypatch.setattr(backfill, "fetch_batch", fetch)
+    return starts
+
+
+def test_run_job_loads_every_day(run, locations, fetched):
+    async def main():
+        job = await backfill.create_job(locations, START, END, CHUNK_DAYS, USER)
+        return await backfill.run_job(job["id"], workers=2)
+
+    result = run(main())
+
+    assert result["status"] == DONE
+    assert result["chunks"] == {DONE: len(SPANS) * len(locations)}
+    assert result["rows"] == DAYS * len(locations)
+    assert sorted(fetched) == SPANS
+    weather = _weather(locations)
+    assert len(weather) == DAYS * len(locations)
+    assert {(row.triggered_user, row.api_source) for row in weather.values()} == {(USER, API_SOURCE)}
+
+
+def test_cancelled_job_resumes_with_pending_chunks(run, locations, fetched, monkeypatch):
+    fetch = backfill.fetch_batch
+
+    async def main():
+        job = await backfill.create_job(locations, START, END, CHUNK_DAYS, USER)
+        second = asyncio.Event()
+
+        async def stall_second(batch):
+            if fetched:
+                second.set()
+                await asyncio.Event().wait()
+            return await fetch(batch)
+
+        monkeypatch.setattr(backfill, "fetch_batch", stall_second)
+        assert backfill.start_job(job["id"], workers=1)
+        await second.wait()
+        assert await backfill.cancel_job(job["id"])
+        cancelled = await backfill.job_status(job["id"])
+
+        monkeypatch.setattr(backfill, "fetch_batch", fetch)
+        fetched.clear()
+        return cancelled, await backfill.run_job(job["id"], workers=1)
+
+    cancelled, resumed = run(main())
+
+    assert cancelled["status"] == CANCELLED
+    assert cancelled["chunks"] == {DONE: 3, PENDING: 6}
+    assert fetched == SPANS[1:]
+    assert resumed["status"] == DONE
+    assert resumed["chunks"] == {DONE: 9}
+    assert len(_weather(locations)) == DAYS * len(locations)
+
+
+def test_failed_chunks_are_fetched_again(run, locations, fetched, monkeypatch):
+    fetch = backfill.fetch_batch
+
+    async def main():
+        job = await backfill.create_job(locations, START, END, CHUNK_DAYS, USER)
+
+        async def fail_february(batch):
+            if batch.start_date == SPANS[1]:
+                raise ConnectionError("archive unavailable")
+            return await fetch(batch)
+
+        monkeypatch.setattr(backfill, "fetch_batch", fail_february)
+        failed = await backfill.run_job(job["id"], workers=2)
+        monkeypatch.setattr(backfill, "fetch_batch", fetch)
+        fetched.clear()
+        return failed, await backfill.run_job(job["id"], workers=2)
+
+    failed, resumed = run(main())
+
+    assert failed["status"] == FAILED
+    assert failed["chunks"] == {DONE: 6, FAILED: 3}
+    assert fetched == [SPANS[1]]
+    assert resumed["status"] == DONE
+    assert resumed["rows"] == DAYS * len(locations)
+
+
+def test_backfill_keeps_records_of_users(run, locations):
+    day = date(2024, 1, 5)
+    with SessionLocal() as db:
+        Weather(
+            loc_id=locations[0], date=day, temp=42.0, condition="Mine", wind_speed=1.0,
+            humidity=10, triggered_user="alice", api_source="user",
+        ).save(db)
+
+    async def main():
+        results = []
+        # The second run overwrites its own archive records, never the user's
+        for _ in range(2):
+            job = await backfill.create_job(locations, START, END, CHUNK_DAYS, USER)
+            results.append(await backfill.run_job(job["id"]))
+        return results
+
+    for result in run(main()):
+        assert result["status"] == DONE
+        assert result["rows"] == DAYS * len(locations) - 1
+
+    weather = _weather(locations)
+    kept = weather[(locations[0], day)]
+    assert (kept.temp, kept.triggered_user, kept.api_source) == (42.0, "alice", "user")
+    assert len(weather) == DAYS * len(locations)
@@ -0,0 +1,350 @@
+"""
+# tests/test_cache.py
+# The LRU cache, request coalescing and the forecast cache backends: memory,
+# shared mmap file and the RESP parser of the Redis backend.
+"""
+
+import asyncio
+import fcntl
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from cache import forecast, lru
+from cache.forecast import ForecastCache, MemoryBackend, MmapBackend, RedisBackend, RedisError
+from cache.lru import MISSING, LRUCache
+from controller.singleflight import SingleFlight, forecast_key
+
+
+class Clock:
+    """
+    Manually advanced clock standing in for time.monotonic and time.time.
+    """
+
+    def __init__(self, now: float = 1000.0) -> None:
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    # Only the cache modules see it, the event loop keeps the real clock
+    monkeypatch.setattr(lru, "time", SimpleNamespace(monotonic=clock))
+    monkeypatch.setattr(forecast, "time", SimpleNamespace(time=clock))
+    return clock
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    assert cache.get("b") is MISSING
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.stats()["evictions"] == 1
+
+
+def test_lru_entries_expire(clock):
+    cache = LRUCache(max_size=4, ttl=10)
+    cache.set("default", 1)
+    cache.set("short", 2, ttl=1)
+    cache.set("long", 3, ttl=100)
+
+    clock.now += 5
+    assert cache.get("short", None) is None
+    assert cache.get("default") == 1
+    assert cache.remaining("long") == pytest.approx(95)
+
+    clock.now += 5
+    assert cache.get("default") is MISSING
+    assert cache.remaining("default") is None
+    assert cache.stats()["expirations"] == 2
+    assert cache.get("long") == 3
+
+
+def test_lru_invalidate_where():
+    cache = LRUCache()
+    for i in range(5):
+        cache.set(("location", i), i)
+    assert cache.invalidate_where(lambda key, value: value % 2 == 0) == 3
+    assert cache.invalidate(("location", 1))
+    assert not cache.invalidate(("location", 1))
+    assert len(cache) == 1
+
+
+def test_lru_rejects_empty_size():
+    with pytest.raises(ValueError):
+        LRUCache(max_size=0)
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    flight = SingleFlight()
+    calls = []
+
+    async def fetch(value):
+        calls.append(value)
+        await asyncio.sleep(0.01)
+        return {"value": value}
+
+    async def main():
+        results = await asyncio.gather(
+            *(flight.do("a", lambda: fetch("a")) for _ in range(5)),
+            flight.do("b", lambda: fetch("b")),
+        )
+        # Finished calls are forgotten, the next miss calls again
+        again = await flight.do("a", lambda: fetch("a"))
+        return results, again
+
+    results, again = asyncio.run(main())
+
+    assert calls == ["a", "b", "a"]
+    assert all(result is results[0] for result in results[:5])
+    assert results[5] == {"value": "b"}
+    assert again == {"value": "a"} and again is not results[0]
+    assert flight.stats() == {"originated": 3, "coalesced": 4, "in_flight": 0}
+
+
+def test_single_flight_shares_errors_and_survives_cancelled_callers():
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ConnectionError("upstream down")
+
+    async def slow():
+        await asyncio.sleep(0.02)
+        return 42
+
+    async def main():
+        errors = await asyncio.gather(
+            *(flight.do("error", fail) for _ in range(3)), return_exceptions=True
+        )
+        leaving = asyncio.ensure_future(flight.do("slow", slow))
+        staying = asyncio.ensure_future(flight.do("slow", slow))
+        await asyncio.sleep(0)
+        leaving.cancel()
+        return errors, await staying
+
+    errors, result = asyncio.run(main())
+
+    assert all(isinstance(error, ConnectionError) for error in errors)
+    assert result == 42
+
+
+def test_forecast_key_is_normalized():
+    assert forecast_key("daily", 52.520001, "13.4", "b, a,a") == forecast_key(
+        "daily", "52.52", 13.40004, "a,b"
+    )
+    assert forecast_key("daily", 52.52, 13.4, "a") != forecast_key("hourly", 52.52, 13.4, "a")
+
+
+def test_memory_backend_round_trip_and_ttl(clock):
+    backend = MemoryBackend(max_size=8)
+    value = {"daily": {"time": ["2024-01-01"], "temperature_2m_max": [3.5]}}
+
+    async def main():
+        await backend.set("berlin", value, ttl=60)
+        await backend.set_many({"paris": 1, "oslo": 2}, ttl=30)
+        first = (
+            await backend.get("berlin"),
+            await backend.get_many(["paris", "oslo", "rome"]),
+            await backend.remaining_many(["berlin", "rome"]),
+        )
+        clock.now += 45
+        second = (await backend.get("berlin"), await backend.get("paris"))
+        await backend.delete("berlin")
+        return first, second, await backend.get("berlin")
+
+    first, second, deleted = asyncio.run(main())
+
+    assert first == (value, [1, 2, None], [pytest.approx(60), None])
+    assert second == (value, None)
+    assert deleted is None
+
+
+@pytest.fixture
+def mmap_path(tmp_path):
+    return str(tmp_path / "forecast-cache")
+
+
+def _colliding_keys(backend: MmapBackend) -> tuple[str, str]:
+    first = "key-0"
+    slot = backend._hash(first) % backend.slots
+    for i in range(1, 1000):
+        key = f"key-{i}"
+        if backend._hash(key) % backend.slots == slot:
+            return first, key
+    raise AssertionError("no colliding key found")
+
+
+def test_mmap_backend_round_trip_between_workers(mmap_path, clock):
+    async def main():
+        writer = MmapBackend(mmap_path, slots=16, slot_size=1024)
+        reader = MmapBackend(mmap_path, slots=16, slot_size=1024)
+        try:
+            await writer.set("berlin", {"temp": [1.5, 2.5]}, ttl=60)
+            shared = await reader.get("berlin"), await reader.remaining("berlin")
+            clock.now += 61
+            expired = await reader.get("berlin"), await reader.remaining("berlin")
+            await writer.set("paris", 1, ttl=60)
+            await reader.delete("paris")
+            deleted = await writer.get("paris")
+            await writer.set("oslo", 2, ttl=60)
+            await reader.clear()
+            return shared, expired, deleted, await writer.get("oslo")
+        finally:
+            await writer.close()
+            await reader.close()
+
+    shared, expired, deleted, cleared = asyncio.run(main())
+
+    assert shared == ({"temp": [1.5, 2.5]}, pytest.approx(60))
+    assert expired == (None, None)
+    assert deleted is None
+    assert cleared is None
+
+
+def test_mmap_backend_colliding_keys_replace_each_other(mmap_path):
+    async def main():
+        backend = MmapBackend(mmap_path, slots=4, slot_size=256)
+        try:
+            first, second = _colliding_keys(backend)
+            await backend.set(first, "first", ttl=60)
+            await backend.set(second, "second", ttl=60)
+            values = await backend.get(first), await backend.get(second)
+            # Deleting a key whose slot was taken over leaves the other one
+            await backend.delete(first)
+            return values, await backend.get(second)
+        finally:
+            await backend.close()
+
+    values, kept = asyncio.run(main())
+
+    assert values == (None, "second")
+    assert kept == "second"
+
+
+def test_mmap_backend_skips_payloads_larger_than_a_slot(mmap_path):
+    async def main():
+        backend = MmapBackend(mmap_path, slots=1, slot_size=64)
+        try:
+            await backend.set("small", "x" * (backend.capacity - 2), ttl=60)
+            await backend.set("large", "x" * backend.capacity, ttl=60)
+            return await backend.get("small"), await backend.get("large")
+        finally:
+            await backend.close()
+
+    small, large = asyncio.run(main())
+
+    # The oversized value is dropped without overwriting the slot
+    assert small == "x" * (64 - MmapBackend._SLOT_HEADER.size - 2)
+    assert large is None
+
+
+def test_mmap_backend_refuses_other_layouts(mmap_path):
+    backend = MmapBackend(mmap_path, slots=4, slot_size=256)
+    try:
+        with pytest.raises(ValueError, match="expected"):
+            MmapBackend(mmap_path, slots=8, slot_size=256)
+        # The file was neither resized nor reformatted
+        assert os.path.getsize(mmap_path) == MmapBackend._HEADER.size + 4 * 256
+        asyncio.run(backend.set("kept", 1, ttl=60))
+        assert asyncio.run(MmapBackend(mmap_path, slots=4, slot_size=256).get("kept")) == 1
+    finally:
+        asyncio.run(backend.close())
+
+    foreign = mmap_path + "-foreign"
+    with open(foreign, "wb") as file:
+        file.write(b"NOTACACHE" + bytes(MmapBackend._HEADER.size + 4 * 256 - 9))
+    with pytest.raises(ValueError, match="unknown layout"):
+        MmapBackend(foreign, slots=4, slot_size=256)
+
+
+def test_mmap_backend_waits_for_the_lock_without_blocking(mmap_path):
+    async def main():
+        backend = MmapBackend(mmap_path, slots=4, slot_size=256)
+        await backend.set("key", "value", ttl=60)
+        other = os.open(mmap_path, os.O_RDWR)
+        try:
+            fcntl.flock(other, fcntl.LOCK_EX)
+            read = asyncio.ensure_future(backend.get("key"))
+            ticks = 0
+            while ticks < 10:
+                await asyncio.sleep(0.001)
+                ticks += 1
+            assert not read.done()
+            fcntl.flock(other, fcntl.LOCK_UN)
+            return await asyncio.wait_for(read, 1), ticks
+        finally:
+            os.close(other)
+            await backend.close()
+
+    assert asyncio.run(main()) == ("value", 10)
+
+
+def _parse(data: bytes):
+    async def main():
+        reader = asyncio.StreamReader()
+        reader.feed_data(data)
+        reader.feed_eof()
+        return await RedisBackend._read_reply(reader)
+
+    return asyncio.run(main())
+
+
+@pytest.mark.parametrize(
+    "data, expected",
+    [
+        (b"+OK\r\n", b"OK"),
+        (b":-2\r\n", -2),
+        (b"$5\r\nhello\r\n", b"hello"),
+        (b"$0\r\n\r\n", b""),
+        (b"$6\r\na\r\nb\r\n\r\n", b"a\r\nb\r\n"),
+        (b"$-1\r\n", None),
+        (b"*-1\r\n", None),
+        (b"*3\r\n$1\r\na\r\n$-1\r\n:7\r\n", [b"a", None, 7]),
+        (b"*2\r\n$1\r\n0\r\n*1\r\n$3\r\nkey\r\n", [b"0", [b"key"]]),
+    ],
+    ids=[
+        "simple", "integer", "bulk", "empty bulk", "bulk with CRLF", "nil bulk",
+        "nil array", "array", "nested array",
+    ],
+)
+def test_resp_replies(data, expected):
+    assert _parse(data) == expected
+
+
+def test_resp_error_reply():
+    with pytest.raises(RedisError, match="WRONGTYPE"):
+        _parse(b"-WRONGTYPE Operation against a key holding the wrong kind of value\r\n")
+
+
+@pytest.mark.parametrize("data", [b"", b"$5\r\nhel"], ids=["closed", "truncated"])
+def test_resp_incomplete_reply(data):
+    with pytest.raises((ConnectionError, asyncio.IncompleteReadError)):
+        _parse(data)
+
+
+def test_resp_commands_are_encoded_as_bulk_arrays():
+    assert RedisBackend._encode("SET", "k", b"v\r\n", "PX", 1500) == (
+        b"*5\r\n$3\r\nSET\r\n$1\r\nk\r\n$3\r\nv\r\n\r\n$2\r\nPX\r\n$4\r\n1500\r\n"
+    )
+
+
+def test_forecast_cache_treats_backend_errors_as_misses():
+    class Broken(MemoryBackend):
+        async def get(self, key):
+            raise ConnectionError("cache down")
+
+    cache = ForecastCache(Broken(), {"daily": 60})
+    key = forecast_key("daily", 52.52, 13.41, "temperature_2m_max")
+
+    assert asyncio.run(cache.get(key)) is None
+    assert cache.stats()["errors"] == 1
+    assert cache.stats()["misses"] == 1
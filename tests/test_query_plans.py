@@ -0,0 +1,35 @@
+"""
+# tests/test_query_plans.py
+# The hot queries of QUERY_PLAN_CHECKS are served by their indexes once the
+# migrations have run.
+"""
+
+import pytest
+from sqlalchemy import text
+
+from model.migrations import QUERY_PLAN_CHECKS, _existing_indexes, apply_migrations, explain
+
+
+def test_apply_migrations_is_idempotent(engine):
+    before = _existing_indexes(engine)
+    apply_migrations(engine)
+    assert _existing_indexes(engine) == before
+
+
+@pytest.mark.parametrize(
+    "statement, index_name",
+    [(statement, index_name) for _, statement, index_name in QUERY_PLAN_CHECKS],
+    ids=[description for description, _, _ in QUERY_PLAN_CHECKS],
+)
+def test_query_uses_index(engine, statement, index_name):
+    with engine.connect() as conn:
+        indexes = set(conn.scalars(text("SELECT indexname FROM pg_indexes")))
+    if index_name not in indexes:
+        # Only indexes of an unavailable extension (pg_trgm) are left out
+        pytest.skip(f"{index_name} was not created, its extension is not installed")
+    with engine.connect() as conn:
+        # As in check_query_plans, so the plan does not depend on table size
+        conn.execute(text("SET LOCAL enable_seqscan = off"))
+        plan = explain(conn, statement)
+        conn.rollback()
+    assert index_name in plan, plan
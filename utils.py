@@ -3,41 +3,101 @@
 # Sharing constants and functions across the application
 """
 import tomllib
+import logging
 import os
 import random
+from functools import lru_cache
+
+import numpy as np
+
+from logger import ROOT_LOGGER, setup_logging
 
 ALPHABET = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
 
-COLOR = {
-    "error": "\033[91m",  # Red
-    "warn": "\033[93m",  # Yellow
-    "info": "\033[92m",  # Green
-    "reset": "\033[0m",  # Reset color
+# WMO weather interpretation codes used by Open-Meteo
+WEATHER_CODES = {
+    0: "Clear sky",
+    1: "Mainly clear",
+    2: "Partly cloudy",
+    3: "Overcast",
+    45: "Fog",
+    48: "Depositing rime fog",
+    51: "Drizzle: Light intensity",
+    53: "Drizzle: Moderate intensity",
+    55: "Drizzle: Dense intensity",
+    56: "Freezing Drizzle: Light intensity",
+    57: "Freezing Drizzle: Dense intensity",
+    61: "Rain: Slight intensity",
+    63: "Rain: Moderate intensity",
+    65: "Rain: Heavy intensity",
+    66: "Freezing Rain: Light intensity",
+    67: "Freezing Rain: Heavy intensity",
+    71: "Snow fall: Slight intensity",
+    73: "Snow fall: Moderate intensity",
+    75: "Snow fall: Heavy intensity",
+    77: "Snow grains",
+    80: "Rain showers: Slight",
+    81: "Rain showers: Moderate",
+    82: "Rain showers: Violent",
+    85: "Snow showers: Slight",
+    86: "Snow showers: Heavy",
+    95: "Thunderstorm: Slight or moderate",
+    96: "Thunderstorm with slight hail",
+    99: "Thunderstorm with heavy hail",
 }
+UNKNOWN_WEATHER_CODE = "Unknown weather code"
 
+# Label by code for vectorized lookups, the last slot holds the unknown label
+WEATHER_CODE_TABLE = np.full(max(WEATHER_CODES) + 2, UNKNOWN_WEATHER_CODE, dtype=object)
+WEATHER_CODE_TABLE[list(WEATHER_CODES)] = list(WEATHER_CODES.values())
 
-def fprint(message: str, level: str = "info") -> None:
+# fprint level names
+FPRINT_LEVELS = {
+    "error": logging.ERROR,
+    "warn": logging.WARNING,
+    "info": logging.INFO,
+    "debug": logging.DEBUG,
+}
+
+
+@lru_cache(maxsize=1)
+def load_settings() -> dict:
     """
-    Formatted print function to display messages with a specific level.
+    Load the application settings from settings.toml.
 
-    Args:
-        message (str): The message to print.
-        level (int): The level of the message (0: error, 1: warn, 2: info).
+    The file is read once per process, callers share the parsed dictionary
+    and should treat it as read-only.
+
+    Returns:
+        dict: Parsed settings, empty if the file does not exist.
+    """
+    config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "settings.toml")
+    if not os.path.exists(config_path):
+        return {}
+    with open(config_path, "rb") as config_file:
+        return tomllib.load(config_file)
+
+
+_fprint_logger = logging.getLogger(ROOT_LOGGER)
+
+
+def fprint(message: str, level: str = "info") -> None:
     """
+    Log a message on the application logger.
 
-    config = tomllib.load(open("settings.toml", "rb"))
-    config_threshold = config.get("app", {}).get("log_level", 0)
-    threshold = int(os.getenv("LOG_LEVEL", config_threshold))
-    level_map = {
-        "error": 0,
-        "warn": 1,
-        "info": 2
-    }
+    Kept for existing callers, new code should use logger.get_logger and
+    pass arguments separately so they are only formatted when the level
+    is enabled.
 
-    log_level = level_map.get(level, 0)
-    if log_level > threshold:
-        return
-    print(f"{COLOR[level]}[{level.upper()}]{COLOR['reset']} {message}")
+    Args:
+        message (str): The message to log.
+        level (str): error, warn, info or debug.
+    """
+    if not _fprint_logger.handlers:
+        setup_logging()
+    log_level = FPRINT_LEVELS.get(level, logging.ERROR)
+    if _fprint_logger.isEnabledFor(log_level):
+        _fprint_logger.log(log_level, message)
 
 
 def random_user_string(length: int = 8) -> str:
@@ -56,73 +116,43 @@ def convert_weather_code(code: int) -> str:
     """
     Convert weather code to human-readable format.
     """
-    weather_code_map = {
-        0: "Clear sky",
-        1: "Mainly clear",
-        2: "Partly cloudy",
-        3: "Overcast",
-        45: "Fog",
-        48: "Depositing rime fog",
-        51: "Drizzle: Light intensity",
-        53: "Drizzle: Moderate intensity",
-        55: "Drizzle: Dense intensity",
-        56: "Freezing Drizzle: Light intensity",
-        57: "Freezing Drizzle: Dense intensity",
-        61: "Rain: Slight intensity",
-        63: "Rain: Moderate intensity",
-        65: "Rain: Heavy intensity",
-        66: "Freezing Rain: Light intensity",
-        67: "Freezing Rain: Heavy intensity",
-        71: "Snow fall: Slight intensity",
-        73: "Snow fall: Moderate intensity",
-        75: "Snow fall: Heavy intensity",
-        77: "Snow grains",
-        80: "Rain showers: Slight",
-        81: "Rain showers: Moderate",
-        82: "Rain showers: Violent",
-        85: "Snow showers: Slight",
-        86: "Snow showers: Heavy",
-        95: "Thunderstorm: Slight or moderate",
-        96: "Thunderstorm with slight hail",
-        99: "Thunderstorm with heavy hail",
-    }
-
-    return weather_code_map.get(code, "Unknown weather code")
+    return WEATHER_CODES.get(code, UNKNOWN_WEATHER_CODE)
+
+
+def convert_weather_codes(codes) -> np.ndarray:
+    """
+    Convert an array of weather codes to labels with one table lookup.
+
+    Args:
+        codes: Array-like of WMO weather codes, NaN for missing values.
+
+    Returns:
+        np.ndarray: Object array of labels, same shape as codes.
+    """
+    codes = np.asarray(codes, dtype=np.float64)
+    unknown = len(WEATHER_CODE_TABLE) - 1
+    with np.errstate(invalid="ignore"):
+        known = (codes >= 0) & (codes < unknown) & (np.mod(codes, 1) == 0)
+    return WEATHER_CODE_TABLE[np.where(known, codes, unknown).astype(np.intp)]
+
+
+def weather_code_labels(codes) -> dict[str, str]:
+    """
+    Map the distinct weather codes of an array to their labels.
+
+    Returns:
+        dict: Code (as string, NaN and fractional codes excluded) to label.
+    """
+    unique = np.unique(np.asarray(codes, dtype=np.float64))
+    with np.errstate(invalid="ignore"):
+        unique = unique[np.mod(unique, 1) == 0]
+    labels = convert_weather_codes(unique)
+    return {str(int(code)): label for code, label in zip(unique.tolist(), labels.tolist())}
 
 def reverse_weather_code(description: str) -> int:
     """
     Convert human-readable weather description to code.
     """
-    weather_code_map = {
-        0: "Clear sky",
-        1: "Mainly clear",
-        2: "Partly cloudy",
-        3: "Overcast",
-        45: "Fog",
-        48: "Depositing rime fog",
-        51: "Drizzle: Light intensity",
-        53: "Drizzle: Moderate intensity",
-        55: "Drizzle: Dense intensity",
-        56: "Freezing Drizzle: Light intensity",
-        57: "Freezing Drizzle: Dense intensity",
-        61: "Rain: Slight intensity",
-        63: "Rain: Moderate intensity",
-        65: "Rain: Heavy intensity",
-        66: "Freezing Rain: Light intensity",
-        67: "Freezing Rain: Heavy intensity",
-        71: "Snow fall: Slight intensity",
-        73: "Snow fall: Moderate intensity",
-        75: "Snow fall: Heavy intensity",
-        77: "Snow grains",
-        80: "Rain showers: Slight",
-        81: "Rain showers: Moderate",
-        82: "Rain showers: Violent",
-        85: "Snow showers: Slight",
-        86: "Snow showers: Heavy",
-        95: "Thunderstorm: Slight or moderate",
-        96: "Thunderstorm with slight hail",
-        99: "Thunderstorm with heavy hail",
-    }
-
-    reverse_map = {v: k for k, v in weather_code_map.items()}
+
+    reverse_map = {v: k for k, v in WEATHER_CODES.items()}
     return reverse_map.get(description, -1)